@@ -1,4 +1,5 @@
 import logging
+import re
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -8,18 +9,41 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
-from config import TOKEN
+from config import (
+    BOT_MODE,
+    CONCURRENT_UPDATES,
+    TOKEN,
+    WEBHOOK_LISTEN,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
 from handlers.menu import MenuHandler
 from handlers.findme import FindMeHandler
 from handlers.categories import CategoriesHandler
 from handlers.info import InfoHandler
-from utils import setup_logger, handle_error, show_main_menu
+from utils import setup_logger
 from handlers.city_guide import CityGuideHandler
 from handlers.transport_hubs import TransportHubsHandler
+from location_store import load_store, load_hub_store
+from data_watcher import start_watching, stop_watching
+from offload import start_monitoring, stop_offload
+from update_processor import PerUserUpdateProcessor
+from router import CallbackRouter
+from callback_data import encode, MAIN_MENU
 
 # Set up logger
 logger = setup_logger("bot")
 
+# Update types the handlers use: messages (commands, menu buttons, shared
+# locations) and button presses. Telegram doesn't send any other kind.
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+# Characters Telegram accepts in a webhook secret token (1-256 of them)
+_SECRET_TOKEN = re.compile(r"^[A-Za-z0-9_-]{1,256}$")
+
 
 async def handle_message(update: Update, context):
     """Handle all non-command messages"""
@@ -31,45 +55,6 @@ async def handle_message(update: Update, context):
         logger.error(f"Error in message handler: {str(e)}", exc_info=True)
 
 
-async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle callback queries"""
-    try:
-        query = update.callback_query
-        logger.info(f"Button clicked: {query.data}")
-
-        # Create guide handler instance
-        guide_handler = CityGuideHandler()
-
-        # Always acknowledge the callback query first
-        await query.answer()
-
-        if query.data == "nav_categories":
-            await CategoriesHandler.show_categories(update, context)
-        elif query.data == "nav_info":
-            await InfoHandler.show_info(update, context)
-        elif query.data in ["nav_guide", "show_guide"]:
-            await guide_handler.show_guide(update, context)
-        elif query.data == "guide_transport":
-            await guide_handler.show_transport(update, context)
-        elif query.data == "guide_phrases":
-            await guide_handler.show_phrases(update, context)
-        elif query.data == "guide_safety":
-            await guide_handler.show_safety(update, context)
-        elif query.data == "guide_subcities":
-            await guide_handler.show_subcities(update, context)
-        elif query.data.startswith("guide_attractions_"):
-            page = int(query.data.split("_")[2])
-            await guide_handler.show_attractions(update, context, page)
-        elif query.data == "menu_back":
-            await show_main_menu(update, context)
-        elif query.data.startswith("cat_"):
-            await CategoriesHandler.handle_category_selection(update, context)
-
-    except Exception as e:
-        logger.error(f"Error handling button click: {str(e)}", exc_info=True)
-        await handle_error(update, context, "Could not process your selection")
-
-
 async def handle_error(
     update: Update, context: ContextTypes.DEFAULT_TYPE, error_message: str
 ):
@@ -79,7 +64,7 @@ async def handle_error(
 
     try:
         keyboard = [
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu_back")]
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))]
         ]
 
         if update.callback_query:
@@ -97,45 +82,129 @@ async def handle_error(
         logger.error(f"Error in error handler: {str(e)}", exc_info=True)
 
 
+async def post_init(app: Application) -> None:
+    """Start hot reloading of data files and the event loop lag monitor"""
+    await start_watching(app)
+    await start_monitoring(app)
+
+
+async def post_shutdown(app: Application) -> None:
+    await stop_watching(app)
+    await stop_offload(app)
+
+
+def build_router() -> CallbackRouter:
+    """The router with every handler's buttons registered"""
+    router = CallbackRouter()
+    for handler in (
+        MenuHandler,
+        CategoriesHandler,
+        InfoHandler,
+        FindMeHandler,
+        TransportHubsHandler,
+        CityGuideHandler,
+    ):
+        handler.register_routes(router)
+    return router
+
+
+def build_application(builder=None) -> Application:
+    """The bot's Application with all handlers registered.
+
+    ``builder`` is an ApplicationBuilder with the token (and anything else)
+    already set; by default one for TOKEN.
+    """
+    if builder is None:
+        builder = Application.builder().token(TOKEN)
+
+    # Pick up data file updates without a restart; handle users concurrently
+    app = (
+        builder.post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .build()
+    )
+
+    # Add handlers in specific order
+    # 1. City Guide handlers
+    for handler in CityGuideHandler.get_handlers():
+        app.add_handler(handler)
+
+    # 2. Transport Hubs handler
+    for handler in TransportHubsHandler.get_handlers():
+        app.add_handler(handler)
+
+    # 3. Conversation handler for FindMe
+    app.add_handler(FindMeHandler.get_handler())
+
+    # 4. Every other button press, dispatched by its view; per-view
+    # metrics in app.bot_data["router"].stats()
+    router = build_router()
+    app.bot_data["router"] = router
+    app.add_handler(CallbackQueryHandler(router.dispatch))
+
+    # 5. Command handlers
+    for handler in MenuHandler.get_handlers():
+        app.add_handler(handler)
+
+    for handler in CategoriesHandler.get_handlers():
+        app.add_handler(handler)
+
+    for handler in InfoHandler.get_handlers():
+        app.add_handler(handler)
+
+    # 6. General message handler (lowest priority)
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+
+    # Add error handler
+    app.add_error_handler(handle_error)
+    return app
+
+
+def run_webhook(app: Application) -> None:
+    """Serve updates Telegram posts to WEBHOOK_URL, instead of polling for them.
+
+    The embedded server (python-telegram-bot's, on Tornado) answers on
+    WEBHOOK_LISTEN:WEBHOOK_PORT/WEBHOOK_PATH, registers the webhook with
+    Telegram on startup and rejects requests without WEBHOOK_SECRET.
+    """
+    if not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL must be set in webhook mode")
+    if not WEBHOOK_SECRET or not _SECRET_TOKEN.match(WEBHOOK_SECRET):
+        raise ValueError(
+            "WEBHOOK_SECRET must be set in webhook mode, 1-256 of A-Z, a-z, 0-9, _ and -"
+        )
+    logger.info(
+        f"Serving webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH} "
+        f"for {WEBHOOK_URL}"
+    )
+    app.run_webhook(
+        listen=WEBHOOK_LISTEN,
+        port=WEBHOOK_PORT,
+        url_path=WEBHOOK_PATH,
+        webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=ALLOWED_UPDATES,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
 def main():
     """Start the bot"""
     try:
         logger.info("Starting bot...")
-        app = Application.builder().token(TOKEN).build()
 
-        # Add handlers in specific order
-        # 1. City Guide handlers
-        for handler in CityGuideHandler.get_handlers():
-            app.add_handler(handler)
-
-        # 2. Transport Hubs handler
-        for handler in TransportHubsHandler.get_handlers():
-            app.add_handler(handler)
-
-        # 3. Conversation handler for FindMe
-        app.add_handler(FindMeHandler.get_handler())
-
-        # 4. General callback query handler (for other button clicks)
-        app.add_handler(CallbackQueryHandler(handle_callback))
-
-        # 5. Command handlers
-        for handler in MenuHandler.get_handlers():
-            app.add_handler(handler)
-
-        for handler in CategoriesHandler.get_handlers():
-            app.add_handler(handler)
-
-        for handler in InfoHandler.get_handlers():
-            app.add_handler(handler)
-
-        # 6. General message handler (lowest priority)
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
-
-        # Add error handler
-        app.add_error_handler(handle_error)
+        # Load location data once; handlers share these stores
+        load_store()
+        load_hub_store()
 
+        app = build_application()
         logger.info("Bot handlers registered successfully")
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+
+        if BOT_MODE == "webhook":
+            run_webhook(app)
+        else:
+            app.run_polling(allowed_updates=ALLOWED_UPDATES)
 
     except Exception as e:
         logger.error(f"Error starting bot: {str(e)}", exc_info=True)
@@ -0,0 +1,102 @@
+"""Encoding of the callback data carried by inline buttons.
+
+Callback data is ``<version>:<view>[:<arg>...]``, e.g. ``2:cp:hotels:3``
+for page 3 of the hotels category. The view id names the screen a button
+opens and the router looks it up in one dictionary; arguments are plain
+strings, converted by the route. Telegram allows 64 bytes.
+
+Buttons on messages sent before this scheme (``cat_hotels_3``,
+``hub_category_bus_terminal_0``, ``nav_guide``, ...) are still decoded,
+so old messages keep working after a deploy.
+"""
+from typing import Optional, Tuple
+
+CALLBACK_VERSION = "2"
+SEPARATOR = ":"
+MAX_CALLBACK_DATA = 64  # Bytes, Telegram's limit
+
+# View ids
+MAIN_MENU = "m"
+INFO = "i"
+CATEGORIES = "c"
+CATEGORY_PAGE = "cp"  # category, page (1-based)
+FINDME = "f"
+FINDME_CATEGORIES = "fc"
+FINDME_PAGE = "fp"  # "all" or category, page (1-based)
+HUBS = "h"
+HUB_CATEGORIES = "hc"
+HUB_PAGE = "hp"  # hub category, page (0-based)
+NEAREST_HUBS = "hn"
+GUIDE = "g"
+GUIDE_PAGE = "gp"  # page name, e.g. "safety" or "attractions_2"
+
+Decoded = Tuple[str, Tuple[str, ...]]
+
+# Callback data used before versioning, without arguments
+_LEGACY = {
+    "menu_back": MAIN_MENU,
+    "nav_info": INFO,
+    "nav_categories": CATEGORIES,
+    "nav_findme": FINDME,
+    "show_categories": FINDME_CATEGORIES,
+    "nav_transporthubs": HUBS,
+    "explore_hubs": HUB_CATEGORIES,
+    "find_nearest": NEAREST_HUBS,
+    "nav_guide": GUIDE,
+    "show_guide": GUIDE,
+}
+
+# ... and with arguments: prefix -> view
+_LEGACY_PREFIXES = {
+    "hub_category_": HUB_PAGE,
+    "guide_": GUIDE_PAGE,
+    "page_": FINDME_PAGE,
+    "cat_": CATEGORY_PAGE,
+}
+
+
+def encode(view: str, *args) -> str:
+    """Callback data for a button opening view with args"""
+    fields = [str(arg) for arg in args]
+    if any(SEPARATOR in field for field in fields):
+        raise ValueError(f"Callback argument contains {SEPARATOR!r}: {fields}")
+    data = SEPARATOR.join([CALLBACK_VERSION, view, *fields])
+    if len(data.encode("utf-8")) > MAX_CALLBACK_DATA:
+        raise ValueError(f"Callback data longer than {MAX_CALLBACK_DATA} bytes: {data}")
+    return data
+
+
+def _decode_legacy(data: str) -> Optional[Decoded]:
+    view = _LEGACY.get(data)
+    if view is not None:
+        return view, ()
+    for prefix, view in _LEGACY_PREFIXES.items():
+        if data.startswith(prefix):
+            rest = data[len(prefix):]
+            if view == GUIDE_PAGE:
+                return view, (rest,)
+            # <arg>_<page>; hub categories contain underscores themselves
+            arg, _, page = rest.rpartition("_")
+            return (view, (arg, page)) if arg else None
+    return None
+
+
+def decode(data: Optional[str]) -> Optional[Decoded]:
+    """(view, args) of callback data, or None if it can't be decoded"""
+    if not data:
+        return None
+    version, _, rest = data.partition(SEPARATOR)
+    if version == CALLBACK_VERSION:
+        view, *args = rest.split(SEPARATOR)
+        return view, tuple(args)
+    return _decode_legacy(data)
+
+
+def matches(view: str):
+    """Pattern for a CallbackQueryHandler taking the buttons of one view"""
+
+    def match(data) -> bool:
+        decoded = decode(data) if isinstance(data, str) else None
+        return decoded is not None and decoded[0] == view
+
+    return match
@@ -7,9 +7,57 @@ load_dotenv()
 # Bot token from environment variable
 TOKEN = os.getenv("TOKEN")
 
+# Serving mode: "polling" (default) or "webhook", where Telegram posts
+# updates to WEBHOOK_URL and an embedded HTTP server feeds them to the bot
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # Public HTTPS base URL, e.g. behind a reverse proxy
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+# Telegram sends it in X-Telegram-Bot-Api-Secret-Token; other requests are refused
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+CONCURRENT_UPDATES = 64  # Updates handled at once; one user's are still handled in order
+
 # Constants
 RADIUS_SEARCH = 2000  # 2km radius for Addis context
+GRID_CELL_SIZE = 1000  # Spatial index cell size in meters
+GEODESIC_REFINEMENT = True  # Exact geodesic distances for displayed results
+CURSOR_CACHE_SIZE = 1000  # Paginated searches kept in memory
+CURSOR_TTL = 15 * 60  # Seconds a search cursor stays valid
+RESULT_CACHE_SIZE = 2000  # Shared nearby results (one per location cell)
+RESULT_CACHE_CELL_SIZE = 50  # Location quantization for shared results, meters
+RENDER_CACHE_SIZE = 2000  # Rendered category and transport hub pages kept
+RENDER_CACHE_MAX_BYTES = 8 * 1024 * 1024  # Memory cap of the rendered pages
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "4"))  # Search threads; 0 runs searches on the event loop
+SEARCH_QUEUE_SIZE = 64  # Searches waiting for a thread before new ones are turned away
+LOAD_QUEUE_SIZE = 16  # Data file loads waiting for the load thread
+LOOP_LAG_INTERVAL = 0.05  # Seconds between event loop lag samples
+LOOP_LAG_WARNING = 0.25  # Event loop lag logged as a warning, seconds
+RELOAD_POLL_INTERVAL = 30  # Seconds between data file change checks
+RELOAD_SETTLE_TIME = 5  # Seconds a changed file must stay untouched before reloading
+STORE_BACKEND = os.getenv("STORE_BACKEND", "memory")  # "memory" or "sqlite" (large regions)
+SQLITE_ROW_CACHE_SIZE = 4096  # Place rows kept decoded by the SQLite backend
+STORE_CLOSE_DELAY = CURSOR_TTL + 60  # Seconds a replaced SQLite store stays open for cursors pinned to it
 MAX_RESULTS = 5
+# Overpass API mirrors; each query goes to the fastest healthy one
+OVERPASS_MIRRORS = [
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass.private.coffee/api/interpreter",
+]
+# Regions fetched from OpenStreetMap, (south, west, north, east) in degrees.
+# Each is split into tiles of at most OSM_TILE_SIZE degrees, fetched in
+# parallel; tiles that time out are quartered down to OSM_MIN_TILE_SIZE
+OSM_REGIONS = {
+    "Addis Ababa": (8.8, 38.6, 9.15, 39.0),  # Metro area incl. Akaki Kaliti and the eastern suburbs
+}
+OSM_TILE_SIZE = 0.2
+OSM_MIN_TILE_SIZE = 0.0125
+OSM_TILE_RETRIES = 3  # Retries of a failing tile before the fetch is given up
+OSM_CHECKPOINT_MAX_AGE = 6 * 60 * 60  # Seconds a failed full refresh can still be resumed
+PUBLISH_MAX_DROP = 0.2  # Refuse to publish when a category loses more than this share of its places
+PUBLISH_DROP_SLACK = 5  # Places any category may lose regardless of PUBLISH_MAX_DROP
 SUPPORTED_CATEGORIES = [
     "Hotels",
     "Restaurants",
@@ -23,5 +71,8 @@ SUPPORTED_CATEGORIES = [
     "Cultural"
 ]
 
-# Path to JSON data file
-LOCATIONS_FILE = "data/locations.json"
\ No newline at end of file
+# Paths to data files
+LOCATIONS_FILE = "data/locations.json"
+LOCATIONS_SNAPSHOT = "data/locations.bin"  # Binary snapshot the bot loads; JSON is for export
+LOCATIONS_DB = "data/locations.sqlite"  # Used when STORE_BACKEND is "sqlite"
+HUBS_FILE = "data/transport_hubs.json"
\ No newline at end of file
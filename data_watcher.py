@@ -0,0 +1,174 @@
+import asyncio
+import contextlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import (
+    LOCATIONS_SNAPSHOT,
+    LOCATIONS_DB,
+    HUBS_FILE,
+    RELOAD_POLL_INTERVAL,
+    RELOAD_SETTLE_TIME,
+    STORE_BACKEND,
+)
+from location_store import LocationStore, set_store, set_hub_store
+from offload import run_load
+from utils import setup_logger
+
+logger = setup_logger("data_watcher")
+
+
+def _signature(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime in ns, size) of a file, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+@dataclass
+class WatchedFile:
+    """A data file and the function that publishes a store built from it"""
+
+    path: str
+    key: str
+    publish: Callable[[LocationStore], None]
+    signature: Optional[Tuple[int, int]] = None
+
+
+class DataWatcher:
+    """Hot-reloads the shared stores when their data files change.
+
+    File mtimes are polled from an asyncio task (no inotify dependency). A
+    changed file is reloaded once it has been left alone for ``settle``
+    seconds, so a file still being written is not picked up half-way.
+    Parsing and index building run on the load thread (``offload``),
+    keeping the event loop free to answer users; only the final reference swap runs on
+    the loop. If the new file cannot be loaded the current snapshot stays
+    in place until the file changes again.
+    """
+
+    def __init__(
+        self,
+        files: List[WatchedFile],
+        interval: float = RELOAD_POLL_INTERVAL,
+        settle: float = RELOAD_SETTLE_TIME,
+    ):
+        self.files = files
+        self.interval = interval
+        self.settle = settle
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_duration: Optional[float] = None
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def start(self) -> None:
+        """Remember the current file versions and start polling"""
+        for watched in self.files:
+            watched.signature = _signature(watched.path)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(
+            f"Watching {', '.join(w.path for w in self.files)} "
+            f"every {self.interval}s"
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error(f"Error checking data files: {str(e)}", exc_info=True)
+
+    async def check(self) -> int:
+        """Reload every file that changed and has settled; returns how many"""
+        reloaded = 0
+        for watched in self.files:
+            signature = _signature(watched.path)
+            if signature is None or signature == watched.signature:
+                continue
+            if time.time() - signature[0] / 1e9 < self.settle:
+                continue
+            if await self.reload(watched, signature):
+                reloaded += 1
+        return reloaded
+
+    async def reload(
+        self, watched: WatchedFile, signature: Tuple[int, int] = None
+    ) -> bool:
+        """Build a store from the file off the event loop and publish it"""
+        watched.signature = signature or _signature(watched.path)
+        started = time.perf_counter()
+        try:
+            store = await run_load(
+                LocationStore.from_file, watched.path, watched.key, strict=True
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.error(
+                f"Reload of {watched.path} failed, keeping current data: {str(e)}"
+            )
+            return False
+
+        watched.publish(store)
+        duration = time.perf_counter() - started
+        self.reloads += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        logger.info(
+            f"Reloaded {len(store)} places from {watched.path} "
+            f"(version {store.version}) in {duration * 1000:.0f}ms"
+        )
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Reload counters and durations in seconds"""
+        return {
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "mean_duration": (
+                self.total_duration / self.reloads if self.reloads else None
+            ),
+        }
+
+
+_watcher = DataWatcher(
+    [
+        WatchedFile(
+            LOCATIONS_DB if STORE_BACKEND == "sqlite" else LOCATIONS_SNAPSHOT,
+            "locations",
+            set_store,
+        ),
+        WatchedFile(HUBS_FILE, "hubs", set_hub_store),
+    ]
+)
+
+
+async def start_watching(application=None) -> None:
+    """Start hot reloading of the data files (usable as a post_init hook)"""
+    _watcher.start()
+
+
+async def stop_watching(application=None) -> None:
+    """Stop hot reloading (usable as a post_shutdown hook)"""
+    await _watcher.stop()
+
+
+def reload_stats() -> Dict[str, Any]:
+    """Reload counters and durations of the shared watcher"""
+    return _watcher.stats()
@@ -3,12 +3,10 @@ from telegram.ext import (
     ContextTypes,
     CommandHandler,
     MessageHandler,
-    CallbackQueryHandler,
     filters,
 )
 from utils import (
     setup_logger,
-    get_nearby_places,
     show_results,
     handle_error,
     CATEGORY_EMOJIS,
@@ -16,11 +14,12 @@ from utils import (
     debug_log,
     format_distance,
 )
-from config import SUPPORTED_CATEGORIES, LOCATIONS_FILE
-import json
-from typing import List, Dict, Any
+from config import SUPPORTED_CATEGORIES
+from location_store import LocationStore, get_store
+from render_cache import RenderedPage, cached_page
+from callback_data import encode, CATEGORIES, CATEGORY_PAGE, MAIN_MENU
+from typing import Dict, Any, Mapping, Sequence
 from dataclasses import dataclass
-from datetime import datetime
 
 logger = setup_logger("categories_handler")
 
@@ -37,7 +36,7 @@ class Place:
     last_updated: str = None
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Place':
+    def from_dict(cls, data: Dict[str, Any], last_updated: str = None) -> 'Place':
         """Create Place instance from dictionary"""
         return cls(
             name=data.get('name', ''),
@@ -46,7 +45,7 @@ class Place:
             description=data.get('description', ''),
             opening_hours=data.get('opening_hours', ''),
             contact=data.get('contact', {}),
-            last_updated=datetime.now().isoformat()
+            last_updated=last_updated or data.get('last_updated')
         )
 
     def format_message(self) -> str:
@@ -82,36 +81,83 @@ class Place:
 class CategoryManager:
     """Manager for category-related operations"""
     
-    def __init__(self):
-        self.places: List[Place] = self._load_places()
+    def __init__(self, store: LocationStore = None):
+        self.store = store if store is not None else get_store()
 
-    def _load_places(self) -> List[Place]:
-        """Load places from JSON file"""
-        try:
-            with open(LOCATIONS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return [Place.from_dict(place) for place in data.get('locations', [])]
-        except Exception as e:
-            logger.error(f"Error loading places: {str(e)}")
-            return []
+    def get_places_by_category(self, category: str) -> Sequence[Mapping[str, Any]]:
+        """Get places filtered by category (a lazy sequence of store views)"""
+        return self.store.by_category(category)
 
-    def get_places_by_category(self, category: str) -> List[Place]:
-        """Get places filtered by category"""
-        return [place for place in self.places if place.category.lower() == category.lower()]
+    def to_place(self, place: Mapping[str, Any]) -> Place:
+        """Place for display, stamped with the store's load time"""
+        return Place.from_dict(place, last_updated=self.store.loaded_at)
 
     def get_categories_count(self) -> Dict[str, int]:
         """Get count of places in each category"""
-        counts = {}
-        for place in self.places:
-            counts[place.category] = counts.get(place.category, 0) + 1
-        return counts
+        return self.store.category_counts()
+
+
+def render_category_page(
+    category_manager: CategoryManager, category: str, page: int
+) -> RenderedPage:
+    """One page of a category's places, with its navigation buttons"""
+    places = category_manager.get_places_by_category(category)
+    
+    if not places:
+        return RenderedPage(
+            f"No places found in category: {category.title()}",
+            InlineKeyboardMarkup([[
+                InlineKeyboardButton("🔙 Back to Categories", callback_data=encode(CATEGORIES))
+            ]]),
+        )
+    
+    # Calculate pagination
+    items_per_page = 5
+    total_pages = (len(places) + items_per_page - 1) // items_per_page
+    start_idx = (page - 1) * items_per_page
+    end_idx = start_idx + items_per_page
+    
+    # Format message
+    emoji = get_category_emoji(category.title())
+    parts = [
+        f"{emoji} *{category.title()}*\n"
+        f"Page {page} of {total_pages}\n"
+        f"Total places: {len(places)}\n\n"
+    ]
+    
+    # Add place information
+    for place in places[start_idx:end_idx]:
+        parts.append(category_manager.to_place(place).format_message() + "\n")
+    
+    # Create navigation buttons
+    keyboard = []
+    nav_row = []
+    
+    if page > 1:
+        nav_row.append(InlineKeyboardButton(
+            "◀️ Previous",
+            callback_data=encode(CATEGORY_PAGE, category.lower(), page - 1)
+        ))
+    
+    if page < total_pages:
+        nav_row.append(InlineKeyboardButton(
+            "Next ▶️",
+            callback_data=encode(CATEGORY_PAGE, category.lower(), page + 1)
+        ))
+    
+    if nav_row:
+        keyboard.append(nav_row)
+    
+    keyboard.append([InlineKeyboardButton(
+        "🔙 Back to Categories",
+        callback_data=encode(CATEGORIES)
+    )])
+    
+    return RenderedPage("".join(parts), InlineKeyboardMarkup(keyboard))
 
 
 class CategoriesHandler:
     """Handler for categories functionality"""
-    
-    def __init__(self):
-        self.category_manager = CategoryManager()
 
     @staticmethod
     async def show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -133,12 +179,12 @@ class CategoriesHandler:
                     count = category_counts.get(category, 0)
                     row.append(InlineKeyboardButton(
                         f"{emoji} {category} ({count})",
-                        callback_data=f"cat_{category.lower()}_1"
+                        callback_data=encode(CATEGORY_PAGE, category.lower(), 1)
                     ))
                 keyboard.append(row)
             
             # Add back button
-            keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu_back")])
+            keyboard.append([InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))])
             
             message = (
                 "🏢 *Categories*\n\n"
@@ -166,78 +212,29 @@ class CategoriesHandler:
             await handle_error(update, "Could not show categories")
 
     @staticmethod
-    async def handle_category_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def handle_category_selection(
+        update: Update, context: ContextTypes.DEFAULT_TYPE, category: str, page: int
+    ):
         """Handle category selection and show places"""
         try:
             query = update.callback_query
-            await query.answer()
-            
-            # Parse callback data: cat_category_page
-            _, category, page = query.data.split("_")
-            page = int(page)
             
             logger.info(f"Selected category: {category}, Page: {page}")
             
-            # Get places for category
+            # Same page of the same snapshot is rendered once; the manager
+            # pins the current store, so render and key agree after a reload
             category_manager = CategoryManager()
-            places = category_manager.get_places_by_category(category)
-            
-            if not places:
-                await query.message.edit_text(
-                    f"No places found in category: {category.title()}",
-                    reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Back to Categories", callback_data="nav_categories")
-                    ]]),
-                    parse_mode='Markdown'
-                )
-                return
-            
-            # Calculate pagination
-            items_per_page = 5
-            total_pages = (len(places) + items_per_page - 1) // items_per_page
-            start_idx = (page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            current_places = places[start_idx:end_idx]
-            
-            # Format message
-            emoji = get_category_emoji(category.title())
-            message = (
-                f"{emoji} *{category.title()}*\n"
-                f"Page {page} of {total_pages}\n"
-                f"Total places: {len(places)}\n\n"
+            rendered = cached_page(
+                "category",
+                category,
+                page,
+                category_manager.store.version,
+                lambda: render_category_page(category_manager, category, page),
             )
             
-            # Add place information
-            for place in current_places:
-                message += place.format_message() + "\n"
-            
-            # Create navigation buttons
-            keyboard = []
-            nav_row = []
-            
-            if page > 1:
-                nav_row.append(InlineKeyboardButton(
-                    "◀️ Previous",
-                    callback_data=f"cat_{category.lower()}_{page-1}"
-                ))
-            
-            if page < total_pages:
-                nav_row.append(InlineKeyboardButton(
-                    "Next ▶️",
-                    callback_data=f"cat_{category.lower()}_{page+1}"
-                ))
-            
-            if nav_row:
-                keyboard.append(nav_row)
-            
-            keyboard.append([InlineKeyboardButton(
-                "🔙 Back to Categories",
-                callback_data="nav_categories"
-            )])
-            
             await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                rendered.text,
+                reply_markup=rendered.reply_markup,
                 parse_mode='Markdown'
             )
             
@@ -254,8 +251,10 @@ class CategoriesHandler:
                 filters.Regex("^📋 Categories$"),
                 CategoriesHandler.show_categories
             ),
-            CallbackQueryHandler(
-                CategoriesHandler.handle_category_selection,
-                pattern="^cat_"
-            ),
         ]
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons"""
+        router.add(CATEGORIES, CategoriesHandler.show_categories)
+        router.add(CATEGORY_PAGE, CategoriesHandler.handle_category_selection, str, int)
@@ -1,13 +1,17 @@
 import json
 import os
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from telegram.ext import ContextTypes, CommandHandler
 from utils import setup_logger
-from typing import Dict, Any, List
+from callback_data import encode, GUIDE, GUIDE_PAGE, MAIN_MENU
+from render_cache import RenderedPage
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 
 logger = setup_logger("city_guide_handler")
 
+ATTRACTIONS_PER_PAGE = 3
+
 
 @dataclass
 class GuideData:
@@ -32,305 +36,307 @@ class GuideData:
             raise
 
 
-class CityGuideHandler:
-    """Handler for city guide functionality"""
-
-    def __init__(self):
-        try:
-            self.guide_data = GuideData.load_guide_data()
-        except Exception as e:
-            logger.error(f"Failed to load guide data: {str(e)}")
-            self.guide_data = None
-
-    async def show_attractions(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1
-    ):
-        """Show attractions with pagination"""
-        try:
-            query = update.callback_query
-            await query.answer()  # Acknowledge the callback query
-
-            items_per_page = 3
-            attractions = self.guide_data.attractions
-            total_pages = (len(attractions) + items_per_page - 1) // items_per_page
-            start_idx = (page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            current_attractions = attractions[start_idx:end_idx]
-
-            message = (
-                f"🏛 *Top Attractions in Addis Ababa*\nPage {page} of {total_pages}\n\n"
-            )
-
-            for attraction in current_attractions:
-                message += (
-                    f"{attraction['emoji']} *{attraction['name']}*\n"
-                    f"📝 {attraction['description']}\n"
+BACK_TO_GUIDE = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("🔙 Back to Guide", callback_data=encode(GUIDE))]]
+)
+
+GUIDE_MENU = RenderedPage(
+    "🌟 *Welcome to Addis Ababa City Guide*\n\n"
+    "Discover Ethiopia's capital city:\n"
+    "• Historical attractions and landmarks\n"
+    "• Different areas of the city\n"
+    "• Getting around\n"
+    "• Essential tips and phrases\n\n"
+    "Select a category to explore:",
+    InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton(
+                    "🏛 Top Attractions", callback_data=encode(GUIDE_PAGE, "attractions_1")
                 )
-                if "opening_hours" in attraction:
-                    message += f"🕒 {attraction['opening_hours']}\n"
-                if "entry_fee" in attraction:
-                    message += f"💰 Entry: {attraction['entry_fee']}\n"
-                if "highlights" in attraction:
-                    message += "\n✨ Highlights:\n"
-                    for highlight in attraction["highlights"]:
-                        message += f"• {highlight}\n"
-                if "tips" in attraction:
-                    message += "\n💡 Tips:\n"
-                    for tip in attraction["tips"]:
-                        message += f"• {tip}\n"
-                message += "\n"
-
-            keyboard = []
-            nav_row = []
-
-            if page > 1:
-                nav_row.append(
-                    InlineKeyboardButton(
-                        "◀️ Previous", callback_data=f"guide_attractions_{page - 1}"
-                    )
+            ],
+            [
+                InlineKeyboardButton(
+                    "🏙 Explore Subcities", callback_data=encode(GUIDE_PAGE, "subcities")
                 )
-            if page < total_pages:
-                nav_row.append(
-                    InlineKeyboardButton(
-                        "Next ▶️", callback_data=f"guide_attractions_{page + 1}"
-                    )
+            ],
+            [
+                InlineKeyboardButton(
+                    "🚇 Transportation Guide", callback_data=encode(GUIDE_PAGE, "transport")
                 )
+            ],
+            [InlineKeyboardButton("🛡 Safety & Tips", callback_data=encode(GUIDE_PAGE, "safety"))],
+            [
+                InlineKeyboardButton(
+                    "💬 Useful Phrases", callback_data=encode(GUIDE_PAGE, "phrases")
+                )
+            ],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))],
+        ]
+    ),
+)
+
+
+def render_attractions(guide_data: GuideData, page: int) -> RenderedPage:
+    """One page of attractions, with previous/next buttons"""
+    attractions = guide_data.attractions
+    total_pages = (len(attractions) + ATTRACTIONS_PER_PAGE - 1) // ATTRACTIONS_PER_PAGE
+    start_idx = (page - 1) * ATTRACTIONS_PER_PAGE
+    current_attractions = attractions[start_idx : start_idx + ATTRACTIONS_PER_PAGE]
+
+    message = f"🏛 *Top Attractions in Addis Ababa*\nPage {page} of {total_pages}\n\n"
+
+    for attraction in current_attractions:
+        message += (
+            f"{attraction['emoji']} *{attraction['name']}*\n"
+            f"📝 {attraction['description']}\n"
+        )
+        if "opening_hours" in attraction:
+            message += f"🕒 {attraction['opening_hours']}\n"
+        if "entry_fee" in attraction:
+            message += f"💰 Entry: {attraction['entry_fee']}\n"
+        if "highlights" in attraction:
+            message += "\n✨ Highlights:\n"
+            for highlight in attraction["highlights"]:
+                message += f"• {highlight}\n"
+        if "tips" in attraction:
+            message += "\n💡 Tips:\n"
+            for tip in attraction["tips"]:
+                message += f"• {tip}\n"
+        message += "\n"
 
-            if nav_row:
-                keyboard.append(nav_row)
-            keyboard.append(
-                [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-            )
+    keyboard = []
+    nav_row = []
 
-            await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
+    if page > 1:
+        nav_row.append(
+            InlineKeyboardButton(
+                "◀️ Previous", callback_data=encode(GUIDE_PAGE, f"attractions_{page - 1}")
             )
+        )
+    if page < total_pages:
+        nav_row.append(
+            InlineKeyboardButton(
+                "Next ▶️", callback_data=encode(GUIDE_PAGE, f"attractions_{page + 1}")
+            )
+        )
+
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("🔙 Back to Guide", callback_data=encode(GUIDE))])
+
+    return RenderedPage(message, InlineKeyboardMarkup(keyboard))
+
+
+def render_subcities(guide_data: GuideData) -> RenderedPage:
+    """Subcities with their main areas, highlights and transportation"""
+    message = "🏙 *Addis Ababa Subcities*\n\n"
+
+    for name, info in guide_data.subcities.items():
+        message += (
+            f"*{name}*\n"
+            f"📝 {info['description']}\n"
+            f"📍 Main areas: {info['main_areas']}\n"
+        )
+        if "highlights" in info:
+            message += "\n✨ Highlights:\n"
+            for highlight in info["highlights"]:
+                message += f"• {highlight}\n"
+        if "transportation" in info:
+            message += "\n🚗 Transportation:\n"
+            for transport in info["transportation"]:
+                message += f"• {transport}\n"
+        message += "\n"
+
+    return RenderedPage(message, BACK_TO_GUIDE)
+
+
+def render_transport(guide_data: GuideData) -> RenderedPage:
+    """Public transport and taxis"""
+    transport_info = guide_data.transport_info
+    message = "🚇 *Transportation Guide*\n\n"
+
+    # Public Transport
+    message += "*Public Transport:*\n"
+    for transport in transport_info.get("public_transport", []):
+        message += f"🚍 *{transport['type']}*\n📝 {transport['description']}\n"
+        if "operating_hours" in transport:
+            message += f"🕒 Operating Hours: {transport['operating_hours']}\n"
+        if "fare_range" in transport:
+            message += f"💰 Fare Range: {transport['fare_range']}\n"
+        if "routes" in transport:
+            message += "\n🛤 Routes:\n"
+            for route in transport["routes"]:
+                message += f"• {route}\n"
+        if "tips" in transport:
+            message += "\n💡 Tips:\n"
+            for tip in transport["tips"]:
+                message += f"• {tip}\n"
+        message += "\n"
+
+    # Taxis
+    message += "*Taxis:*\n"
+    for taxi in transport_info.get("taxis", []):
+        message += f"🚖 *{taxi['type']}*\n📝 {taxi['description']}\n"
+        if "fare_range" in taxi:
+            message += f"💰 Fare Range: {taxi['fare_range']}\n"
+        if "available_apps" in taxi:
+            message += "\n📱 Available Apps:\n"
+            for app in taxi["available_apps"]:
+                message += f"• {app}\n"
+        if "tips" in taxi:
+            message += "\n💡 Tips:\n"
+            for tip in taxi["tips"]:
+                message += f"• {tip}\n"
+        message += "\n"
 
-        except Exception as e:
-            logger.error(f"Error showing attractions: {str(e)}")
-            await self._handle_error(update, "Could not show attractions")
+    return RenderedPage(message, BACK_TO_GUIDE)
 
-    async def show_subcities(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show subcities information"""
-        try:
-            query = update.callback_query
-            await query.answer()  # Acknowledge the callback query
 
-            message = "🏙 *Addis Ababa Subcities*\n\n"
+def render_safety(guide_data: GuideData) -> RenderedPage:
+    """Safety tips and emergency numbers"""
+    safety = guide_data.safety_tips
+    message = "🛡 *Safety Tips for Addis Ababa*\n\n"
 
-            for name, info in self.guide_data.subcities.items():
-                message += (
-                    f"*{name}*\n"
-                    f"📝 {info['description']}\n"
-                    f"📍 Main areas: {info['main_areas']}\n"
-                )
-                if "highlights" in info:
-                    message += "\n✨ Highlights:\n"
-                    for highlight in info["highlights"]:
-                        message += f"• {highlight}\n"
-                if "transportation" in info:
-                    message += "\n🚗 Transportation:\n"
-                    for transport in info["transportation"]:
-                        message += f"• {transport}\n"
-                message += "\n"
-
-            keyboard = [
-                [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-            ]
+    message += "*General Safety:*\n"
+    for tip in safety["general_safety"]:
+        message += f"• {tip}\n"
 
-            await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
+    message += "\n*Health Safety:*\n"
+    for tip in safety["health_safety"]:
+        message += f"• {tip}\n"
 
-        except Exception as e:
-            logger.error(f"Error showing subcities: {str(e)}")
-            await self._handle_error(update, "Could not show subcities")
+    message += "\n*📞 Emergency Numbers:*\n"
+    for service, number in safety["emergency_numbers"].items():
+        message += f"• {service}: `{number}`\n"
 
-    async def show_transport(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show transportation information"""
-        try:
-            query = update.callback_query
-            await query.answer()  # Acknowledge the callback query
-
-            transport_info = self.guide_data.transport_info
-            message = "🚇 *Transportation Guide*\n\n"
-
-            # Public Transport
-            message += "*Public Transport:*\n"
-            for transport in transport_info.get("public_transport", []):
-                message += f"🚍 *{transport['type']}*\n📝 {transport['description']}\n"
-                if "operating_hours" in transport:
-                    message += f"🕒 Operating Hours: {transport['operating_hours']}\n"
-                if "fare_range" in transport:
-                    message += f"💰 Fare Range: {transport['fare_range']}\n"
-                if "routes" in transport:
-                    message += "\n🛤 Routes:\n"
-                    for route in transport["routes"]:
-                        message += f"• {route}\n"
-                if "tips" in transport:
-                    message += "\n💡 Tips:\n"
-                    for tip in transport["tips"]:
-                        message += f"• {tip}\n"
-                message += "\n"
-
-            # Taxis
-            message += "*Taxis:*\n"
-            for taxi in transport_info.get("taxis", []):
-                message += f"🚖 *{taxi['type']}*\n📝 {taxi['description']}\n"
-                if "fare_range" in taxi:
-                    message += f"💰 Fare Range: {taxi['fare_range']}\n"
-                if "available_apps" in taxi:
-                    message += "\n📱 Available Apps:\n"
-                    for app in taxi["available_apps"]:
-                        message += f"• {app}\n"
-                if "tips" in taxi:
-                    message += "\n💡 Tips:\n"
-                    for tip in taxi["tips"]:
-                        message += f"• {tip}\n"
-                message += "\n"
-
-            keyboard = [
-                [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-            ]
+    return RenderedPage(message, BACK_TO_GUIDE)
 
-            await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
 
-        except KeyError as e:
-            logger.error(f"Error showing transport info: Missing key {str(e)}")
-            await self._handle_error(update, f"Missing transport information: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error showing transport info: {str(e)}")
-            await self._handle_error(update, "Could not show transport information")
+def render_phrases(guide_data: GuideData) -> RenderedPage:
+    """Useful Amharic phrases"""
+    message = "💬 *Useful Amharic Phrases*\n\n"
 
-    async def show_safety(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show safety tips"""
-        try:
-            query = update.callback_query
-            await query.answer()  # Acknowledge the callback query
+    for phrase in guide_data.useful_phrases["Amharic"]:
+        message += (
+            f"*{phrase['phrase']}*\n"
+            f"🗣 Pronunciation: _{phrase['pronunciation']}_\n"
+            f"🔤 Meaning: {phrase['meaning']}\n\n"
+        )
 
-            safety = self.guide_data.safety_tips
-            message = "🛡 *Safety Tips for Addis Ababa*\n\n"
+    return RenderedPage(message, BACK_TO_GUIDE)
 
-            message += "*General Safety:*\n"
-            for tip in safety["general_safety"]:
-                message += f"• {tip}\n"
 
-            message += "\n*Health Safety:*\n"
-            for tip in safety["health_safety"]:
-                message += f"• {tip}\n"
+def render_pages(guide_data: GuideData) -> Dict[str, RenderedPage]:
+    """Every guide page, keyed by its name (``subcities``, ``attractions_2``, ...).
 
-            message += "\n*📞 Emergency Numbers:*\n"
-            for service, number in safety["emergency_numbers"].items():
-                message += f"• {service}: `{number}`\n"
+    A page that can't be rendered (a malformed entry in the guide data) is
+    logged and left out, so its button shows an error instead.
+    """
+    renderers = {
+        "subcities": render_subcities,
+        "transport": render_transport,
+        "safety": render_safety,
+        "phrases": render_phrases,
+    }
+    total_pages = (
+        len(guide_data.attractions) + ATTRACTIONS_PER_PAGE - 1
+    ) // ATTRACTIONS_PER_PAGE
+    for page in range(1, max(total_pages, 1) + 1):
+        renderers[f"attractions_{page}"] = (
+            lambda data, page=page: render_attractions(data, page)
+        )
 
-            keyboard = [
-                [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-            ]
+    pages = {}
+    for key, render in renderers.items():
+        try:
+            pages[key] = render(guide_data)
+        except Exception as e:
+            logger.error(f"Error rendering guide page {key}: {str(e)}")
+    return pages
 
-            await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
 
-        except Exception as e:
-            logger.error(f"Error showing safety tips: {str(e)}")
-            await self._handle_error(update, "Could not show safety tips")
+class CityGuideHandler:
+    """Handler for city guide functionality.
+
+    The guide data is read once, when the handler is created, and every
+    page is rendered then; showing a page is a lookup and an edit of the
+    message. Use the shared handler from ``get_guide_handler``.
+    """
+
+    # Message shown when a page is missing, by page name
+    ERRORS = {
+        "subcities": "Could not show subcities",
+        "transport": "Could not show transport information",
+        "safety": "Could not show safety tips",
+        "phrases": "Could not show useful phrases",
+    }
+
+    def __init__(self, guide_data: Optional[GuideData] = None):
+        if guide_data is None:
+            try:
+                guide_data = GuideData.load_guide_data()
+            except Exception as e:
+                logger.error(f"Failed to load guide data: {str(e)}")
+        self.guide_data = guide_data
+        self.pages = render_pages(guide_data) if guide_data else {}
 
-    async def show_phrases(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show useful phrases"""
+    @classmethod
+    def _error_message(cls, key: str) -> str:
+        if key.startswith("attractions_"):
+            return "Could not show attractions"
+        return cls.ERRORS.get(key, "Could not show city guide")
+
+    async def show_page(self, update: Update, context: ContextTypes.DEFAULT_TYPE, key: str):
+        """Show a pre-rendered page by name"""
+        query = update.callback_query
+        page = self.pages.get(key)
+        if page is None:
+            logger.error(f"Guide page {key} not available")
+            await self._handle_error(update, self._error_message(key))
+            return
         try:
-            query = update.callback_query
-            await query.answer()  # Acknowledge the callback query
+            await query.message.edit_text(
+                page.text, reply_markup=page.reply_markup, parse_mode="Markdown"
+            )
+        except Exception as e:
+            logger.error(f"Error showing {key}: {str(e)}")
+            await self._handle_error(update, self._error_message(key))
 
-            phrases = self.guide_data.useful_phrases["Amharic"]
-            message = "💬 *Useful Amharic Phrases*\n\n"
+    async def show_attractions(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1
+    ):
+        """Show attractions with pagination"""
+        await self.show_page(update, context, f"attractions_{page}")
 
-            for phrase in phrases:
-                message += (
-                    f"*{phrase['phrase']}*\n"
-                    f"🗣 Pronunciation: _{phrase['pronunciation']}_\n"
-                    f"🔤 Meaning: {phrase['meaning']}\n\n"
-                )
+    async def show_subcities(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show subcities information"""
+        await self.show_page(update, context, "subcities")
 
-            keyboard = [
-                [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-            ]
+    async def show_transport(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show transportation information"""
+        await self.show_page(update, context, "transport")
 
-            await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
-                parse_mode="Markdown",
-            )
+    async def show_safety(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show safety tips"""
+        await self.show_page(update, context, "safety")
 
-        except Exception as e:
-            logger.error(f"Error showing phrases: {str(e)}")
-            await self._handle_error(update, "Could not show useful phrases")
+    async def show_phrases(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show useful phrases"""
+        await self.show_page(update, context, "phrases")
 
     @staticmethod
     async def show_guide(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show city guide main menu"""
         try:
-            # First acknowledge the callback query if it exists
-            if update.callback_query:
-                await update.callback_query.answer()
-
-            keyboard = [
-                [
-                    InlineKeyboardButton(
-                        "🏛 Top Attractions", callback_data="guide_attractions_1"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🏙 Explore Subcities", callback_data="guide_subcities"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🚇 Transportation Guide", callback_data="guide_transport"
-                    )
-                ],
-                [InlineKeyboardButton("🛡 Safety & Tips", callback_data="guide_safety")],
-                [
-                    InlineKeyboardButton(
-                        "💬 Useful Phrases", callback_data="guide_phrases"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        "🔙 Back to Main Menu", callback_data="menu_back"
-                    )
-                ],
-            ]
-
-            message = (
-                "🌟 *Welcome to Addis Ababa City Guide*\n\n"
-                "Discover Ethiopia's capital city:\n"
-                "• Historical attractions and landmarks\n"
-                "• Different areas of the city\n"
-                "• Getting around\n"
-                "• Essential tips and phrases\n\n"
-                "Select a category to explore:"
-            )
-
-            markup = InlineKeyboardMarkup(keyboard)
-
+            text, markup = GUIDE_MENU
             if update.callback_query:
                 await update.callback_query.message.edit_text(
-                    text=message, reply_markup=markup, parse_mode="Markdown"
+                    text=text, reply_markup=markup, parse_mode="Markdown"
                 )
             else:
                 await update.message.reply_text(
-                    text=message, reply_markup=markup, parse_mode="Markdown"
+                    text=text, reply_markup=markup, parse_mode="Markdown"
                 )
 
         except Exception as e:
@@ -340,47 +346,38 @@ class CityGuideHandler:
     @staticmethod
     async def _handle_error(update: Update, message: str):
         """Handle errors in city guide"""
-        keyboard = [
-            [InlineKeyboardButton("🔙 Back to Guide", callback_data="show_guide")]
-        ]
         if update.callback_query:
             await update.callback_query.message.edit_text(
-                f"⚠️ {message}", reply_markup=InlineKeyboardMarkup(keyboard)
+                f"⚠️ {message}", reply_markup=BACK_TO_GUIDE
             )
         else:
-            await update.message.reply_text(
-                f"⚠️ {message}", reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+            await update.message.reply_text(f"⚠️ {message}", reply_markup=BACK_TO_GUIDE)
 
     @staticmethod
     def get_handlers():
         """Return the handlers for this functionality"""
         try:
-            guide_handler = CityGuideHandler()
-            return [
-                CommandHandler("guide", guide_handler.show_guide),
-                CallbackQueryHandler(
-                    guide_handler.show_guide, pattern="^(nav_guide|show_guide)$"
-                ),
-                CallbackQueryHandler(
-                    lambda u, c: guide_handler.show_attractions(
-                        u, c, int(u.callback_query.data.split("_")[2])
-                    ),
-                    pattern="^guide_attractions_\d+$",
-                ),
-                CallbackQueryHandler(
-                    guide_handler.show_subcities, pattern="^guide_subcities$"
-                ),
-                CallbackQueryHandler(
-                    guide_handler.show_transport, pattern="^guide_transport$"
-                ),
-                CallbackQueryHandler(
-                    guide_handler.show_safety, pattern="^guide_safety$"
-                ),
-                CallbackQueryHandler(
-                    guide_handler.show_phrases, pattern="^guide_phrases$"
-                ),
-            ]
+            guide_handler = get_guide_handler()
+            return [CommandHandler("guide", guide_handler.show_guide)]
         except Exception as e:
             logger.error(f"Error setting up guide handlers: {str(e)}", exc_info=True)
             return []
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons"""
+        guide_handler = get_guide_handler()
+        router.add(GUIDE, guide_handler.show_guide)
+        router.add(GUIDE_PAGE, guide_handler.show_page, str)
+
+
+_guide_handler: Optional[CityGuideHandler] = None
+
+
+def get_guide_handler() -> CityGuideHandler:
+    """Return the shared guide handler, loading the guide on first use"""
+    global _guide_handler
+    if _guide_handler is None:
+        _guide_handler = CityGuideHandler()
+        logger.info(f"Loaded city guide: {len(_guide_handler.pages)} pages rendered")
+    return _guide_handler
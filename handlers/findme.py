@@ -14,11 +14,20 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters,
 )
-from utils import setup_logger, get_nearby_places, handle_error, format_distance
-from config import RADIUS_SEARCH, SUPPORTED_CATEGORIES
-import json
-import os
-from math import radians, sin, cos, sqrt, atan2
+from utils import setup_logger, handle_error, format_distance
+from config import RADIUS_SEARCH, SUPPORTED_CATEGORIES, GEODESIC_REFINEMENT
+from geo import refine_distances
+from location_store import get_store
+from search_cache import get_cursor
+from offload import BUSY_MESSAGE, PoolBusy, run_search
+from callback_data import (
+    encode,
+    matches,
+    FINDME,
+    FINDME_CATEGORIES,
+    FINDME_PAGE,
+    MAIN_MENU,
+)
 
 logger = setup_logger("findme_handler")
 
@@ -27,71 +36,64 @@ ITEMS_PER_PAGE = 6  # Number of items per page
 
 # States
 LOCATION = 1
-CATEGORY_SELECTION = 2
 
 
 class FindMeHandler:
     """Handler for Find Nearby Places functionality"""
 
-    def __init__(self):
-        self.locations = self.load_locations()
-
     @staticmethod
-    def load_locations():
-        """Load locations from JSON file"""
+    def get_nearest_places(latitude, longitude, count, category=None):
+        """Get the closest places regardless of radius, distances in meters"""
         try:
-            with open("data/locations.json", "r", encoding="utf-8") as f:
-                return json.load(f)["locations"]
+            return get_store().nearest(latitude, longitude, count, category=category)
         except Exception as e:
-            logger.error(f"Error loading locations: {str(e)}")
+            logger.error(f"Error getting nearest places: {str(e)}")
             return []
 
     @staticmethod
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        """Calculate distance between two points in kilometers"""
-        R = 6371  # Earth's radius in kilometers
-
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-
-        a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        distance = R * c
-
-        return distance
+    def page_places(latitude, longitude, places):
+        """Prepare the places shown on one page for display"""
+        if GEODESIC_REFINEMENT:
+            refine_distances(latitude, longitude, places)
+        return places
 
     @staticmethod
-    def get_nearby_places(latitude, longitude, radius_meters):
-        """Get nearby places within specified radius"""
-        try:
-            handler = FindMeHandler()
-            nearby_places = []
-            radius_km = radius_meters / 1000  # Convert to kilometers
-
-            for place in handler.locations:
-                if not place.get("coordinates"):
-                    continue
-
-                distance = handler.calculate_distance(
-                    latitude,
-                    longitude,
-                    place["coordinates"]["latitude"],
-                    place["coordinates"]["longitude"],
-                )
-
-                if distance <= radius_km:
-                    place_copy = place.copy()
-                    place_copy["distance"] = distance
-                    nearby_places.append(place_copy)
-
-            # Sort by distance
-            nearby_places.sort(key=lambda x: x["distance"])
-            return nearby_places, "OK"
+    def search_page(user_id, latitude, longitude, category, page):
+        """(places on a page of a user's search, page count, whether any were in range).
+
+        CPU-bound: run on the search pool. With nothing inside the radius
+        the closest places are returned instead, as a single page.
+        """
+        cursor = get_cursor(user_id, latitude, longitude, category, RADIUS_SEARCH)
+        if len(cursor):
+            places = cursor.page(page, ITEMS_PER_PAGE)
+            total_pages = cursor.total_pages(ITEMS_PER_PAGE)
+            found = True
+        else:
+            places = FindMeHandler.get_nearest_places(
+                latitude, longitude, ITEMS_PER_PAGE, category=category
+            )
+            total_pages = 1
+            found = False
+        return FindMeHandler.page_places(latitude, longitude, places), total_pages, found
 
-        except Exception as e:
-            logger.error(f"Error getting nearby places: {str(e)}")
-            return [], "ERROR"
+    @staticmethod
+    def format_place(place):
+        """Format a single search result for display"""
+        text = f"📍 *{place['name']}*\n"
+        text += f"🏢 Category: {place['category']}\n"
+        text += f"📏 Distance: {place['distance'] / 1000:.1f}km\n"
+        if place.get("description"):
+            text += f"ℹ️ {place['description']}\n"
+        if place.get("opening_hours"):
+            text += f"🕒 {place['opening_hours']}\n"
+        if place.get("contact"):
+            contact = place["contact"]
+            if contact.get("phone"):
+                text += f"📞 {contact['phone']}\n"
+            if contact.get("website"):
+                text += f"🌐 {contact['website']}\n"
+        return text + "\n"
 
     @staticmethod
     async def start_findme(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -160,37 +162,25 @@ class FindMeHandler:
                 "🔍 Finding places near you...", reply_markup=ReplyKeyboardRemove()
             )
 
-            # Get nearby places
-            places, status = FindMeHandler.get_nearby_places(
-                location.latitude, location.longitude, RADIUS_SEARCH
+            # Search once, off the event loop; later pages are served from
+            # the cached cursor
+            page = 1
+            current_places, total_pages, found = await run_search(
+                FindMeHandler.search_page,
+                user.id,
+                location.latitude,
+                location.longitude,
+                None,
+                page,
             )
 
-            if status == "OK" and places:
+            if found:
                 # Show first page of results
-                page = 1
-                start_idx = (page - 1) * ITEMS_PER_PAGE
-                end_idx = start_idx + ITEMS_PER_PAGE
-                current_places = places[start_idx:end_idx]
-                total_pages = (len(places) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
-
                 response = (
                     f"🎯 *Nearest Places to You*\nPage {page} of {total_pages}\n\n"
                 )
                 for place in current_places:
-                    response += f"📍 *{place['name']}*\n"
-                    response += f"🏢 Category: {place['category']}\n"
-                    response += f"📏 Distance: {place['distance']:.1f}km\n"
-                    if place.get("description"):
-                        response += f"ℹ️ {place['description']}\n"
-                    if place.get("opening_hours"):
-                        response += f"🕒 {place['opening_hours']}\n"
-                    if place.get("contact"):
-                        contact = place["contact"]
-                        if contact.get("phone"):
-                            response += f"📞 {contact['phone']}\n"
-                        if contact.get("website"):
-                            response += f"🌐 {contact['website']}\n"
-                    response += "\n"
+                    response += FindMeHandler.format_place(place)
 
                 # Create navigation buttons
                 keyboard = []
@@ -199,7 +189,8 @@ class FindMeHandler:
                 if page < total_pages:
                     nav_row.append(
                         InlineKeyboardButton(
-                            "See More ▶️", callback_data=f"page_all_{page + 1}"
+                            "See More ▶️",
+                            callback_data=encode(FINDME_PAGE, "all", page + 1),
                         )
                     )
 
@@ -211,17 +202,18 @@ class FindMeHandler:
                     [
                         [
                             InlineKeyboardButton(
-                                "📋 Browse by Category", callback_data="show_categories"
+                                "📋 Browse by Category",
+                                callback_data=encode(FINDME_CATEGORIES),
                             )
                         ],
                         [
                             InlineKeyboardButton(
-                                "🔍 Search Again", callback_data="nav_findme"
+                                "🔍 Search Again", callback_data=encode(FINDME)
                             )
                         ],
                         [
                             InlineKeyboardButton(
-                                "🔙 Back to Menu", callback_data="menu_back"
+                                "🔙 Back to Menu", callback_data=encode(MAIN_MENU)
                             )
                         ],
                     ]
@@ -232,28 +224,44 @@ class FindMeHandler:
                     reply_markup=InlineKeyboardMarkup(keyboard),
                     parse_mode="Markdown",
                 )
-                return CATEGORY_SELECTION
+                return ConversationHandler.END
 
             else:
-                error_msg = (
-                    "😔 No places found within 2km.\n\n"
-                    "Would you like to:\n"
-                    "• Browse places by category (shows all distances)\n"
-                    "• Try a different location"
-                )
+                # Nothing inside the radius: fall back to the closest places
+                nearest = current_places
+                if nearest:
+                    error_msg = (
+                        f"😔 No places found within {RADIUS_SEARCH / 1000:.0f}km.\n"
+                        "Here are the closest places to you:\n\n"
+                    )
+                    for place in nearest:
+                        error_msg += FindMeHandler.format_place(place)
+                else:
+                    error_msg = (
+                        "😔 No places found within 2km.\n\n"
+                        "Would you like to:\n"
+                        "• Browse places by category (shows all distances)\n"
+                        "• Try a different location"
+                    )
                 keyboard = [
                     [
                         InlineKeyboardButton(
-                            "📋 Browse Categories", callback_data="show_categories"
+                            "📋 Browse Categories", callback_data=encode(FINDME_CATEGORIES)
                         )
                     ],
-                    [InlineKeyboardButton("🔍 Try Again", callback_data="nav_findme")],
+                    [InlineKeyboardButton("🔍 Try Again", callback_data=encode(FINDME))],
                 ]
                 await update.message.reply_text(
-                    error_msg, reply_markup=InlineKeyboardMarkup(keyboard)
+                    error_msg,
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                    parse_mode="Markdown",
                 )
-                return CATEGORY_SELECTION
+                return ConversationHandler.END
 
+        except PoolBusy:
+            # Still waiting for a location: sharing it again retries
+            await update.message.reply_text(BUSY_MESSAGE)
+            return LOCATION
         except Exception as e:
             logger.error(f"Error processing location: {str(e)}", exc_info=True)
             await handle_error(update, "Failed to process location")
@@ -264,102 +272,66 @@ class FindMeHandler:
         """Show available categories"""
         try:
             query = update.callback_query
-            await query.answer()
 
             # Get unique categories from locations
-            handler = FindMeHandler()
-            categories = sorted(
-                list(
-                    set(
-                        loc["category"]
-                        for loc in handler.locations
-                        if "category" in loc
-                    )
-                )
-            )
+            categories = get_store().categories()
 
             keyboard = []
             for category in categories:
                 keyboard.append(
                     [
                         InlineKeyboardButton(
-                            f"📍 {category}", callback_data=f"cat_{category}_1"
+                            f"📍 {category}", callback_data=encode(FINDME_PAGE, category, 1)
                         )
                     ]
                 )
             keyboard.append(
-                [InlineKeyboardButton("🔙 Back", callback_data="nav_findme")]
+                [InlineKeyboardButton("🔙 Back", callback_data=encode(FINDME))]
             )
 
             await query.message.edit_text(
                 "Select a category to see the nearest places:",
                 reply_markup=InlineKeyboardMarkup(keyboard),
             )
-            return CATEGORY_SELECTION
 
         except Exception as e:
             logger.error(f"Error showing categories: {str(e)}", exc_info=True)
             await handle_error(update, "Failed to show categories")
-            return ConversationHandler.END
 
     @staticmethod
-    async def handle_pagination(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle pagination for all places or category-specific places"""
+    async def handle_pagination(
+        update: Update, context: ContextTypes.DEFAULT_TYPE, type_: str, page: int
+    ):
+        """Handle pagination for all places ("all") or category-specific places"""
         try:
             query = update.callback_query
-            await query.answer()
-
-            # Parse callback data
-            _, type_, page = query.data.split("_")  # page_all_2 or page_category_2
-            page = int(page)
 
             location = context.user_data.get("last_location")
             if not location:
                 await query.message.edit_text(
                     "Please share your location first.",
                     reply_markup=InlineKeyboardMarkup(
-                        [[InlineKeyboardButton("🔙 Back", callback_data="nav_findme")]]
+                        [[InlineKeyboardButton("🔙 Back", callback_data=encode(FINDME))]]
                     ),
                 )
-                return LOCATION
-
-            # Get places based on type
-            if type_ == "all":
-                places, _ = FindMeHandler.get_nearby_places(
-                    location["latitude"], location["longitude"], RADIUS_SEARCH
-                )
-            else:
-                # Handle category-specific pagination
-                places, _ = FindMeHandler.get_nearby_places(
-                    location["latitude"], location["longitude"], RADIUS_SEARCH
-                )
-                places = [p for p in places if p["category"] == type_]
-
-            # Calculate pagination
-            total_pages = (len(places) + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
-            start_idx = (page - 1) * ITEMS_PER_PAGE
-            end_idx = start_idx + ITEMS_PER_PAGE
-            current_places = places[start_idx:end_idx]
+                return
+
+            # Reuse the cursor from the first search; only this page is copied
+            current_places, total_pages, _ = await run_search(
+                FindMeHandler.search_page,
+                update.effective_user.id,
+                location["latitude"],
+                location["longitude"],
+                None if type_ == "all" else type_,
+                page,
+            )
 
             # Format message
             response = f"🎯 *{'All' if type_ == 'all' else type_} Places Near You*\n"
             response += f"Page {page} of {total_pages}\n\n"
 
             for place in current_places:
-                response += f"📍 *{place['name']}*\n"
-                response += f"🏢 Category: {place['category']}\n"
-                response += f"📏 Distance: {place['distance']:.1f}km\n"
-                if place.get("description"):
-                    response += f"ℹ️ {place['description']}\n"
-                if place.get("opening_hours"):
-                    response += f"🕒 {place['opening_hours']}\n"
-                if place.get("contact"):
-                    contact = place["contact"]
-                    if contact.get("phone"):
-                        response += f"📞 {contact['phone']}\n"
-                    if contact.get("website"):
-                        response += f"🌐 {contact['website']}\n"
-                response += "\n"
+                response += FindMeHandler.format_place(place)
 
             # Create navigation buttons
             keyboard = []
@@ -368,14 +340,14 @@ class FindMeHandler:
             if page > 1:
                 nav_row.append(
                     InlineKeyboardButton(
-                        "◀️ Previous", callback_data=f"page_{type_}_{page - 1}"
+                        "◀️ Previous", callback_data=encode(FINDME_PAGE, type_, page - 1)
                     )
                 )
 
             if page < total_pages:
                 nav_row.append(
                     InlineKeyboardButton(
-                        "Next ▶️", callback_data=f"page_{type_}_{page + 1}"
+                        "Next ▶️", callback_data=encode(FINDME_PAGE, type_, page + 1)
                     )
                 )
 
@@ -387,11 +359,11 @@ class FindMeHandler:
                 [
                     [
                         InlineKeyboardButton(
-                            "📋 Categories", callback_data="show_categories"
+                            "📋 Categories", callback_data=encode(FINDME_CATEGORIES)
                         )
                     ],
-                    [InlineKeyboardButton("🔍 New Search", callback_data="nav_findme")],
-                    [InlineKeyboardButton("🔙 Main Menu", callback_data="menu_back")],
+                    [InlineKeyboardButton("🔍 New Search", callback_data=encode(FINDME))],
+                    [InlineKeyboardButton("🔙 Main Menu", callback_data=encode(MAIN_MENU))],
                 ]
             )
 
@@ -400,12 +372,13 @@ class FindMeHandler:
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="Markdown",
             )
-            return CATEGORY_SELECTION
 
+        except PoolBusy:
+            # The current page stays, so the button can be tapped again
+            await update.callback_query.message.reply_text(BUSY_MESSAGE)
         except Exception as e:
             logger.error(f"Error handling pagination: {str(e)}", exc_info=True)
             await handle_error(update, "Failed to show more places")
-            return ConversationHandler.END
 
     @staticmethod
     async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -420,7 +393,7 @@ class FindMeHandler:
                         [
                             [
                                 InlineKeyboardButton(
-                                    "🔙 Back to Menu", callback_data="menu_back"
+                                    "🔙 Back to Menu", callback_data=encode(MAIN_MENU)
                                 )
                             ]
                         ]
@@ -437,13 +410,15 @@ class FindMeHandler:
 
     @staticmethod
     def get_handler():
-        """Return the handler for this functionality"""
+        """Return the handler for this functionality.
+
+        The conversation only covers asking for the location; the buttons
+        on the results are routed (``register_routes``).
+        """
         return ConversationHandler(
             entry_points=[
                 CommandHandler("findme", FindMeHandler.start_findme),
-                CallbackQueryHandler(
-                    FindMeHandler.start_findme, pattern="^nav_findme$"
-                ),
+                CallbackQueryHandler(FindMeHandler.start_findme, pattern=matches(FINDME)),
             ],
             states={
                 LOCATION: [
@@ -452,21 +427,21 @@ class FindMeHandler:
                         filters.TEXT & ~filters.COMMAND, FindMeHandler.process_location
                     ),
                 ],
-                CATEGORY_SELECTION: [
-                    CallbackQueryHandler(
-                        FindMeHandler.show_categories, pattern="^show_categories$"
-                    ),
-                    CallbackQueryHandler(
-                        FindMeHandler.handle_pagination, pattern="^page_"
-                    ),
-                    CallbackQueryHandler(
-                        FindMeHandler.handle_pagination, pattern="^cat_"
-                    ),
-                ],
             },
             fallbacks=[
                 CommandHandler("cancel", FindMeHandler.cancel),
-                CallbackQueryHandler(FindMeHandler.cancel, pattern="^menu_back$"),
+                CallbackQueryHandler(FindMeHandler.cancel, pattern=matches(MAIN_MENU)),
             ],
             name="findme_conversation",
         )
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons.
+
+        Search Again starts the conversation, which takes the button first;
+        the route serves it when a search is already waiting for a location.
+        """
+        router.add(FINDME, FindMeHandler.start_findme, answer=False)
+        router.add(FINDME_CATEGORIES, FindMeHandler.show_categories)
+        router.add(FINDME_PAGE, FindMeHandler.handle_pagination, str, int)
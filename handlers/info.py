@@ -1,6 +1,7 @@
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters
 from utils import setup_logger, handle_error
+from callback_data import encode, INFO, MAIN_MENU
 
 logger = setup_logger("info_handler")
 
@@ -35,7 +36,7 @@ class InfoHandler:
             keyboard = [
                 [
                     InlineKeyboardButton(
-                        "🔙 Back to Main Menu", callback_data="menu_back"
+                        "🔙 Back to Main Menu", callback_data=encode(MAIN_MENU)
                     )
                 ]
             ]
@@ -48,7 +49,6 @@ class InfoHandler:
                         reply_markup=InlineKeyboardMarkup(keyboard),
                         parse_mode="Markdown",
                     )
-                    await query.answer()
             elif update.message:
                 await update.message.reply_text(
                     info_text,
@@ -70,3 +70,8 @@ class InfoHandler:
                 InfoHandler.show_info,
             ),
         ]
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons"""
+        router.add(INFO, InfoHandler.show_info)
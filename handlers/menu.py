@@ -5,6 +5,7 @@ from utils import (
     show_main_menu,
     handle_error
 )
+from callback_data import MAIN_MENU
 
 logger = setup_logger('menu_handler')
 
@@ -32,4 +33,9 @@ class MenuHandler:
                 filters.Regex("^🔙 Back to Main Menu$"),
                 MenuHandler.start
             )
-        ] 
\ No newline at end of file
+        ]
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons"""
+        router.add(MAIN_MENU, show_main_menu)
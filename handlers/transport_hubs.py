@@ -1,4 +1,3 @@
-import json
 from telegram import (
     Update,
     InlineKeyboardMarkup,
@@ -16,7 +15,20 @@ from telegram.ext import (
     filters,
 )
 from utils import setup_logger, handle_error
-from geopy.distance import geodesic
+from location_store import LocationStore, get_hub_store
+from render_cache import RenderedPage, cached_page
+from callback_data import (
+    encode,
+    matches,
+    HUB_CATEGORIES,
+    HUB_PAGE,
+    HUBS,
+    MAIN_MENU,
+    NEAREST_HUBS,
+)
+from config import GEODESIC_REFINEMENT
+from geo import refine_distances
+from offload import BUSY_MESSAGE, PoolBusy, run_search
 
 logger = setup_logger("transport_hubs_handler")
 
@@ -24,60 +36,113 @@ logger = setup_logger("transport_hubs_handler")
 LOCATION = 1
 
 
+def render_hubs_page(store: LocationStore, category: str, page: int) -> RenderedPage:
+    """One page of a hub category (0-based page), with its navigation buttons"""
+    if category == "all_hubs":
+        filtered_hubs = list(store.places)
+    else:
+        filtered_hubs = [hub for hub in store.places if hub["category"] == category]
+
+    # Pagination
+    items_per_page = 3
+    start_idx = page * items_per_page
+    end_idx = start_idx + items_per_page
+    current_hubs = filtered_hubs[start_idx:end_idx]
+    total_pages = (len(filtered_hubs) + items_per_page - 1) // items_per_page
+
+    if not filtered_hubs:
+        message = "No transport hubs found in this category."
+    else:
+        # Format message
+        parts = [
+            f"🚏 *Transport Hubs - {category.replace('_', ' ').title()}*\n",
+            f"Page {page + 1} of {total_pages}\n\n",
+        ]
+
+        for hub in current_hubs:
+            parts.append(
+                f"🏢 *{hub['name']}*\n"
+                f"📝 {hub.get('description', 'No description available')}\n"
+                f"🕒 Operating Hours: {hub.get('operating_hours', 'Not specified')}\n"
+            )
+            if "services" in hub:
+                parts.append(f"🚍 Services: {', '.join(hub['services'])}\n")
+            if "coordinates" in hub:
+                parts.append(
+                    f"📍 Location: {hub['coordinates']['latitude']}, "
+                    f"{hub['coordinates']['longitude']}\n"
+                )
+            parts.append("\n")
+        message = "".join(parts)
+
+    # Create navigation buttons
+    keyboard = []
+
+    # Add pagination buttons if needed
+    if len(filtered_hubs) > items_per_page:
+        nav_row = []
+        if page > 0:
+            nav_row.append(
+                InlineKeyboardButton(
+                    "◀️ Previous",
+                    callback_data=encode(HUB_PAGE, category, page - 1),
+                )
+            )
+        if end_idx < len(filtered_hubs):
+            nav_row.append(
+                InlineKeyboardButton(
+                    "Next ▶️",
+                    callback_data=encode(HUB_PAGE, category, page + 1),
+                )
+            )
+        if nav_row:
+            keyboard.append(nav_row)
+
+    # Add navigation buttons
+    keyboard.append(
+        [InlineKeyboardButton("🔙 Back to Categories", callback_data=encode(HUB_CATEGORIES))]
+    )
+    keyboard.append(
+        [InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))]
+    )
+
+    return RenderedPage(message, InlineKeyboardMarkup(keyboard))
+
+
 class TransportHubsHandler:
     """Handler for transport hubs functionality"""
 
-    def __init__(self):
-        self.hubs_data = self.load_hubs_data()
+    @property
+    def hubs_data(self):
+        """Transport hubs from the current hub store snapshot"""
+        return self.load_hubs_data()
 
     @staticmethod
     def load_hubs_data():
-        """Load transport hubs data from JSON file"""
-        try:
-            with open("data/transport_hubs.json", "r", encoding="utf-8") as f:
-                data = json.load(f)["hubs"]
-                logger.debug("Transport hubs data loaded successfully")
-                return data
-        except Exception as e:
-            logger.error(f"Error loading transport hubs data: {str(e)}")
-            return []
+        """Return transport hubs from the shared hub store"""
+        return list(get_hub_store().places)
 
     @staticmethod
-    def calculate_distance(lat1, lon1, lat2, lon2) -> float:
-        """
-        Calculate precise distance between two points using geopy's geodesic distance.
-        
-        Args:
-            lat1 (float): Latitude of first point
-            lon1 (float): Longitude of first point
-            lat2 (float): Latitude of second point
-            lon2 (float): Longitude of second point
-            
-        Returns:
-            float: Distance in kilometers
-        """
-        try:
-            point1 = (lat1, lon1)
-            point2 = (lat2, lon2)
-            distance = geodesic(point1, point2).kilometers
-            return round(distance, 2)  # Round to 2 decimal places
-        except Exception as e:
-            logger.error(f"Error calculating distance: {str(e)}")
-            return float('inf')  # Return infinity for invalid calculations
+    def find_nearest_hubs(latitude, longitude, count=5):
+        """The closest hubs, distances in meters (CPU-bound: run on the search pool)"""
+        hubs = get_hub_store().nearest(latitude, longitude, count)
+        if GEODESIC_REFINEMENT:
+            refine_distances(latitude, longitude, hubs)
+        return hubs
 
     async def show_main_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show main menu for transport hubs"""
         try:
             keyboard = [
-                [InlineKeyboardButton("🔍 Explore Hubs", callback_data="explore_hubs")],
+                [InlineKeyboardButton("🔍 Explore Hubs", callback_data=encode(HUB_CATEGORIES))],
                 [
                     InlineKeyboardButton(
-                        "📍 Find Nearest Hubs", callback_data="find_nearest"
+                        "📍 Find Nearest Hubs", callback_data=encode(NEAREST_HUBS)
                     )
                 ],
                 [
                     InlineKeyboardButton(
-                        "🔙 Back to Main Menu", callback_data="menu_back"
+                        "🔙 Back to Main Menu", callback_data=encode(MAIN_MENU)
                     )
                 ],
             ]
@@ -119,11 +184,11 @@ class TransportHubsHandler:
             }
 
             keyboard = [
-                [InlineKeyboardButton(name, callback_data=f"hub_category_{data}_0")]
+                [InlineKeyboardButton(name, callback_data=encode(HUB_PAGE, data, 0))]
                 for name, data in categories.items()
             ]
             keyboard.append(
-                [InlineKeyboardButton("🔙 Back", callback_data="nav_transporthubs")]
+                [InlineKeyboardButton("🔙 Back", callback_data=encode(HUBS))]
             )
 
             await update.callback_query.message.edit_text(
@@ -140,6 +205,7 @@ class TransportHubsHandler:
     ):
         """Request user location"""
         try:
+            await update.callback_query.answer()
             reply_keyboard = [
                 [KeyboardButton("📍 Share Location", request_location=True)],
                 [KeyboardButton("❌ Cancel")],
@@ -179,39 +245,23 @@ class TransportHubsHandler:
                 )
                 return LOCATION
 
-            nearest_hubs = []
-            user_coords = (user_location.latitude, user_location.longitude)
-
-            for hub in self.hubs_data:
-                if not hub.get('coordinates') or \
-                   'latitude' not in hub['coordinates'] or \
-                   'longitude' not in hub['coordinates']:
-                    continue
-
-                hub_coords = (hub['coordinates']['latitude'], hub['coordinates']['longitude'])
-                distance = self.calculate_distance(
-                    user_location.latitude,
-                    user_location.longitude,
-                    hub['coordinates']['latitude'],
-                    hub['coordinates']['longitude']
-                )
-                
-                if distance != float('inf'):
-                    nearest_hubs.append((hub, distance))
+            # Closest 5 hubs straight from the KD-tree, off the event loop
+            hubs = await run_search(
+                TransportHubsHandler.find_nearest_hubs,
+                user_location.latitude,
+                user_location.longitude,
+            )
+            nearest_hubs = [(hub, round(hub["distance"] / 1000, 2)) for hub in hubs]
 
             if not nearest_hubs:
                 await update.message.reply_text(
                     "⚠️ No hubs found near your location.",
                     reply_markup=InlineKeyboardMarkup([[
-                        InlineKeyboardButton("🔙 Back to Transport Hubs", callback_data="nav_transporthubs")
+                        InlineKeyboardButton("🔙 Back to Transport Hubs", callback_data=encode(HUBS))
                     ]])
                 )
                 return ConversationHandler.END
 
-            # Sort hubs by distance and get top 5
-            nearest_hubs.sort(key=lambda x: x[1])
-            nearest_hubs = nearest_hubs[:5]
-
             message = "🎯 *Nearest Transport Hubs:*\n\n"
             for hub, distance in nearest_hubs:
                 message += (
@@ -240,7 +290,7 @@ class TransportHubsHandler:
             await update.message.reply_text(
                 message,
                 reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Back to Transport Hubs", callback_data="nav_transporthubs")
+                    InlineKeyboardButton("🔙 Back to Transport Hubs", callback_data=encode(HUBS))
                 ]]),
                 parse_mode="Markdown"
             )
@@ -253,6 +303,10 @@ class TransportHubsHandler:
             
             return ConversationHandler.END
 
+        except PoolBusy:
+            # Still waiting for a location: sharing it again retries
+            await update.message.reply_text(BUSY_MESSAGE)
+            return LOCATION
         except Exception as e:
             logger.error(f"Error showing nearest hubs: {str(e)}")
             await handle_error(update, context, "Could not show nearest hubs")
@@ -265,99 +319,30 @@ class TransportHubsHandler:
         )
         return ConversationHandler.END
 
-    async def show_hubs(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def show_hubs(
+        self,
+        update: Update,
+        context: ContextTypes.DEFAULT_TYPE,
+        category: str,
+        page: int = 0,
+    ):
         """Show transport hubs based on selected category with pagination"""
         try:
             query = update.callback_query
-            await query.answer()
-
-            # Extract category and page from callback data
-            data = query.data[len("hub_category_") :]
-            if "_" in data:
-                category, page = data.rsplit("_", 1)
-                page = int(page)
-            else:
-                category = data
-                page = 0
-
-            # Get hubs for selected category
-            if category == "all_hubs":
-                filtered_hubs = self.hubs_data
-            else:
-                filtered_hubs = [
-                    hub for hub in self.hubs_data if hub["category"] == category
-                ]
-
-            # Pagination
-            items_per_page = 3
-            start_idx = page * items_per_page
-            end_idx = start_idx + items_per_page
-            current_hubs = filtered_hubs[start_idx:end_idx]
-            total_pages = (len(filtered_hubs) + items_per_page - 1) // items_per_page
-
-            if not filtered_hubs:
-                message = "No transport hubs found in this category."
-            else:
-                # Format message
-                message = (
-                    f"🚏 *Transport Hubs - {category.replace('_', ' ').title()}*\n"
-                )
-                message += f"Page {page + 1} of {total_pages}\n\n"
 
-                for hub in current_hubs:
-                    message += (
-                        f"🏢 *{hub['name']}*\n"
-                        f"📝 {hub.get('description', 'No description available')}\n"
-                        f"🕒 Operating Hours: {hub.get('operating_hours', 'Not specified')}\n"
-                    )
-                    if "services" in hub:
-                        message += f"🚍 Services: {', '.join(hub['services'])}\n"
-                    if "coordinates" in hub:
-                        message += f"📍 Location: {hub['coordinates']['latitude']}, {hub['coordinates']['longitude']}\n"
-                    message += "\n"
-
-            # Create navigation buttons
-            keyboard = []
-
-            # Add pagination buttons if needed
-            if len(filtered_hubs) > items_per_page:
-                nav_row = []
-                if page > 0:
-                    nav_row.append(
-                        InlineKeyboardButton(
-                            "◀️ Previous",
-                            callback_data=f"hub_category_{category}_{page - 1}",
-                        )
-                    )
-                if end_idx < len(filtered_hubs):
-                    nav_row.append(
-                        InlineKeyboardButton(
-                            "Next ▶️",
-                            callback_data=f"hub_category_{category}_{page + 1}",
-                        )
-                    )
-                if nav_row:
-                    keyboard.append(nav_row)
-
-            # Add navigation buttons
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        "🔙 Back to Categories", callback_data="explore_hubs"
-                    )
-                ]
-            )
-            keyboard.append(
-                [
-                    InlineKeyboardButton(
-                        "🔙 Back to Main Menu", callback_data="menu_back"
-                    )
-                ]
+            # Same page of the same snapshot is rendered once
+            store = get_hub_store()
+            rendered = cached_page(
+                "hubs",
+                category,
+                page,
+                store.version,
+                lambda: render_hubs_page(store, category, page),
             )
 
             await query.message.edit_text(
-                message,
-                reply_markup=InlineKeyboardMarkup(keyboard),
+                rendered.text,
+                reply_markup=rendered.reply_markup,
                 parse_mode="Markdown",
             )
 
@@ -373,7 +358,9 @@ class TransportHubsHandler:
         # Create conversation handler for location-based search
         location_conv = ConversationHandler(
             entry_points=[
-                CallbackQueryHandler(handler.request_location, pattern="^find_nearest$")
+                CallbackQueryHandler(
+                    handler.request_location, pattern=matches(NEAREST_HUBS)
+                )
             ],
             states={
                 LOCATION: [
@@ -386,8 +373,19 @@ class TransportHubsHandler:
 
         return [
             CommandHandler("transporthubs", handler.show_main_menu),
-            CallbackQueryHandler(handler.show_main_menu, pattern="^nav_transporthubs$"),
-            CallbackQueryHandler(handler.show_categories, pattern="^explore_hubs$"),
-            CallbackQueryHandler(handler.show_hubs, pattern="^hub_category_"),
             location_conv,
         ]
+
+    @staticmethod
+    def register_routes(router):
+        """Route this functionality's buttons.
+
+        Find nearest starts the location conversation, which takes the
+        button first; the route serves it when that conversation is
+        already waiting for a location.
+        """
+        handler = TransportHubsHandler()
+        router.add(HUBS, handler.show_main_menu)
+        router.add(HUB_CATEGORIES, handler.show_categories)
+        router.add(HUB_PAGE, handler.show_hubs, str, int)
+        router.add(NEAREST_HUBS, handler.request_location, answer=False)
@@ -0,0 +1,610 @@
+import json
+import itertools
+import os
+import threading
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+import numpy as np
+from config import (
+    LOCATIONS_FILE,
+    LOCATIONS_SNAPSHOT,
+    LOCATIONS_DB,
+    HUBS_FILE,
+    RADIUS_SEARCH,
+    GRID_CELL_SIZE,
+    STORE_BACKEND,
+    STORE_CLOSE_DELAY,
+)
+from geo import distances
+from snapshot import OSM_TYPES, encode, read_snapshot
+from spatial_index import GridIndex, KDTree
+from utils import setup_logger
+
+logger = setup_logger("location_store")
+
+# Monotonic snapshot counter, bumped every time a store is built
+_versions = itertools.count(1)
+
+
+def next_version() -> int:
+    """A new store version, unique across every store built in this process"""
+    return next(_versions)
+
+
+# Extra KD-tree candidates fetched by nearest() before exact re-ranking
+NEAREST_SLACK = 8
+
+
+class LocationStore:
+    """Immutable in-memory snapshot of the locations data.
+
+    The store is built once from ``data/locations.bin`` (or a JSON data
+    file) and shared by every handler, so a button press never re-reads or
+    re-parses the file. Radius
+    queries go through a grid index so only nearby cells are scanned, and
+    k-nearest queries go through a KD-tree so no radius is needed. Both
+    indexes are also built per category, so a category-scoped query only
+    touches that category's points.
+
+    Places are stored column-wise rather than as one dict each: coordinates
+    in float arrays (so candidate distances are computed in one vectorized
+    call), categories and OSM element types as small-int codes, OSM ids in
+    an int64 array, names as interned strings, and optional fields
+    (description, opening hours, contact details, ...) sparsely, keyed by
+    place id, with empty values not stored at all.
+    Places are read through PlaceView objects that look like the original
+    dicts.
+    """
+
+    def __init__(
+        self,
+        locations: Iterable[Dict[str, Any]] = (),
+        source: str = None,
+        cell_size: float = GRID_CELL_SIZE,
+        columns: Dict[str, Any] = None,
+        manifest: Dict[str, Any] = None,
+    ):
+        if columns is None:
+            columns = encode(locations)
+        self._names: List[str] = columns["names"]
+        self._category_names: List[str] = columns["categories"]
+        self._category_codes: Dict[str, int] = {
+            name.lower(): code for code, name in enumerate(self._category_names)
+        }
+        self._codes = columns["codes"]
+        self._osm_types = columns["osm_types"]
+        self._osm_ids = columns["osm_ids"]
+        self._lats = columns["lats"]
+        self._lons = columns["lons"]
+        # Optional fields: field -> {id: value}; dict-valued fields such as
+        # contact are split into one sparse column per key.
+        self._fields: Dict[str, Dict[int, Any]] = columns["fields"]
+        self._nested: Dict[str, Dict[str, Dict[int, Any]]] = columns["nested"]
+        self._field_order: Dict[str, None] = dict.fromkeys(columns["field_order"])
+
+        self._located = np.flatnonzero(~np.isnan(self._lats))
+        self._grid = GridIndex(self._lats, self._lons, cell_size)
+        self._tree = KDTree(self._lats, self._lons)
+
+        self._category_ids: Dict[int, np.ndarray] = {}
+        self._partitions: Dict[int, Tuple[GridIndex, KDTree]] = {}
+        for code in self._category_codes.values():
+            ids = np.flatnonzero(self._codes == code)
+            self._category_ids[code] = ids.astype(np.int32)
+            self._partitions[code] = (
+                GridIndex(self._lats, self._lons, cell_size, ids),
+                KDTree(self._lats, self._lons, ids),
+            )
+        self._counts = {
+            self._category_names[code]: len(ids)
+            for code, ids in self._category_ids.items()
+        }
+        self.source = source
+        self.manifest = manifest
+        self.version = next_version()
+        self.loaded_at = datetime.now().isoformat()
+
+    def _value(self, idx: int, field: str) -> Any:
+        """Value of one field of place idx; KeyError if it has none"""
+        if field == "name":
+            return self._names[idx]
+        if field == "category":
+            return self._category_names[self._codes[idx]]
+        if field == "osm_type" and self._osm_types[idx]:
+            return OSM_TYPES[self._osm_types[idx]]
+        if field == "osm_id" and self._osm_types[idx]:
+            return int(self._osm_ids[idx])
+        if field == "coordinates" and not np.isnan(self._lats[idx]):
+            return {
+                "latitude": float(self._lats[idx]),
+                "longitude": float(self._lons[idx]),
+            }
+        if field in self._nested:
+            value = {
+                key: column[idx]
+                for key, column in self._nested[field].items()
+                if idx in column
+            }
+            if value:
+                return value
+        try:
+            return self._fields[field][idx]
+        except KeyError:
+            raise KeyError(field) from None
+
+    def _position(self, idx: int) -> Tuple[float, float]:
+        """(latitude, longitude) of place idx, NaN if it has none"""
+        return float(self._lats[idx]), float(self._lons[idx])
+
+    def _keys(self, idx: int) -> Iterator[str]:
+        """Field names of place idx, in the order of the source data"""
+        yield from ("name", "coordinates", "category")
+        if self._osm_types[idx]:
+            yield from ("osm_type", "osm_id")
+        for field in self._field_order:
+            if field == "coordinates":
+                continue
+            if idx in self._fields.get(field, ()) or any(
+                idx in column for column in self._nested.get(field, {}).values()
+            ):
+                yield field
+
+    @classmethod
+    def from_file(
+        cls, path: str = LOCATIONS_SNAPSHOT, key: str = "locations", strict: bool = False
+    ):
+        """Build a store from a snapshot (``.bin``) or JSON data file.
+
+        A ``.sqlite`` database is opened as a SQLiteStore instead. An
+        unreadable file gives an empty store, or raises if ``strict``.
+        """
+        try:
+            if path.endswith(".sqlite"):
+                from sqlite_store import SQLiteStore
+
+                return SQLiteStore(path)
+            if path.endswith(".bin"):
+                columns, manifest = read_snapshot(path)
+                return cls(source=path, columns=columns, manifest=manifest)
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            return cls(data.get(key, []), source=path)
+        except Exception as e:
+            if strict:
+                raise
+            logger.error(f"Error loading locations from {path}: {str(e)}")
+            return cls([], source=path)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def places(self) -> "PlaceList":
+        """All places in file order"""
+        return PlaceList(self, range(len(self._names)))
+
+    def categories(self) -> List[str]:
+        """Sorted list of categories present in the data"""
+        return sorted(self._counts)
+
+    def category_counts(self) -> Dict[str, int]:
+        """Number of places in each category"""
+        return dict(self._counts)
+
+    def by_category(self, category: str) -> "PlaceList":
+        """Places in a category (case-insensitive), in file order"""
+        code = self._category_codes.get(category.lower())
+        if code is None:
+            return PlaceList(self, range(0))
+        return PlaceList(self, self._category_ids[code])
+
+    def _resolve_categories(
+        self, category: Union[str, Iterable[str], None]
+    ) -> Optional[List[int]]:
+        """Category codes for a query, or None for all categories"""
+        if not category:
+            return None
+        names = [category] if isinstance(category, str) else category
+        return [
+            self._category_codes[name.lower()]
+            for name in names
+            if name.lower() in self._category_codes
+        ]
+
+    def candidates(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> np.ndarray:
+        """Ids of places that may lie within max_distance (a superset).
+
+        Only the grid cells overlapping the search circle are visited.
+        ``category`` may be a single category or several, whose partitions
+        are merged.
+        """
+        codes = self._resolve_categories(category)
+        if max_distance is None:
+            ids = self._located
+            if codes is not None:
+                ids = ids[np.isin(self._codes[ids], codes)]
+            return ids
+
+        grids = (
+            [self._grid]
+            if codes is None
+            else [self._partitions[code][0] for code in codes]
+        )
+        found = [grid.query_radius(latitude, longitude, max_distance) for grid in grids]
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(found)
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        ids: np.ndarray,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+    ) -> "RankedResults":
+        """Exact distances for candidate ids, filtered to max_distance.
+
+        Nothing is sorted yet: the returned RankedResults orders places
+        lazily, only as far as they are actually read.
+        """
+        dist = distances(latitude, longitude, self._lats[ids], self._lons[ids])
+        if max_distance is not None:
+            inside = dist <= max_distance
+            ids, dist = ids[inside], dist[inside]
+        return RankedResults(self, ids, dist)
+
+    def search(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> "RankedResults":
+        """Places within max_distance as lazily ordered results.
+
+        No place view is made until it is read from the results, and reading
+        the first k costs O(n + k log k) rather than a full sort.
+        """
+        ids = self.candidates(latitude, longitude, max_distance, category)
+        return self.within(latitude, longitude, ids, max_distance)
+
+    def iter_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> Iterator["PlaceView"]:
+        """Yield places within max_distance meters, nearest first"""
+        return iter(self.search(latitude, longitude, max_distance, category))
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> List["PlaceView"]:
+        """Places within max_distance meters, sorted by distance.
+
+        Each result is a view of the place with a ``distance`` key in
+        meters. If max_distance is None, every place is returned.
+        """
+        return list(self.iter_nearby(latitude, longitude, max_distance, category))
+
+    def result(self, idx: int, distance: float) -> "PlaceView":
+        """View of the place at idx with its distance attached"""
+        return PlaceView(self, idx, float(distance))
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> List["PlaceView"]:
+        """The k places closest to a point, sorted by distance.
+
+        Unlike nearby() there is no radius: the k closest places are returned
+        however far away they are. Results carry ``distance`` in meters.
+        With several categories, each partition's k best are merged.
+        """
+        codes = self._resolve_categories(category)
+        trees = (
+            [self._tree]
+            if codes is None
+            else [self._partitions[code][1] for code in codes]
+        )
+
+        # The tree ranks on the sphere; a few extra candidates absorb the
+        # small reordering when re-ranking on the ellipsoid.
+        ids = np.fromiter(
+            itertools.chain.from_iterable(
+                tree.nearest(latitude, longitude, k + NEAREST_SLACK)
+                for tree in trees
+            ),
+            dtype=np.intp,
+        )
+        dist = distances(latitude, longitude, self._lats[ids], self._lons[ids])
+        order = np.argsort(dist, kind="stable")[:k]
+        return [self.result(ids[i], dist[i]) for i in order]
+
+
+class PlaceView(Mapping):
+    """Read-only, dict-like view of one place in a store.
+
+    Fields are read from the store's columns on access, so a view costs
+    three slots however many fields the place has. ``distance`` is the only
+    writable key: search results carry it in meters. ``copy()`` returns a
+    plain dict.
+    """
+
+    __slots__ = ("store", "idx", "distance")
+
+    def __init__(self, store: LocationStore, idx: int, distance: float = None):
+        self.store = store
+        self.idx = int(idx)
+        self.distance = distance
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "distance":
+            if self.distance is None:
+                raise KeyError(key)
+            return self.distance
+        return self.store._value(self.idx, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key != "distance":
+            raise TypeError(f"Place field '{key}' is read-only")
+        self.distance = value
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.store._keys(self.idx)
+        if self.distance is not None:
+            yield "distance"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"PlaceView({self.copy()!r})"
+
+    def copy(self) -> Dict[str, Any]:
+        """The place as a plain dict"""
+        return {key: self[key] for key in self}
+
+    @property
+    def name(self) -> str:
+        return self.store._value(self.idx, "name")
+
+    @property
+    def category(self) -> str:
+        return self.store._value(self.idx, "category")
+
+    @property
+    def latitude(self) -> float:
+        return self.store._position(self.idx)[0]
+
+    @property
+    def longitude(self) -> float:
+        return self.store._position(self.idx)[1]
+
+
+class PlaceList(Sequence):
+    """Lazy sequence of places in a store; views are made on access"""
+
+    __slots__ = ("store", "_ids")
+
+    def __init__(self, store: LocationStore, ids: Union[range, np.ndarray]):
+        self.store = store
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PlaceList(self.store, self._ids[index])
+        return PlaceView(self.store, self._ids[index])
+
+
+class RankedResults:
+    """Search results ordered by distance on demand.
+
+    Holds the unsorted ids and distances of every matching place. Reading
+    the first k results partitions out the k smallest distances with
+    ``argpartition`` and sorts only those; the sorted prefix then grows
+    (at least doubling) as later pages are read. Place views are made
+    only when they are read, so undisplayed results cost nothing but two
+    array slots.
+    """
+
+    def __init__(self, store: LocationStore, ids: np.ndarray, dist: np.ndarray):
+        self.store = store
+        self._ids = np.array(ids, dtype=np.intp)
+        self._dist = np.array(dist, dtype=np.float64)
+        self._sorted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Ids of every result; only the already-read prefix is in order"""
+        return self._ids
+
+    def _order_prefix(self, end: int) -> None:
+        """Make sure the first ``end`` entries are the nearest, in order"""
+        with self._lock:
+            done = self._sorted
+            if end <= done:
+                return
+            end = min(len(self._ids), max(end, 2 * done))
+            rest = self._dist[done:]
+            k = end - done
+            if k < len(rest):
+                order = np.argpartition(rest, k - 1)
+                head = order[:k]
+                order[:k] = head[np.argsort(rest[head], kind="stable")]
+            else:
+                order = np.argsort(rest, kind="stable")
+            self._ids[done:] = self._ids[done:][order]
+            self._dist[done:] = rest[order]
+            self._sorted = end
+
+    def ordered(self, start: int, end: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and distances of ranks [start, end) without copying places"""
+        self._order_prefix(end)
+        return self._ids[start:end], self._dist[start:end]
+
+    def slice(self, start: int, end: int) -> List[PlaceView]:
+        """Views of the places ranked [start, end), with distances"""
+        ids, dist = self.ordered(start, end)
+        return [self.store.result(idx, d) for idx, d in zip(ids, dist)]
+
+    def __iter__(self) -> Iterator[PlaceView]:
+        position = 0
+        chunk = 8
+        while position < len(self._ids):
+            yield from self.slice(position, position + chunk)
+            position += chunk
+            chunk *= 2
+
+
+_store: Optional[LocationStore] = None
+_hub_store: Optional[LocationStore] = None
+_reload_listeners: List[Callable[[LocationStore], None]] = []
+_hub_reload_listeners: List[Callable[[LocationStore], None]] = []
+
+
+def on_reload(listener: Callable[[LocationStore], None]) -> None:
+    """Register a callback run with the new store whenever it is replaced"""
+    _reload_listeners.append(listener)
+
+
+def on_hub_reload(listener: Callable[[LocationStore], None]) -> None:
+    """Register a callback run with the new hub store whenever it is replaced"""
+    _hub_reload_listeners.append(listener)
+
+
+def _notify(listeners: List[Callable[[LocationStore], None]], store: LocationStore) -> None:
+    for listener in listeners:
+        try:
+            listener(store)
+        except Exception as e:
+            logger.error(f"Error in reload listener: {str(e)}", exc_info=True)
+
+
+def _retire(store) -> None:
+    """Close a replaced store once the searches pinning it are over.
+
+    Only the SQLite backend holds resources (connections keeping the
+    replaced database file open). Cursors pin a store for at most
+    CURSOR_TTL, so it is closed STORE_CLOSE_DELAY after the swap.
+    """
+    close = getattr(store, "close", None)
+    if close is None:
+        return
+    timer = threading.Timer(STORE_CLOSE_DELAY, close)
+    timer.daemon = True
+    timer.start()
+
+
+def set_store(store: LocationStore) -> None:
+    """Make store the shared store and notify reload listeners.
+
+    The swap is a single reference assignment: requests that already hold
+    the previous store (or results and cursors pinned to it) keep using it
+    until they finish, while new requests see the new one. The previous
+    store is then retired (see ``_retire``).
+    """
+    global _store
+    previous = _store
+    _store = store
+    if previous is not None:
+        _notify(_reload_listeners, store)
+        if previous is not store:
+            _retire(previous)
+
+
+def set_hub_store(store: LocationStore) -> None:
+    """Make store the shared transport hub store"""
+    global _hub_store
+    previous = _hub_store
+    _hub_store = store
+    if previous is not None:
+        _notify(_hub_reload_listeners, store)
+
+
+def load_store(path: str = None) -> LocationStore:
+    """Load the locations snapshot and make it the shared store.
+
+    Without a snapshot yet (before the first OSM update), the JSON data
+    file is loaded instead, with a warning: the OSM fetcher only publishes
+    the snapshot, so the JSON file is not kept up to date. With
+    STORE_BACKEND "sqlite" the locations database is opened rather than
+    loaded into memory.
+    """
+    if path is None:
+        if STORE_BACKEND == "sqlite":
+            path = LOCATIONS_DB
+        elif os.path.exists(LOCATIONS_SNAPSHOT):
+            path = LOCATIONS_SNAPSHOT
+        else:
+            path = LOCATIONS_FILE
+            logger.warning(
+                f"No snapshot at {LOCATIONS_SNAPSHOT}, loading {path}, which OSM "
+                f"updates don't refresh; run update_locations.py or "
+                f"`python snapshot.py import` to publish one"
+            )
+    store = LocationStore.from_file(path)
+    set_store(store)
+    snapshot = (
+        f", snapshot version {store.manifest['version']}"
+        if store.manifest and "version" in store.manifest
+        else ""
+    )
+    logger.info(
+        f"Loaded {len(store)} locations from {path} (version {store.version}{snapshot})"
+    )
+    return store
+
+
+def get_store() -> LocationStore:
+    """Return the shared store, loading it on first use"""
+    if _store is None:
+        return load_store()
+    return _store
+
+
+def load_hub_store(path: str = HUBS_FILE) -> LocationStore:
+    """Load the transport hubs file and make it the shared hub store"""
+    store = LocationStore.from_file(path, key="hubs")
+    set_hub_store(store)
+    logger.info(f"Loaded {len(store)} transport hubs from {path}")
+    return store
+
+
+def get_hub_store() -> LocationStore:
+    """Return the shared transport hub store, loading it on first use"""
+    if _hub_store is None:
+        return load_hub_store()
+    return _hub_store
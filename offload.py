@@ -0,0 +1,215 @@
+"""Worker pools for CPU-bound handler work, and an event loop lag monitor.
+
+Handlers run on the asyncio event loop, so a search computing thousands of
+distances (or a SQLite backend query) holds up every other user's taps
+until it finishes. Such work is submitted to a pool instead and awaited:
+
+    places = await run_search(store.nearest, latitude, longitude, 5)
+
+The search pool has ``SEARCH_WORKERS`` threads and a bounded queue: once
+``SEARCH_QUEUE_SIZE`` searches are waiting for a thread, ``run_search``
+raises PoolBusy at once rather than letting the backlog (and every
+user's wait) grow. With ``SEARCH_WORKERS = 0`` work runs inline on the
+loop, as before. Data file loads get their own single thread, so a reload
+never takes a search thread and loads run one at a time.
+
+Threads rather than processes: the stores are shared in-memory snapshots
+that a process would have to copy, and the heavy parts (NumPy distance
+arrays, SQLite queries) release the GIL.
+"""
+import asyncio
+import contextlib
+import math
+import statistics
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config import (
+    LOAD_QUEUE_SIZE,
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_WARNING,
+    SEARCH_QUEUE_SIZE,
+    SEARCH_WORKERS,
+)
+from utils import setup_logger
+
+logger = setup_logger("offload")
+
+BUSY_MESSAGE = "⏳ Too many searches right now, please try again in a moment."
+
+
+class PoolBusy(Exception):
+    """Raised when a pool's queue is full"""
+
+
+class WorkerPool:
+    """Thread pool with a bounded queue, awaited from the event loop"""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+        self.run_seconds = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix=self.name
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Result of fn(*args, **kwargs), computed on a pool thread.
+
+        Raises PoolBusy if queue_size calls are already waiting for a thread.
+        """
+        if not self.workers:
+            self.submitted += 1
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.run_seconds += time.perf_counter() - started
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PoolBusy(f"{self.name} pool busy: {self.pending} calls pending")
+
+        started = []
+
+        def call():
+            started.append(time.perf_counter())
+            return fn(*args, **kwargs)
+
+        self.pending += 1
+        self.submitted += 1
+        queued = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), call)
+        finally:
+            self.pending -= 1
+            if started:
+                wait = started[0] - queued
+                self.wait_seconds += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.run_seconds += time.perf_counter() - started[0]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, rejections and time spent waiting for / on a thread"""
+        done = self.submitted - self.pending
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "mean_wait_ms": self.wait_seconds / done * 1000 if done else 0.0,
+            "max_wait_ms": self.max_wait * 1000,
+            "mean_run_ms": self.run_seconds / done * 1000 if done else 0.0,
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop runs a task that asked to wake up.
+
+    Every ``interval`` seconds a task sleeps and records how much later
+    than asked it woke: the time the loop was busy with something else
+    (a handler computing instead of awaiting). Lags of the last ``window``
+    samples are kept for percentiles; one above ``warning`` is logged.
+    """
+
+    def __init__(
+        self,
+        interval: float = LOOP_LAG_INTERVAL,
+        warning: float = LOOP_LAG_WARNING,
+        window: int = 1200,
+    ):
+        self.interval = interval
+        self.warning = warning
+        self._lags = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+            self._lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warning:
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms")
+
+    def reset(self) -> None:
+        self._lags.clear()
+        self.max_lag = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """p50/p99/max lag in ms over the recent window"""
+        lags = sorted(self._lags)
+        if not lags:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(lags),
+            "p50_ms": statistics.median(lags) * 1000,
+            "p99_ms": lags[math.ceil(len(lags) * 0.99) - 1] * 1000,
+            "max_ms": self.max_lag * 1000,
+        }
+
+
+search_pool = WorkerPool("search", SEARCH_WORKERS, SEARCH_QUEUE_SIZE)
+load_pool = WorkerPool("load", 1, LOAD_QUEUE_SIZE)
+loop_lag = LoopLagMonitor()
+
+
+async def run_search(fn: Callable, *args, **kwargs) -> Any:
+    """Run a search on the search pool (PoolBusy when its queue is full)"""
+    return await search_pool.run(fn, *args, **kwargs)
+
+
+async def run_load(fn: Callable, *args, **kwargs) -> Any:
+    """Run a data load on the load thread"""
+    return await load_pool.run(fn, *args, **kwargs)
+
+
+async def start_monitoring(application=None) -> None:
+    """Start the event loop lag monitor (usable as a post_init hook)"""
+    loop_lag.start()
+
+
+async def stop_offload(application=None) -> None:
+    """Stop the lag monitor and the pools (usable as a post_shutdown hook)"""
+    await loop_lag.stop()
+    search_pool.shutdown()
+    load_pool.shutdown()
+
+
+def offload_stats() -> Dict[str, Any]:
+    """Pool counters and event loop lag"""
+    return {
+        "search": search_pool.stats(),
+        "load": load_pool.stats(),
+        "loop_lag": loop_lag.stats(),
+    }
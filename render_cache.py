@@ -0,0 +1,83 @@
+from typing import Any, Callable, Dict, Hashable, NamedTuple
+from telegram import InlineKeyboardMarkup
+from config import RENDER_CACHE_MAX_BYTES, RENDER_CACHE_SIZE
+from location_store import on_hub_reload, on_reload
+from search_cache import LRUCache
+from utils import setup_logger
+
+logger = setup_logger("render_cache")
+
+
+class RenderedPage(NamedTuple):
+    """A page rendered to the text and keyboard that are sent"""
+
+    text: str
+    reply_markup: InlineKeyboardMarkup
+
+
+def page_size(page: RenderedPage) -> int:
+    """Approximate memory held by a rendered page, in bytes"""
+    size = 64 + len(page.text.encode("utf-8"))
+    for row in page.reply_markup.inline_keyboard:
+        for button in row:
+            size += 200 + len(button.text.encode("utf-8")) + len(button.callback_data or "")
+    return size
+
+
+class RenderCache:
+    """Rendered pages of the data-backed views (category places, hubs).
+
+    Keys are ``(view, category, page, version)`` where version is the
+    store snapshot the page was rendered from, so a page is never served
+    from older data. Bounded both in pages and in bytes; cleared when the
+    store is reloaded, as no page of the old snapshot will be asked for
+    again.
+    """
+
+    def __init__(self, maxsize: int, maxbytes: int):
+        self._pages = LRUCache(maxsize, maxweight=maxbytes, weigh=page_size)
+
+    def get(
+        self,
+        key: Hashable,
+        render: Callable[[], RenderedPage],
+    ) -> RenderedPage:
+        """The cached page for key, rendering and caching it on a miss"""
+        page = self._pages.get(key)
+        if page is None:
+            page = render()
+            self._pages.put(key, page)
+        return page
+
+    def invalidate(self, store=None) -> None:
+        """Drop every page (called when a store is reloaded)"""
+        stats = self._pages.stats()
+        self._pages.clear()
+        logger.info(
+            f"Render cache invalidated: {stats['size']} pages, "
+            f"hit rate {stats['hit_rate']:.1%} since start"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self._pages.stats()
+
+
+_pages = RenderCache(RENDER_CACHE_SIZE, RENDER_CACHE_MAX_BYTES)
+on_reload(_pages.invalidate)
+on_hub_reload(_pages.invalidate)
+
+
+def cached_page(
+    view: str,
+    category: str,
+    page: int,
+    version: int,
+    render: Callable[[], RenderedPage],
+) -> RenderedPage:
+    """A page of a view from the shared render cache"""
+    return _pages.get((view, category, page, version), render)
+
+
+def render_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and memory use of the shared render cache"""
+    return _pages.stats()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+from callback_data import decode
+from utils import setup_logger, handle_error, show_main_menu
+
+logger = setup_logger("router")
+
+
+class Route(NamedTuple):
+    callback: Callable
+    arg_types: Tuple[Callable[[str], Any], ...]
+    answer: bool
+
+
+@dataclass
+class RouteStats:
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class CallbackRouter:
+    """Dispatches button presses to handlers by the view in their callback data.
+
+    One CallbackQueryHandler for every button: the view id is decoded and
+    looked up in a dictionary, instead of trying one regex handler after
+    another. Handlers are called as ``callback(update, context, *args)``
+    with the callback data's arguments converted by the route's types.
+
+    The callback query is answered while the handler runs, unless the
+    route was added with ``answer=False`` (handlers that also serve as
+    conversation entry points answer themselves).
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Route] = {}
+        self._stats: Dict[str, RouteStats] = {}
+        self.expired = 0
+
+    def add(self, view: str, callback: Callable, *arg_types, answer: bool = True) -> None:
+        """Route buttons of view to callback; arg_types convert the arguments"""
+        if view in self._routes:
+            raise ValueError(f"View {view!r} already routed")
+        self._routes[view] = Route(callback, arg_types, answer)
+        self._stats[view] = RouteStats()
+
+    def resolve(self, data: Optional[str]) -> Optional[Tuple[str, Route, tuple]]:
+        """(view, route, converted args) for callback data, None if not routable"""
+        decoded = decode(data)
+        if decoded is None:
+            return None
+        view, raw_args = decoded
+        route = self._routes.get(view)
+        if route is None or len(raw_args) != len(route.arg_types):
+            return None
+        try:
+            args = tuple(convert(arg) for convert, arg in zip(route.arg_types, raw_args))
+        except ValueError:
+            return None
+        return view, route, args
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """CallbackQueryHandler callback for all routed buttons"""
+        query = update.callback_query
+        resolved = self.resolve(query.data)
+        if resolved is None:
+            # A button from a menu this version no longer has
+            self.expired += 1
+            logger.info(f"Expired button clicked: {query.data}")
+            await asyncio.gather(
+                query.answer("This button has expired"),
+                show_main_menu(update, context),
+                return_exceptions=True,
+            )
+            return
+
+        view, route, args = resolved
+        logger.info(f"Button clicked: {query.data}")
+        stats = self._stats[view]
+        stats.calls += 1
+        started = time.perf_counter()
+        try:
+            if route.answer:
+                answered, result = await asyncio.gather(
+                    query.answer(),
+                    route.callback(update, context, *args),
+                    return_exceptions=True,
+                )
+                if isinstance(answered, Exception):
+                    logger.warning(f"Could not answer {query.data}: {str(answered)}")
+                if isinstance(result, Exception):
+                    raise result
+            else:
+                await route.callback(update, context, *args)
+        except Exception as e:
+            stats.errors += 1
+            logger.error(f"Error handling button {query.data}: {str(e)}", exc_info=True)
+            await handle_error(update, "Could not process your selection")
+        finally:
+            elapsed = time.perf_counter() - started
+            stats.seconds += elapsed
+            stats.max_seconds = max(stats.max_seconds, elapsed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, errors and handler time per view, and the expired button count"""
+        return {
+            "routes": {
+                view: {
+                    "calls": s.calls,
+                    "errors": s.errors,
+                    "avg_ms": s.seconds / s.calls * 1000 if s.calls else 0.0,
+                    "max_ms": s.max_seconds * 1000,
+                }
+                for view, s in self._stats.items()
+            },
+            "expired": self.expired,
+        }
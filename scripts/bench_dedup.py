@@ -0,0 +1,104 @@
+"""Benchmark place deduplication on synthetic data with planted duplicates.
+
+Run from the repository root:
+
+    python -m scripts.bench_dedup [--sizes 10000 100000 1000000]
+
+Places are built like in ``scripts.measure_store_memory`` (real records,
+unique names) but spread over ``--spread`` degrees around Addis, so 1M
+places make a much denser city than any real one. ``--duplicates`` of them
+then get a planted duplicate: within 15 m, or 150 m for an area, with the
+name slightly changed (an added "ATM", a dropped or doubled letter, other
+case) and half of them mapped as ways.
+
+Reported: wall time, time per place (flat if the stage scales linearly),
+and precision/recall of the merged pairs against the planted ones.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
+from place_dedup import duplicate_groups  # noqa: E402
+from scripts.measure_store_memory import make_locations  # noqa: E402
+
+
+def variant(name, rng):
+    """A slightly different spelling of a name, as mappers produce them"""
+    choice = rng.randrange(4)
+    if choice == 0:
+        return f"{name} ATM"
+    if choice == 1:
+        return name.upper()
+    letters = [i for i, c in enumerate(name) if c.isalpha()]
+    if not letters:
+        return name
+    i = rng.choice(letters)
+    if choice == 2:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i] + name[i:]
+
+
+def make_dataset(size, spread, duplicates, rng):
+    """Places with planted duplicates; returns (places, planted pairs)"""
+    places = make_locations(size, random.Random(rng.random()))
+    for i, place in enumerate(places):
+        place["coordinates"]["latitude"] = 9.0 + rng.uniform(-spread, spread)
+        place["coordinates"]["longitude"] = 38.75 + rng.uniform(-spread, spread)
+        place["osm_type"], place["osm_id"] = "node", i
+
+    planted = set()
+    for original in rng.sample(range(size), int(size * duplicates)):
+        source = places[original]
+        area = rng.random() < 0.5
+        offset = (150.0 if area else 15.0) / 111195.0
+        copy = {
+            **source,
+            "name": variant(source["name"], rng),
+            "coordinates": {
+                "latitude": source["coordinates"]["latitude"] + rng.uniform(-offset, offset) / 1.5,
+                "longitude": source["coordinates"]["longitude"] + rng.uniform(-offset, offset) / 1.5,
+            },
+            "osm_type": "way" if area else "node",
+            "osm_id": len(places),
+        }
+        planted.add((original, len(places)))
+        places.append(copy)
+    return places, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'places':>10} {'groups':>7} {'wall s':>7} {'us/place':>9} {'precision':>10} {'recall':>7}")
+    for size in args.sizes:
+        places, planted = make_dataset(
+            size, args.spread, args.duplicates, random.Random(args.seed)
+        )
+        started = time.perf_counter()
+        groups = duplicate_groups(places)
+        elapsed = time.perf_counter() - started
+
+        found = set()
+        for group in groups:
+            found.update((a, b) for a in group for b in group if a < b)
+        true = len(found & planted)
+        precision = true / len(found) if found else 1.0
+        print(
+            f"{len(places):>10,} {len(groups):>7,} {elapsed:>7.1f} "
+            f"{elapsed / len(places) * 1e6:>9.1f} {precision:>10.3f} "
+            f"{true / len(planted):>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Event loop lag while many users search at once, inline vs. on the search pool.
+
+Run from the repository root:
+
+    python -m scripts.bench_event_loop_lag [--size 300000] [--searches 200]
+
+A synthetic store of ``--size`` places packed around central Addis Ababa
+(so a 2 km search has thousands of candidates) replaces the shared store.
+``--concurrency`` users then run ``FindMeHandler.search_page`` for
+``--searches`` different locations, through a ``WorkerPool`` with 0 workers
+(inline on the loop, as before offloading) and with each ``--workers``
+count. Meanwhile a ``LoopLagMonitor`` samples the loop every 5 ms: its
+lag is how long another user's button press would wait to be handled.
+
+Reported per pool size: wall time for all searches, lag samples taken
+(inline, the loop is blocked for the whole run) and lag p50/p99/max in
+milliseconds.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from handlers.findme import FindMeHandler
+from location_store import LocationStore, set_store
+from offload import LoopLagMonitor, WorkerPool
+from scripts.measure_store_memory import make_locations
+
+CENTER = (9.0108, 38.7613)
+
+
+def build_store(size, rng):
+    locations = make_locations(size, rng)
+    for place in locations:
+        place["coordinates"]["latitude"] = CENTER[0] + rng.uniform(-0.05, 0.05)
+        place["coordinates"]["longitude"] = CENTER[1] + rng.uniform(-0.05, 0.05)
+    return LocationStore(locations)
+
+
+async def run(workers, points, concurrency):
+    pool = WorkerPool("bench", workers, len(points))
+    monitor = LoopLagMonitor(interval=0.005, warning=float("inf"))
+    limit = asyncio.Semaphore(concurrency)
+
+    async def search(user_id, latitude, longitude):
+        async with limit:
+            await pool.run(FindMeHandler.search_page, user_id, latitude, longitude, None, 1)
+
+    monitor.start()
+    await asyncio.sleep(0.05)
+    monitor.reset()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(search(workers * 100_000 + i, lat, lon) for i, (lat, lon) in enumerate(points))
+    )
+    wall = time.perf_counter() - started
+    await asyncio.sleep(0.01)  # Let the monitor record the last stall
+    await monitor.stop()
+    pool.shutdown()
+    return wall, monitor.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=300_000)
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.DEBUG)  # Per-search cursor logging
+
+    rng = random.Random(args.seed)
+    set_store(build_store(args.size, rng))
+    points = [
+        (CENTER[0] + rng.uniform(-0.03, 0.03), CENTER[1] + rng.uniform(-0.03, 0.03))
+        for _ in range(args.searches)
+    ]
+
+    print(
+        f"{'workers':>7} {'wall s':>7} {'samples':>8} "
+        f"{'lag p50':>8} {'lag p99':>8} {'lag max':>8}"
+    )
+    for workers in [0, *args.workers]:
+        wall, lag = asyncio.run(run(workers, points, args.concurrency))
+        print(
+            f"{workers:>7} {wall:>7.2f} {lag['samples']:>8} {lag['p50_ms']:>8.1f} "
+            f"{lag['p99_ms']:>8.1f} {lag['max_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark a full OSM refresh: the old sequential loop vs. the async pipeline.
+
+Run from the repository root:
+
+    python -m scripts.bench_overpass_fetch [--latency 1.5]
+
+Both paths fetch every supported category from a local Overpass stand-in
+(see ``scripts.overpass_standin``) that answers each query after
+``--latency`` seconds and grants 2 concurrent slots, like overpass-api.de.
+
+The sequential path is the previous ``fetch_all_categories`` loop: a
+``time.sleep(2)`` and a fresh ``requests.post`` per category. The async
+path is ``OSMDataFetcher.fetch_all_categories_async`` with its default
+concurrency and rate limits (one combined, streamed query for all
+categories).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
+from osm_fetcher import OSMDataFetcher  # noqa: E402
+from config import SUPPORTED_CATEGORIES  # noqa: E402
+from scripts.overpass_standin import StandInOverpass  # noqa: E402
+
+
+def sequential_refresh():
+    """The pre-async loop, kept here as the baseline"""
+    locations = []
+    for category in SUPPORTED_CATEGORIES:
+        time.sleep(2)
+        locations.extend(OSMDataFetcher.fetch_category_data(category))
+    return locations
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.5)
+    parser.add_argument("--per-tag", type=int, default=150)
+    args = parser.parse_args()
+
+    print(
+        f"categories={len(SUPPORTED_CATEGORIES)} latency={args.latency}s "
+        f"slots=2 nodes/tag={args.per_tag}"
+    )
+    print(f"{'path':<12} {'wall s':>7} {'places':>7} {'requests':>9} {'429s':>5} {'max active':>11}")
+    runs = [
+        ("sequential", sequential_refresh),
+        ("async", lambda: asyncio.run(OSMDataFetcher.fetch_all_categories_async())),
+    ]
+    for name, refresh in runs:
+        with StandInOverpass(latency=args.latency, per_tag=args.per_tag) as server:
+            OSMDataFetcher.OVERPASS_API = server.url
+            locations, elapsed = timed(refresh)
+            print(
+                f"{name:<12} {elapsed:>7.1f} {len(locations):>7} "
+                f"{server.requests:>9} {server.rejected:>5} {server.max_active:>11}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark OSM refresh memory: per-category buffered vs. combined streamed.
+
+Run from the repository root:
+
+    python -m scripts.bench_overpass_parse [--per-tag 20000]
+
+A local Overpass stand-in (``scripts.overpass_standin``) is started in a
+separate process, so only the client's memory is traced. ``--per-tag``
+sets how many nodes match each OSM tag, i.e. how large the bounding box
+is; 20,000 gives 440k nodes over the 22 tags we query.
+
+    per-category: the previous pipeline, one query per category (node, way
+                  and relation filters, ``out body; >; out skel qt;``),
+                  each response decoded whole with ``response.json()``
+    combined:     one query for all categories (ways and relations with
+                  ``out center``), parsed element by element while
+                  streaming (``stream_locations``)
+
+Wall time comes from an untraced run. Peak is the tracemalloc peak of a
+second, traced run; retained is what the resulting location list holds
+afterwards, so peak minus retained is the parsing overhead.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
+from osm_fetcher import OSMDataFetcher  # noqa: E402
+from overpass_client import OverpassClient  # noqa: E402
+from config import SUPPORTED_CATEGORIES  # noqa: E402
+
+LEGACY_QUERY = """
+[out:json][timeout:25];
+(
+    {filters}
+);
+out body;
+>;
+out skel qt;
+"""
+
+
+def legacy_query(category):
+    filters = []
+    for bbox in OSMDataFetcher.region_bboxes():
+        for tag in OSMDataFetcher.CATEGORY_TAGS[category]:
+            key, value = tag.split("=")
+            for kind in ("node", "way", "relation"):
+                filters.append(f'{kind}["{key}"="{value}"]({bbox});')
+    return LEGACY_QUERY.format(filters=" ".join(filters))
+
+
+async def per_category(url):
+    async with OverpassClient(url, rate=100, burst=100) as client:
+        locations = []
+        for category in SUPPORTED_CATEGORIES:
+            data = await client.query(legacy_query(category))
+            locations.extend(
+                OSMDataFetcher.collect_locations(data.get("elements", []), [category])
+            )
+            del data
+        return locations
+
+
+async def combined(url):
+    async with OverpassClient(url, rate=100, burst=100) as client:
+        return await OSMDataFetcher.stream_locations(
+            client, OSMDataFetcher.build_overpass_query()
+        )
+
+
+def measure(refresh, url):
+    """Wall time of an untraced run, then memory of a traced one"""
+    started = time.perf_counter()
+    count = len(asyncio.run(refresh(url)))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    locations = asyncio.run(refresh(url))
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del locations
+    return count, elapsed, peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-tag", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "scripts.overpass_standin",
+            "--port", str(args.port), "--latency", "0",
+            "--slots", "4", "--per-tag", str(args.per_tag),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        url = server.stdout.readline().split()[-1]
+        print(f"nodes per tag={args.per_tag:,}")
+        print(f"{'path':<14} {'places':>8} {'wall s':>7} {'peak MiB':>9} {'retained MiB':>13} {'overhead MiB':>13}")
+        for name, refresh in [("per-category", per_category), ("combined", combined)]:
+            count, elapsed, peak, retained = measure(refresh, url)
+            print(
+                f"{name:<14} {count:>8,} {elapsed:>7.1f} {peak / 2**20:>9.1f} "
+                f"{retained / 2**20:>13.1f} {(peak - retained) / 2**20:>13.1f}"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Benchmark bot startup loading: pretty-printed JSON vs. the binary snapshot.
+
+Run from the repository root:
+
+    python -m scripts.bench_snapshot_load [--size 100000]
+
+The dataset is built like in ``scripts.measure_store_memory`` and written
+both as ``indent=2`` JSON (what the fetcher used to publish) and as a
+snapshot. Each file is then loaded the way the bot does at startup, with
+``LocationStore.from_file``, and split into reading the data (JSON parse
+or snapshot decode) and building the indexes. Times are the best of
+``--repeat`` runs.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from location_store import LocationStore
+from scripts.measure_store_memory import make_locations
+from snapshot import encode, read_snapshot, write_snapshot
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return encode(json.load(file)["locations"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    locations = make_locations(args.size, random.Random(args.seed))
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "locations.json")
+        snapshot_path = os.path.join(directory, "locations.bin")
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump({"locations": locations}, file, ensure_ascii=False, indent=2)
+        write_snapshot(encode(locations), snapshot_path)
+        del locations
+
+        print(f"places={args.size:,}")
+        print(f"{'file':<9} {'MiB':>7} {'read s':>7} {'load s':>7}")
+        for name, path, read in (
+            ("json", json_path, lambda: read_json(json_path)),
+            ("snapshot", snapshot_path, lambda: read_snapshot(snapshot_path)),
+        ):
+            size = os.path.getsize(path) / 2**20
+            read_time = best(read, args.repeat)
+            load_time = best(lambda: LocationStore.from_file(path, strict=True), args.repeat)
+            print(f"{name:<9} {size:>7.1f} {read_time:>7.2f} {load_time:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Benchmark radius queries: linear scan vs. the grid spatial index.
+
+Run from the repository root:
+
+    python -m scripts.bench_spatial_index
+
+Synthetic POIs are generated with the same density profile as the current
+Addis data (2,663 places in ADDIS_BBOX): the smallest dataset stays in the
+city box, larger datasets grow the covered area so the density near each
+query stays realistic. Query points are drawn from the data itself.
+
+Both paths use the vectorized distance engine from ``geo``; the linear
+scan computes distances to every POI, the grid path only to candidates.
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from config import RADIUS_SEARCH, GRID_CELL_SIZE
+from geo import distances
+from spatial_index import GridIndex
+
+ADDIS_CENTER = (9.0, 38.8)
+ADDIS_SIDE_DEGREES = 0.2
+ADDIS_POIS = 2663
+
+
+def make_points(count, rng):
+    """Uniform points over a square sized to keep Addis POI density"""
+    side = ADDIS_SIDE_DEGREES * math.sqrt(max(count / ADDIS_POIS, 1.0))
+    lat0, lon0 = ADDIS_CENTER
+    return [
+        (
+            lat0 + rng.uniform(-side / 2, side / 2),
+            lon0 + rng.uniform(-side / 2, side / 2),
+        )
+        for _ in range(count)
+    ]
+
+
+def linear_query(lats, lons, lat, lon, radius):
+    return np.flatnonzero(distances(lat, lon, lats, lons) <= radius)
+
+
+def grid_query(grid, lats, lons, lat, lon, radius):
+    ids = grid.query_radius(lat, lon, radius)
+    inside = distances(lat, lon, lats[ids], lons[ids]) <= radius
+    return ids[inside], len(ids)
+
+
+def run(size, queries, radius, cell_size, rng):
+    points = make_points(size, rng)
+    targets = rng.sample(points, queries)
+    lats = np.array([p[0] for p in points])
+    lons = np.array([p[1] for p in points])
+
+    started = time.perf_counter()
+    grid = GridIndex(lats, lons, cell_size)
+    build = time.perf_counter() - started
+
+    grid_time = 0.0
+    candidates = hits = 0
+    for lat, lon in targets:
+        started = time.perf_counter()
+        found, scanned = grid_query(grid, lats, lons, lat, lon, radius)
+        grid_time += time.perf_counter() - started
+        candidates += scanned
+        hits += len(found)
+
+    linear_time = 0.0
+    for lat, lon in targets:
+        started = time.perf_counter()
+        linear_query(lats, lons, lat, lon, radius)
+        linear_time += time.perf_counter() - started
+
+    return {
+        "size": size,
+        "build_ms": build * 1000,
+        "grid_ms": grid_time / queries * 1000,
+        "linear_ms": linear_time / queries * 1000,
+        "candidates": candidates / queries,
+        "hits": hits / queries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[ADDIS_POIS, 100_000, 1_000_000]
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--radius", type=float, default=RADIUS_SEARCH)
+    parser.add_argument("--cell-size", type=float, default=GRID_CELL_SIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(
+        f"radius={args.radius:.0f}m cell={args.cell_size:.0f}m "
+        f"queries={args.queries}"
+    )
+    print(
+        f"{'POIs':>10} {'build ms':>9} {'candidates':>10} {'hits':>7} "
+        f"{'linear ms/q':>14} {'grid ms/q':>10} {'speedup':>8}"
+    )
+    for size in args.sizes:
+        result = run(
+            size, args.queries, args.radius, args.cell_size, rng
+        )
+        print(
+            f"{result['size']:>10,} {result['build_ms']:>9.1f} "
+            f"{result['candidates']:>10.0f} {result['hits']:>7.0f} "
+            f"{result['linear_ms']:>14.2f} {result['grid_ms']:>10.2f} "
+            f"{result['linear_ms'] / result['grid_ms']:>7.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark the SQLite store backend against the in-memory LocationStore.
+
+Run from the repository root:
+
+    python -m scripts.bench_sqlite_store [--sizes 10000 100000 1000000]
+
+For each size a dataset is built like in ``scripts.measure_store_memory``
+(country-wide spread) and published both as a snapshot and as a SQLite
+database. Each backend is then measured in a fresh process, so the
+resident memory it adds is not blurred by the other one:
+
+    open ms    loading the snapshot / opening the database
+    RSS MiB    resident memory added by opening and querying
+    nearby     ``nearby`` within RADIUS_SEARCH, all results read
+    nearest    ``nearest`` with k=MAX_RESULTS
+    category   first page of a category listing (``by_category``)
+
+Query times are medians over ``--queries`` random points, in ms.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from config import MAX_RESULTS, RADIUS_SEARCH
+from scripts.measure_store_memory import make_locations
+from snapshot import encode, write_snapshot
+from sqlite_store import build_database
+
+
+def rss_mib():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def median_ms(function, arguments):
+    times = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times) * 1000
+
+
+def worker(path, queries, seed):
+    """Measure one backend; prints its numbers as JSON"""
+    from location_store import LocationStore
+
+    before = rss_mib()
+    started = time.perf_counter()
+    store = LocationStore.from_file(path, strict=True)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(seed)
+    points = [
+        (9.0 + rng.uniform(-3.0, 3.0), 38.75 + rng.uniform(-3.0, 3.0))
+        for _ in range(queries)
+    ]
+    categories = store.categories()
+    results = {
+        "open_ms": open_ms,
+        "nearby": median_ms(
+            lambda lat, lon: store.nearby(lat, lon, RADIUS_SEARCH), points
+        ),
+        "nearest": median_ms(
+            lambda lat, lon: store.nearest(lat, lon, MAX_RESULTS), points
+        ),
+        "category": median_ms(
+            lambda name: [p.copy() for p in store.by_category(name)[:MAX_RESULTS]],
+            [(rng.choice(categories),) for _ in range(queries)],
+        ),
+    }
+    results["rss_mib"] = rss_mib() - before
+    print(json.dumps(results))
+
+
+def measure(path, queries, seed):
+    output = subprocess.run(
+        [
+            sys.executable, "-m", "scripts.bench_sqlite_store",
+            "--worker", path, "--queries", str(queries), "--seed", str(seed),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.queries, args.seed)
+        return
+
+    print(
+        f"{'places':>9} {'backend':<8} {'file MiB':>9} {'open ms':>8} {'RSS MiB':>8} "
+        f"{'nearby':>7} {'nearest':>8} {'category':>9}"
+    )
+    for size in args.sizes:
+        columns = encode(make_locations(size, random.Random(args.seed)))
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "locations.bin")
+            database = os.path.join(directory, "locations.sqlite")
+            write_snapshot(columns, snapshot)
+            build_database(columns, database)
+            for backend, path in (("memory", snapshot), ("sqlite", database)):
+                r = measure(path, args.queries, args.seed)
+                print(
+                    f"{size:>9,} {backend:<8} {os.path.getsize(path) / 2**20:>9.1f} "
+                    f"{r['open_ms']:>8.0f} {r['rss_mib']:>8.1f} {r['nearby']:>7.2f} "
+                    f"{r['nearest']:>8.2f} {r['category']:>9.2f}"
+                )
+        del columns
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark the tiled OSM fetch against one query per region.
+
+Run from the repository root:
+
+    python -m scripts.bench_tiled_fetch [--per-tag 400] [--max-elements 3000]
+
+A local Overpass stand-in serves a synthetic world for three regions: the
+Addis metro area (with a dense city core on top) and two smaller cities.
+Like the real server under ``[timeout:25]``, the stand-in gives up on any
+query matching more than ``--max-elements`` elements, and every query
+takes ``--latency`` seconds.
+
+    single   one query per region, as before (no tiling or splitting)
+    tiled    ``fetch_snapshot_async`` with the configured tile sizes
+
+Reported: places fetched, queries sent, server time-outs, wall time, and
+whether the result holds every POI of the world exactly once (areas that
+cross a tile border are returned by both tiles and must be merged). Wall
+time is mostly the client's rate limit of one query start per second.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
+from osm_fetcher import OSMDataFetcher  # noqa: E402
+from scripts.overpass_standin import (  # noqa: E402
+    StandInOverpass,
+    query_filters,
+    synthetic_world,
+)
+
+REGIONS = {
+    "Addis Ababa": (8.8, 38.6, 9.15, 39.0),
+    "Adama": (8.48, 39.2, 8.6, 39.33),
+    "Bahir Dar": (11.54, 37.33, 11.63, 37.43),
+}
+CORE = (8.98, 38.72, 9.05, 38.8)
+
+
+def offset_ids(world, offset):
+    """Shift all ids (and references) of a world, so worlds can be combined"""
+    for element in world:
+        element["id"] += offset
+        if "nodes" in element:
+            element["nodes"] = [ref + offset for ref in element["nodes"]]
+        for member in element.get("members", ()):
+            member["ref"] += offset
+    return world
+
+
+def build_world(per_tag):
+    tags, _ = query_filters(OSMDataFetcher.build_overpass_query())
+    boxes = [*REGIONS.values(), CORE]
+    world = []
+    for i, bbox in enumerate(boxes):
+        # The core is as dense as the whole metro area
+        count = per_tag if bbox in (REGIONS["Addis Ababa"], CORE) else per_tag // 8
+        part = synthetic_world(tags, count, bbox=bbox, seed=i)
+        world += offset_ids(part, i * 10**11)
+    return world
+
+
+def expected_places(world):
+    """Places a complete fetch must return: named POIs, one per category"""
+    return sorted(
+        (location["osm_type"], location["osm_id"], location["category"])
+        for location in OSMDataFetcher.collect_locations(world)
+    )
+
+
+async def single(tile_size):
+    return await OSMDataFetcher.fetch_snapshot_async(
+        tile_size=tile_size, min_tile_size=tile_size, tile_retries=0
+    )
+
+
+def run(server, refresh):
+    requests, timeouts = server.requests, server.timeouts
+    started = time.perf_counter()
+    locations, _ = asyncio.run(refresh)
+    elapsed = time.perf_counter() - started
+    return (
+        locations,
+        server.requests - requests,
+        server.timeouts - timeouts,
+        elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-tag", type=int, default=400)
+    parser.add_argument("--max-elements", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    world = build_world(args.per_tag)
+    expected = expected_places(world)
+    print(
+        f"{len(world):,} elements, {len(expected):,} places in {len(REGIONS)} regions; "
+        f"server gives up above {args.max_elements:,} elements per query"
+    )
+    OSMDataFetcher.REGIONS = REGIONS
+    with StandInOverpass(
+        latency=args.latency, world=world, max_elements=args.max_elements
+    ) as server:
+        OSMDataFetcher.OVERPASS_API = server.url
+        print(
+            f"{'fetch':<8} {'places':>8} {'queries':>8} {'timeouts':>9} "
+            f"{'wall s':>7} {'complete':>9}"
+        )
+        for name, refresh in (
+            ("single", single(360.0)),
+            ("tiled", OSMDataFetcher.fetch_snapshot_async()),
+        ):
+            locations, queries, timeouts, elapsed = run(server, refresh)
+            found = sorted(
+                (location["osm_type"], location["osm_id"], location["category"])
+                for location in locations
+            )
+            print(
+                f"{name:<8} {len(locations):>8,} {queries:>8} {timeouts:>9} "
+                f"{elapsed:>7.1f} {str(found == expected):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main()
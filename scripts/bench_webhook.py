@@ -0,0 +1,234 @@
+"""Load test of webhook mode: synthetic updates posted to the embedded server.
+
+Run from the repository root (needs python-telegram-bot[webhooks]):
+
+    python -m scripts.bench_webhook [--updates 2000] [--rate 200]
+
+The bot's real Application (``bot.build_application``, all handlers)
+serves a local webhook. Its Bot API calls (getMe, setWebhook, sendMessage,
+...) are answered in-process by ``LocalBotAPI`` after ``--api-latency``
+seconds, so nothing reaches Telegram. A sender process posts
+``--updates`` synthetic updates (/start, /info, menu and
+category buttons, from ``--users`` users) at ``--rate`` per second, with
+the secret token header.
+
+Time-to-handler is measured from just before an update is posted to when
+the first handler (a TypeHandler in group -1) sees it, on the system-wide
+monotonic clock, so the sender's own work doesn't slow the bot; reported as
+p50/p99/max in ms, next to the HTTP answers and a check that requests
+with a wrong secret token are refused.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+from telegram.request import BaseRequest
+
+from bot import ALLOWED_UPDATES, build_application
+from callback_data import CATEGORIES, CATEGORY_PAGE, encode
+from location_store import load_hub_store, load_store
+
+SECRET = "load-test-secret"
+PATH = "telegram"
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Felagi", "username": "felagi_bot"}
+
+
+class LocalBotAPI(BaseRequest):
+    """Answers Bot API calls in-process instead of sending them to Telegram"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+        if name == "getMe":
+            result = BOT_USER
+        elif name.startswith(("send", "edit")):
+            chat_id = parameters.get("chat_id", 1)
+            result = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "ok",
+            }
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def synthetic_update(update_id: int, user_id: int) -> dict:
+    """A command message or a button press, cycling through what users do"""
+    user = {"id": user_id, "is_bot": False, "first_name": "Load"}
+    chat = {"id": user_id, "type": "private"}
+    kind = update_id % 4
+    if kind < 2:
+        text = "/start" if kind == 0 else "/info"
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": user,
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+            },
+        }
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": encode(CATEGORIES) if kind == 2 else encode(CATEGORY_PAGE, "hotels", 1),
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": BOT_USER,
+                "text": "menu",
+            },
+        },
+    }
+
+
+def send_updates(url, count, rate, users):
+    """Post updates at a steady rate; prints their send times and the answers as JSON"""
+    sent, statuses = {}, []
+
+    async def post(client, update):
+        sent[update["update_id"]] = time.monotonic()
+        response = await client.post(
+            url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+        )
+        statuses.append(response.status_code)
+
+    async def run():
+        limits = httpx.Limits(max_connections=100)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            started = time.monotonic()
+            tasks = []
+            for update_id in range(1, count + 1):
+                delay = started + (update_id - 1) / rate - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                update = synthetic_update(update_id, 1000 + update_id % users)
+                tasks.append(asyncio.create_task(post(client, update)))
+            await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    print(json.dumps({"sent": sent, "statuses": statuses}))
+
+
+async def serve(args):
+    api = LocalBotAPI(args.api_latency)
+    app = build_application(
+        Application.builder().token("1:local").request(api).get_updates_request(api)
+    )
+    received = {}
+    all_received = asyncio.Event()
+
+    async def record(update, context):
+        received[update.update_id] = time.monotonic()
+        if len(received) == args.updates:
+            all_received.set()
+
+    app.add_handler(TypeHandler(Update, record), group=-1)
+
+    url = f"http://127.0.0.1:{args.port}/{PATH}"
+    async with app:
+        await app.updater.start_webhook(
+            listen="127.0.0.1",
+            port=args.port,
+            url_path=PATH,
+            secret_token=SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+        )
+        await app.start()
+
+        async with httpx.AsyncClient() as client:
+            wrong = await client.post(
+                url,
+                json=synthetic_update(0, 1),
+                headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            )
+
+        sender = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "scripts.bench_webhook", "--send", url,
+            "--updates", str(args.updates), "--rate", str(args.rate),
+            "--users", str(args.users),
+            stdout=subprocess.PIPE,
+        )
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(all_received.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.monotonic() - started
+        output, _ = await sender.communicate()
+        report = json.loads(output.decode().strip().splitlines()[-1])
+        sent = {int(update_id): at for update_id, at in report["sent"].items()}
+        statuses = report["statuses"]
+
+        await app.updater.stop()
+        await app.stop()
+
+    latencies = sorted(
+        (received[update_id] - sent[update_id]) * 1000
+        for update_id in received
+        if update_id in sent
+    )
+    print(
+        f"wrong secret -> HTTP {wrong.status_code}; "
+        f"answers {dict(sorted((s, statuses.count(s)) for s in set(statuses)))}; "
+        f"{api.calls} Bot API calls"
+    )
+    print(f"{'updates':>8} {'rate/s':>7} {'handled':>8} {'wall s':>7} {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7}")
+    print(
+        f"{args.updates:>8} {args.rate:>7.0f} {len(latencies):>8} {elapsed:>7.1f} "
+        f"{statistics.median(latencies):>7.1f} "
+        f"{latencies[int(len(latencies) * 0.99) - 1]:>7.1f} {latencies[-1]:>7.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--api-latency", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8781)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--send", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.send:
+        send_updates(args.send, args.updates, args.rate, args.users)
+        return
+
+    load_store()
+    load_hub_store()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Measure the Overpass payload of the ways and relations we now fetch.
+
+Run from the repository root:
+
+    python -m scripts.measure_overpass_payload [--per-tag 2000]
+    python -m scripts.measure_overpass_payload --url https://overpass-api.de/api/interpreter
+
+Three forms of the all-categories query are sent and their response sizes
+compared:
+
+    nodes:    the previous query, tagged nodes only (``out body qt``)
+    skel:     nodes, ways and relations with their geometry, the way the old
+              per-category queries asked for it (``out body; >; out skel qt;``)
+    center:   nodes, ways and relations with server-side centres
+              (``out body center qt``), what ``build_overpass_query`` sends now
+
+By default the queries go to a local Overpass stand-in serving
+``synthetic_world`` (``--way-share`` of the POIs are closed ways of
+``--nodes-per-way`` nodes, ``--relation-share`` are multipolygons). With
+``--url`` they go to a real server instead, one at a time.
+"""
+import argparse
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
+from osm_fetcher import OSMDataFetcher  # noqa: E402
+from scripts.overpass_standin import (  # noqa: E402
+    StandInOverpass,
+    query_filters,
+    synthetic_world,
+)
+
+
+def queries():
+    """(name, query) for each way of asking for the same POIs"""
+    center = OSMDataFetcher.build_overpass_query()
+    nodes = center.replace("nwr[", "node[").replace("out body center qt;", "out body qt;")
+    skel = center.replace("out body center qt;", "out body;\n        >;\n        out skel qt;")
+    return [("nodes", nodes), ("skel", skel), ("center", center)]
+
+
+def measure(url, query):
+    """(bytes, elements, tagged elements, places) of one query's response"""
+    response = requests.post(url, data=query, timeout=300)
+    response.raise_for_status()
+    elements = response.json().get("elements", [])
+    tagged = sum(1 for element in elements if element.get("tags"))
+    places = len(OSMDataFetcher.collect_locations(elements))
+    return len(response.content), len(elements), tagged, places
+
+
+def report(url, pause=0.0):
+    print(
+        f"{'query':<8} {'KiB':>9} {'elements':>9} {'tagged':>7} "
+        f"{'places':>7} {'B/place':>8} {'vs nodes':>9}"
+    )
+    baseline = None
+    for name, query in queries():
+        size, elements, tagged, places = measure(url, query)
+        baseline = baseline or size
+        print(
+            f"{name:<8} {size / 1024:>9.0f} {elements:>9} {tagged:>7} "
+            f"{places:>7} {size / max(places, 1):>8.0f} {size / baseline:>8.2f}x"
+        )
+        time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Overpass endpoint (default: local stand-in)")
+    parser.add_argument("--per-tag", type=int, default=2000)
+    parser.add_argument("--way-share", type=float, default=0.3)
+    parser.add_argument("--relation-share", type=float, default=0.02)
+    parser.add_argument("--nodes-per-way", type=int, default=12)
+    args = parser.parse_args()
+
+    if args.url:
+        report(args.url, pause=10)
+        return
+
+    tags, bbox = query_filters(OSMDataFetcher.build_overpass_query())
+    world = synthetic_world(
+        tags,
+        args.per_tag,
+        way_share=args.way_share,
+        relation_share=args.relation_share,
+        nodes_per_way=args.nodes_per_way,
+        bbox=bbox,
+    )
+    print(
+        f"tags={len(tags)} POIs/tag={args.per_tag} way share={args.way_share} "
+        f"relation share={args.relation_share} nodes/way={args.nodes_per_way}"
+    )
+    with StandInOverpass(latency=0, world=world) as server:
+        report(server.url)
+
+
+if __name__ == "__main__":
+    main()
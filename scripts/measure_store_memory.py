@@ -0,0 +1,81 @@
+"""Measure LocationStore memory per POI on a synthetic country-sized dataset.
+
+Run from the repository root:
+
+    python -m scripts.measure_store_memory [--size 500000]
+
+The current ``data/locations.json`` records are replicated with jittered
+coordinates and unique names until ``--size`` places exist, so optional
+fields (descriptions, opening hours, contacts) keep their real sparsity.
+The dataset is serialized to JSON first; ``tracemalloc`` then traces
+parsing it and building the store, as ``LocationStore.from_file`` does, and
+the parsed input is dropped before measuring. What remains is what the
+store (including its spatial indexes) keeps alive.
+
+For comparison the same dataset is also measured as the parsed list of
+dicts, which is what a store of one dict per place keeps before any
+index is built: a lower bound for the row layout the store replaced.
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from config import LOCATIONS_FILE
+from location_store import LocationStore
+
+
+def make_locations(size, rng):
+    with open(LOCATIONS_FILE, "r", encoding="utf-8") as file:
+        base = json.load(file)["locations"]
+
+    locations = []
+    for i in range(size):
+        source = base[i % len(base)]
+        place = json.loads(json.dumps(source))
+        if i >= len(base):
+            place["name"] = f"{source['name']} {i}"
+            place["coordinates"]["latitude"] += rng.uniform(-3.0, 3.0)
+            place["coordinates"]["longitude"] += rng.uniform(-3.0, 3.0)
+        locations.append(place)
+    return locations
+
+
+def traced(build):
+    """(result, bytes it keeps alive, peak bytes while building, build seconds)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    text = json.dumps({"locations": make_locations(args.size, random.Random(args.seed))})
+
+    # The rows are measured while kept; the store's parsed input is dropped
+    rows, row_bytes, _, _ = traced(lambda: json.loads(text)["locations"])
+    del rows
+    store, store_bytes, peak, elapsed = traced(
+        lambda: LocationStore(json.loads(text)["locations"])
+    )
+
+    print(f"places:        {len(store):,}")
+    print(f"build time:    {elapsed:.1f}s (under tracemalloc)")
+    print(f"list of dicts: {row_bytes / 2**20:.1f} MiB, {row_bytes / len(store):.0f} bytes per POI")
+    print(f"store memory:  {store_bytes / 2**20:.1f} MiB, {store_bytes / len(store):.0f} bytes per POI")
+    print(f"peak build:    {peak / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
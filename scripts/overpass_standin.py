@@ -0,0 +1,514 @@
+"""Local stand-in for the Overpass API, for benchmarks and offline runs.
+
+Serves ``POST /api/interpreter`` from a background thread. Each query is
+answered after ``latency`` seconds with synthetic nodes for every
+``["key"="value"]`` filter in the query, placed inside the query's bbox.
+Like overpass-api.de it only grants ``slots`` concurrent queries and
+answers any extra one with ``429 Too Many Requests``, and with
+``max_elements`` set, a query matching more elements than that "times
+out": the response ends with a runtime error remark after part of them.
+
+To test retries and mirror selection, ``fault_rate`` of the queries fail
+on purpose, each in one of the ``faults`` ways: "429" (rate limited, with
+a Retry-After header), "504" (server busy) or "drop" (connection closed
+without an answer).
+
+Given a ``world`` of elements instead (see ``synthetic_world`` for one with
+ways and relations), it serves those, filtered by tag and bbox and shaped
+by the query's ``out`` mode (``out center``, ``>; out skel``), and keeps an edit log with its own OSM database clock, so augmented
+diff queries (``[adiff:"<timestamp>"]``) are answered too. This is the
+fixture for testing incremental updates offline:
+
+    with StandInOverpass(latency=0, world=elements) as server:
+        ...full fetch...
+        server.edit({"type": "node", "id": 1, ...})     # create or modify
+        server.edit(delete=("node", 2))
+        ...incremental fetch...
+
+    with StandInOverpass(latency=1.5) as server:
+        OSMDataFetcher.OVERPASS_API = server.url
+        ...
+
+It can also run on its own, e.g. to keep it out of a memory measurement:
+
+    python -m scripts.overpass_standin --port 8765 --latency 0.5
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import quoteattr
+
+TAG_FILTER = re.compile(r'\["([^"]+)"="([^"]+)"\]')
+TYPE_FILTER = re.compile(r'\b(node|way|relation|nwr)\[')
+BBOX = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+DEFAULT_BBOX = (8.9, 38.7, 9.1, 38.9)
+ADIFF = re.compile(r'\[adiff:"([^"]+)"\]')
+OUT_CENTER = re.compile(r"\bout\b[^;]*\bcenter\b")
+RECURSE_DOWN = re.compile(r"(?:^|;)\s*>\s*;", re.MULTILINE)
+OSM_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def query_bboxes(query):
+    """Distinct bboxes of an Overpass QL query, as (south, west, north, east)"""
+    boxes = [tuple(map(float, match)) for match in BBOX.findall(query)]
+    return list(dict.fromkeys(boxes)) or [DEFAULT_BBOX]
+
+
+def query_filters(query):
+    """(tag filters, bbox) of an Overpass QL query; bbox encloses all its bboxes"""
+    boxes = query_bboxes(query)
+    bbox = (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes),
+    )
+    return list(dict.fromkeys(TAG_FILTER.findall(query))), bbox
+
+
+def query_types(query):
+    """Element types an Overpass QL query asks for"""
+    types = set()
+    for kind in TYPE_FILTER.findall(query):
+        types.update(("node", "way", "relation") if kind == "nwr" else (kind,))
+    return types or {"node", "way", "relation"}
+
+
+def matches(element, tags, bbox, types=None):
+    """Whether an element has one of the tags and lies inside the bbox.
+
+    ``bbox`` is one (south, west, north, east) box or a list of them.
+    """
+    if element is None or (types is not None and element["type"] not in types):
+        return False
+    boxes = bbox if isinstance(bbox, list) else [bbox]
+    if not any(element.get("tags", {}).get(key) == value for key, value in tags):
+        return False
+    # Like Overpass, an area matches every bbox its geometry reaches into,
+    # so one crossing a tile border is found by both tiles
+    bounds = element.get("bounds")
+    if bounds:
+        return any(
+            bounds["minlat"] <= north and bounds["maxlat"] >= south
+            and bounds["minlon"] <= east and bounds["maxlon"] >= west
+            for south, west, north, east in boxes
+        )
+    position = element.get("center") or element
+    return any(
+        south <= position["lat"] <= north and west <= position["lon"] <= east
+        for south, west, north, east in boxes
+    )
+
+
+def xml_element(element, visible=True):
+    """OSM XML for one element dict"""
+    kind, attrs = element["type"], f'id="{element["id"]}"'
+    if not visible:
+        return f'<{kind} {attrs} visible="false"/>'
+    children = []
+    if "center" in element:
+        center = element["center"]
+        children.append(f'<center lat="{center["lat"]}" lon="{center["lon"]}"/>')
+    elif "lat" in element:
+        attrs += f' lat="{element["lat"]}" lon="{element["lon"]}"'
+    children += [
+        f"<tag k={quoteattr(k)} v={quoteattr(v)}/>"
+        for k, v in element.get("tags", {}).items()
+    ]
+    return f"<{kind} {attrs}>{''.join(children)}</{kind}>"
+
+
+def render(element, mode):
+    """An element as Overpass outputs it: "body", "center" or "skel" """
+    shown = dict(element)
+    shown.pop("bounds", None)
+    if mode != "center" or shown["type"] == "node":
+        shown.pop("center", None)
+    if mode == "center":
+        shown.pop("nodes", None)
+        shown.pop("members", None)
+    if mode == "skel":
+        shown.pop("tags", None)
+    return shown
+
+
+def synthetic_world(
+    tags,
+    per_tag,
+    way_share=0.3,
+    relation_share=0.02,
+    nodes_per_way=12,
+    ways_per_relation=4,
+    bbox=DEFAULT_BBOX,
+    seed=0,
+):
+    """A world of named POIs, part of them mapped as areas.
+
+    ``way_share`` and ``relation_share`` of each tag's POIs are closed ways
+    of ``nodes_per_way`` nodes and multipolygon relations of
+    ``ways_per_relation`` such ways; the rest are nodes. Ways and relations
+    carry the ``center`` Overpass would compute for ``out center`` and the
+    ``bounds`` of their members, and their untagged member nodes and ways
+    are part of the world too.
+    """
+    rng = random.Random(seed)
+    south, west, north, east = bbox
+    world = []
+    # Members get ids above the crc32 range used for the POIs
+    next_id = {"node": 2**32, "way": 2**32}
+
+    def new_id(kind):
+        next_id[kind] += 1
+        return next_id[kind]
+
+    def ring(lat, lon):
+        """Member nodes of a closed way around (lat, lon); returns their ids"""
+        refs = []
+        for _ in range(nodes_per_way - 1):
+            node = {
+                "type": "node",
+                "id": new_id("node"),
+                "lat": round(lat + rng.uniform(-0.001, 0.001), 7),
+                "lon": round(lon + rng.uniform(-0.001, 0.001), 7),
+            }
+            world.append(node)
+            refs.append(node["id"])
+        return refs + refs[:1]
+
+    for key, value in tags:
+        for i in range(per_tag):
+            lat = round(rng.uniform(south, north), 7)
+            lon = round(rng.uniform(west, east), 7)
+            element = {
+                "tags": {key: value, "name": f"{value.replace('_', ' ').title()} {i}"}
+            }
+            roll = rng.random()
+            if roll < relation_share:
+                members = []
+                for _ in range(ways_per_relation):
+                    way = {"type": "way", "id": new_id("way"), "nodes": ring(lat, lon)}
+                    world.append(way)
+                    members.append({"type": "way", "ref": way["id"], "role": "outer"})
+                element["tags"]["type"] = "multipolygon"
+                element.update(
+                    type="relation",
+                    id=zlib.crc32(f"{key}={value}:{i}".encode()),
+                    members=members,
+                )
+            elif roll < relation_share + way_share:
+                element.update(
+                    type="way",
+                    id=zlib.crc32(f"{key}={value}:{i}".encode()),
+                    nodes=ring(lat, lon),
+                )
+            else:
+                element.update(
+                    type="node", id=zlib.crc32(f"{key}={value}:{i}".encode()),
+                    lat=lat, lon=lon,
+                )
+            if element["type"] != "node":
+                element["center"] = {"lat": lat, "lon": lon}
+                element["bounds"] = {
+                    "minlat": lat - 0.001, "minlon": lon - 0.001,
+                    "maxlat": lat + 0.001, "maxlon": lon + 0.001,
+                }
+            world.append(element)
+    return world
+
+
+def synthetic_nodes(query, per_tag, seed=0):
+    """Named nodes matching each tag filter of an Overpass QL query"""
+    rng = random.Random(seed)
+    tags, (south, west, north, east) = query_filters(query)
+    elements = []
+    for key, value in tags:
+        for i in range(per_tag):
+            node_id = zlib.crc32(f"{key}={value}:{i}".encode())
+            elements.append(
+                {
+                    "type": "node",
+                    "id": node_id,
+                    "lat": round(rng.uniform(south, north), 7),
+                    "lon": round(rng.uniform(west, east), 7),
+                    "tags": {
+                        key: value,
+                        "name": f"{value.replace('_', ' ').title()} {i}",
+                        "opening_hours": "Mo-Sa 08:30-18:00" if i % 5 == 0 else "",
+                        "phone": f"+25111{node_id % 10**7:07d}" if i % 9 == 0 else "",
+                    },
+                }
+            )
+    return elements
+
+
+class StandInOverpass:
+    """Threaded local Overpass stand-in with configurable latency and slots"""
+
+    def __init__(
+        self,
+        latency=1.0,
+        slots=2,
+        per_tag=150,
+        world=None,
+        max_elements=None,
+        fault_rate=0.0,
+        faults=("429", "504", "drop"),
+        retry_after=1,
+        seed=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.latency = latency
+        self.slots = slots
+        self.max_elements = max_elements
+        self.timeouts = 0
+        self.fault_rate = fault_rate
+        self.faults = faults
+        self.retry_after = retry_after
+        self.injected = 0
+        self._random = random.Random(seed)
+        self.per_tag = per_tag
+        self.world = (
+            None if world is None else {(e["type"], e["id"]): e for e in world}
+        )
+        # OSM database clock; every edit advances it by one second
+        self.clock = datetime.now(timezone.utc).replace(microsecond=0)
+        self._edits = []
+        self.requests = 0
+        self.rejected = 0
+        self.max_active = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/interpreter"
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                fault = standin.fault()
+                if fault == "drop":
+                    self.close_connection = True
+                    return
+                if fault is not None:
+                    payload = b'{"remark": "injected fault"}'
+                    self.send_response(int(fault))
+                    if fault == "429":
+                        self.send_header("Retry-After", str(standin.retry_after))
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                status, payload = standin.answer(body.decode("utf-8"))
+                self.send_response(status)
+                xml = payload.startswith(b"<")
+                content_type = "application/osm3s+xml" if xml else "application/json"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def fault(self):
+        """The fault to inject into the next answer, or None"""
+        with self._lock:
+            if self._random.random() >= self.fault_rate:
+                return None
+            self.requests += 1
+            self.injected += 1
+            return self._random.choice(self.faults)
+
+    @property
+    def osm_base(self):
+        """Timestamp of the stand-in's current database state"""
+        return self.clock.strftime(OSM_TIMESTAMP_FORMAT)
+
+    def edit(self, element=None, delete=None):
+        """Create or replace ``element``, or delete the ``(type, id)`` in ``delete``"""
+        with self._lock:
+            if self.world is None:
+                self.world = {}
+            self.clock += timedelta(seconds=1)
+            key = delete if element is None else (element["type"], element["id"])
+            old = self.world.pop(key, None)
+            if element is not None:
+                self.world[key] = element
+            self._edits.append((self.clock, key, old, element))
+
+    def diff(self, query):
+        """Augmented diff XML of the edits since the query's adiff timestamp"""
+        since = datetime.strptime(
+            ADIFF.search(query).group(1), OSM_TIMESTAMP_FORMAT
+        ).replace(tzinfo=timezone.utc)
+        tags, _ = query_filters(query)
+        bbox = query_bboxes(query)
+        types = query_types(query)
+        with self._lock:
+            first_old, last_new = {}, {}
+            for stamp, key, old, new in self._edits:
+                if stamp > since:
+                    first_old.setdefault(key, old)
+                    last_new[key] = new
+            osm_base = self.osm_base
+
+        actions = []
+        for key, old in first_old.items():
+            new = last_new[key]
+            was, now = matches(old, tags, bbox, types), matches(new, tags, bbox, types)
+            if now and not was:
+                actions.append(f'<action type="create">{xml_element(new)}</action>')
+            elif was and now and old != new:
+                actions.append(
+                    f'<action type="modify"><old>{xml_element(old)}</old>'
+                    f"<new>{xml_element(new)}</new></action>"
+                )
+            elif was and not now:
+                current = xml_element(new) if new else xml_element(old, visible=False)
+                actions.append(
+                    f'<action type="delete"><old>{xml_element(old)}</old>'
+                    f"<new>{current}</new></action>"
+                )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<osm version="0.6" generator="Overpass API stand-in">\n'
+            f'<meta osm_base="{osm_base}"/>\n' + "\n".join(actions) + "\n</osm>\n"
+        )
+
+    def elements(self, query):
+        """Elements answering a (non-diff) query.
+
+        Output follows the query: ``out center`` gives ways and relations
+        their centre instead of member lists, and a ``>;`` recursion adds
+        the members (as ``skel``) of everything matched.
+        """
+        if self.world is None:
+            return synthetic_nodes(query, self.per_tag)
+        tags, _ = query_filters(query)
+        bbox = query_bboxes(query)
+        types = query_types(query)
+        mode = "center" if OUT_CENTER.search(query) else "body"
+        with self._lock:
+            found = [e for e in self.world.values() if matches(e, tags, bbox, types)]
+            elements = [render(e, mode) for e in found]
+            if RECURSE_DOWN.search(query):
+                elements += [render(e, "skel") for e in self._members(found)]
+        return elements
+
+    def _members(self, elements):
+        """Ways and nodes below ``elements``, each once, as ``>`` recurses"""
+        seen = {(e["type"], e["id"]) for e in elements}
+        ways, nodes = [], []
+        for element in elements:
+            refs = [(m["type"], m["ref"]) for m in element.get("members", [])]
+            refs += [("node", ref) for ref in element.get("nodes", [])]
+            for key in refs:
+                member = self.world.get(key)
+                if key in seen or member is None:
+                    continue
+                seen.add(key)
+                (ways if key[0] == "way" else nodes).append(member)
+                for ref in member.get("nodes", []):
+                    if ("node", ref) not in seen and ("node", ref) in self.world:
+                        seen.add(("node", ref))
+                        nodes.append(self.world[("node", ref)])
+        return ways + nodes
+
+    def answer(self, query):
+        """(status, body) for one query, honouring the slot limit"""
+        with self._lock:
+            self.requests += 1
+            if self._active >= self.slots:
+                self.rejected += 1
+                return 429, b'{"remark": "rate_limited"}'
+            self._active += 1
+            self.max_active = max(self.max_active, self._active)
+        try:
+            time.sleep(self.latency)
+            if ADIFF.search(query):
+                return 200, self.diff(query).encode()
+            elements = self.elements(query)
+            body = {
+                "version": 0.6,
+                "generator": "Overpass API stand-in",
+                "osm3s": {"timestamp_osm_base": self.osm_base},
+                "elements": elements,
+            }
+            if self.max_elements is not None and len(elements) > self.max_elements:
+                with self._lock:
+                    self.timeouts += 1
+                body["elements"] = elements[: self.max_elements]
+                body["remark"] = (
+                    'runtime error: Query timed out in "query" at line 3 '
+                    "after 25 seconds."
+                )
+            return 200, json.dumps(body).encode()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Overpass API stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--slots", type=int, default=2)
+    parser.add_argument("--per-tag", type=int, default=150)
+    parser.add_argument("--max-elements", type=int)
+    parser.add_argument("--fault-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StandInOverpass(
+        args.latency,
+        args.slots,
+        args.per_tag,
+        max_elements=args.max_elements,
+        fault_rate=args.fault_rate,
+        port=args.port,
+    )
+    print(f"Serving {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
+from config import (
+    CURSOR_CACHE_SIZE,
+    CURSOR_TTL,
+    RADIUS_SEARCH,
+    RESULT_CACHE_SIZE,
+    RESULT_CACHE_CELL_SIZE,
+)
+from location_store import LocationStore, RankedResults, get_store, on_reload
+from spatial_index import METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LON
+from utils import setup_logger
+
+logger = setup_logger("search_cache")
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used mapping with an optional per-entry TTL.
+
+    Expired entries are dropped lazily when they are looked up, and the
+    oldest entries are evicted once ``maxsize`` is exceeded, or once the
+    entries weigh more than ``maxweight`` in total when a ``weigh``
+    function (e.g. the size of a value in bytes) is given. Lookups are
+    counted in ``hits`` and ``misses``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+        maxweight: Optional[int] = None,
+        weigh: Optional[Callable[[Any], int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self._weigh = weigh
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires, weight = entry
+            if expires is not None and expires <= self._clock():
+                del self._data[key]
+                self.weight -= weight
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or replace a value, evicting the oldest entries if full"""
+        expires = self._clock() + self.ttl if self.ttl is not None else None
+        weight = self._weigh(value) if self._weigh is not None else 0
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.weight -= previous[2]
+            self._data[key] = (value, expires, weight)
+            self.weight += weight
+            while len(self._data) > self.maxsize or (
+                self.maxweight is not None and self.weight > self.maxweight
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.weight -= evicted
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+        if self._weigh is not None:
+            stats["weight"] = self.weight
+            stats["maxweight"] = self.maxweight
+        return stats
+
+
+@dataclass(frozen=True)
+class SearchCursor:
+    """Paging state of one nearby search.
+
+    Wraps lazily ordered results, so a page only orders the places up to
+    its end and copies the places it shows. The cursor pins the store
+    snapshot it was built from: ids stay valid even after the shared store
+    is reloaded.
+    """
+
+    results: RankedResults
+
+    @property
+    def store(self) -> LocationStore:
+        return self.results.store
+
+    @property
+    def version(self) -> int:
+        """Version of the pinned store snapshot"""
+        return self.results.store.version
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def total_pages(self, per_page: int) -> int:
+        return (len(self.results) + per_page - 1) // per_page
+
+    def page(self, page: int, per_page: int) -> List[Dict[str, Any]]:
+        """Places on a 1-based page, with ``distance`` in meters"""
+        start = (page - 1) * per_page
+        return self.results.slice(start, start + per_page)
+
+
+class ResultCache:
+    """Cross-user cache of nearby searches keyed on a quantized location.
+
+    Users a few meters apart (Meskel Square, Bole airport, Piazza) share one
+    entry per ``cell_size`` meter cell, radius and category. An entry holds
+    the ids of every place within ``radius`` of *any* point in the cell, so
+    each user still gets exact distances from their own location; only the
+    grid walk is shared. Entries are tagged with the store version and the
+    cache is cleared whenever the store is reloaded.
+    """
+
+    def __init__(self, maxsize: int, cell_size: float):
+        self.cell_size = cell_size
+        self.cell_degrees = cell_size / METERS_PER_DEGREE_LAT
+        # Farthest a user can be from the cell center, padded for rounding
+        aspect = METERS_PER_DEGREE_LON / METERS_PER_DEGREE_LAT
+        self.margin = cell_size / 2 * math.sqrt(1 + aspect**2) * 1.01
+        self._entries = LRUCache(maxsize)
+
+    def _cell(self, latitude: float, longitude: float):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def search(
+        self,
+        store: LocationStore,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Optional[str] = None,
+    ) -> RankedResults:
+        """Same result as ``store.search`` with the candidate scan cached"""
+        if max_distance is None:
+            return store.search(latitude, longitude, max_distance, category)
+
+        row, col = self._cell(latitude, longitude)
+        key = (
+            store.version,
+            row,
+            col,
+            max_distance,
+            category.lower() if category else None,
+        )
+        ids = self._entries.get(key)
+        if ids is None:
+            center_lat = (row + 0.5) * self.cell_degrees
+            center_lon = (col + 0.5) * self.cell_degrees
+            ids = store.search(
+                center_lat, center_lon, max_distance + self.margin, category
+            ).ids
+            self._entries.put(key, ids)
+        return store.within(latitude, longitude, ids, max_distance)
+
+    def invalidate(self, store: LocationStore = None) -> None:
+        """Drop every entry (called when the store is reloaded)"""
+        stats = self._entries.stats()
+        self._entries.clear()
+        logger.info(
+            f"Result cache invalidated: {stats['size']} entries, "
+            f"{stats['hits']} hits / {stats['misses']} misses "
+            f"(hit rate {stats['hit_rate']:.1%}) since start"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self._entries.stats()
+
+
+_results = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_CELL_SIZE)
+on_reload(_results.invalidate)
+
+
+def cached_search(
+    latitude: float,
+    longitude: float,
+    max_distance: Optional[float] = RADIUS_SEARCH,
+    category: Optional[str] = None,
+) -> RankedResults:
+    """Nearby search on the shared store through the shared result cache"""
+    return _results.search(get_store(), latitude, longitude, max_distance, category)
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the shared result cache"""
+    return _results.stats()
+
+
+_cursors = LRUCache(CURSOR_CACHE_SIZE, ttl=CURSOR_TTL)
+
+
+def get_cursor(
+    user_id: int,
+    latitude: float,
+    longitude: float,
+    category: Optional[str] = None,
+    max_distance: float = RADIUS_SEARCH,
+) -> SearchCursor:
+    """Return the cached cursor for this user's search, building it if needed"""
+    key = (
+        user_id,
+        round(latitude, 6),
+        round(longitude, 6),
+        category.lower() if category else None,
+        max_distance,
+    )
+    cursor = _cursors.get(key)
+    if cursor is None:
+        cursor = SearchCursor(
+            cached_search(latitude, longitude, max_distance, category)
+        )
+        _cursors.put(key, cursor)
+        logger.debug(
+            f"Built cursor for User {user_id}: {len(cursor)} places "
+            f"(store version {cursor.version})"
+        )
+    return cursor
@@ -0,0 +1,399 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config import LOCATIONS_FILE, LOCATIONS_SNAPSHOT
+from utils import setup_logger, validate_location_data
+
+logger = setup_logger("snapshot")
+
+# Snapshot file layout: magic, header length (uint32 LE), JSON header, then
+# the column sections, each aligned to 8 bytes
+MAGIC = b"FLGSNAP\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 8
+
+# Fields stored as dense columns rather than sparsely
+COLUMNS = ("name", "coordinates", "category", "osm_type", "osm_id")
+
+# OSM element types, by their code in the osm_type column (0: no OSM id)
+OSM_TYPES = (None, "node", "way", "relation")
+
+# Separator of the strings of a string section (stripped from the values)
+_SEPARATOR = "\x00"
+
+
+class SnapshotError(Exception):
+    """The snapshot file is not a snapshot, is corrupt, or is unsupported"""
+
+
+def manifest_path(path: str) -> str:
+    """Path of the manifest published next to a snapshot file"""
+    return f"{os.path.splitext(path)[0]}.manifest.json"
+
+
+def _parse_coordinates(place: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """Return (latitude, longitude) as floats, or None if unusable"""
+    coords = place.get("coordinates") or {}
+    try:
+        return float(coords["latitude"]), float(coords["longitude"])
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Invalid coordinates for place {place.get('name')}: {e}")
+        return None
+
+
+def _compact(value: Any) -> Any:
+    """Interned, immutable form of an optional value, or None if empty"""
+    if isinstance(value, str):
+        return sys.intern(value) if value else None
+    if isinstance(value, list):
+        return tuple(_compact(v) for v in value) or None
+    if value == {}:
+        return None
+    return value
+
+
+def encode(locations: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Column-wise form of a list of location dicts.
+
+    Names, category codes, coordinates and OSM type/id go in dense columns
+    (NaN coordinates when invalid); every other field is kept sparsely as
+    ``{place id: value}``, with dict-valued fields such as contact split into
+    one sparse column per key and empty values dropped. Invalid locations
+    are skipped.
+    """
+    names: List[str] = []
+    codes: List[int] = []
+    lats: List[float] = []
+    lons: List[float] = []
+    osm_types: List[int] = []
+    osm_ids: List[int] = []
+    category_codes: Dict[str, int] = {}
+    category_names: List[str] = []
+    fields: Dict[str, Dict[int, Any]] = {}
+    nested: Dict[str, Dict[str, Dict[int, Any]]] = {}
+    field_order: Dict[str, None] = {}
+
+    def store_field(idx: int, field: str, value: Any) -> None:
+        if isinstance(value, dict) and field != "coordinates":
+            columns = nested.setdefault(field, {})
+            for key, item in value.items():
+                item = _compact(item)
+                if item is not None:
+                    columns.setdefault(sys.intern(key), {})[idx] = item
+        else:
+            value = _compact(value)
+            if value is None:
+                return
+            fields.setdefault(field, {})[idx] = value
+        field_order.setdefault(sys.intern(field), None)
+
+    for location in locations:
+        if not validate_location_data(location):
+            logger.warning(f"Invalid location data: {location.get('name', 'Unknown')}")
+            continue
+        idx = len(names)
+        names.append(sys.intern(str(location["name"])))
+
+        category = location["category"]
+        code = category_codes.get(category.lower())
+        if code is None:
+            code = category_codes[category.lower()] = len(category_names)
+            category_names.append(sys.intern(category))
+        codes.append(code)
+
+        coords = _parse_coordinates(location)
+        lats.append(coords[0] if coords else np.nan)
+        lons.append(coords[1] if coords else np.nan)
+        if coords is None:
+            store_field(idx, "coordinates", location["coordinates"])
+
+        osm_type = location.get("osm_type")
+        osm_types.append(OSM_TYPES.index(osm_type) if osm_type in OSM_TYPES else 0)
+        osm_ids.append(int(location.get("osm_id") or 0))
+
+        for field, value in location.items():
+            if field not in COLUMNS:
+                store_field(idx, field, value)
+
+    return {
+        "names": names,
+        "categories": category_names,
+        "codes": np.array(
+            codes, dtype=np.uint8 if len(category_names) <= 256 else np.uint16
+        ),
+        "lats": np.array(lats, dtype=np.float64),
+        "lons": np.array(lons, dtype=np.float64),
+        "osm_types": np.array(osm_types, dtype=np.uint8),
+        "osm_ids": np.array(osm_ids, dtype=np.int64),
+        "fields": fields,
+        "nested": nested,
+        "field_order": list(field_order),
+    }
+
+
+def decode(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Location dicts back from their column-wise form"""
+    locations = []
+    categories = columns["categories"]
+    for idx, name in enumerate(columns["names"]):
+        lat = columns["lats"][idx]
+        location: Dict[str, Any] = {"name": name}
+        if not np.isnan(lat):
+            location["coordinates"] = {
+                "latitude": float(lat),
+                "longitude": float(columns["lons"][idx]),
+            }
+        location["category"] = categories[columns["codes"][idx]]
+        if columns["osm_types"][idx]:
+            location["osm_type"] = OSM_TYPES[columns["osm_types"][idx]]
+            location["osm_id"] = int(columns["osm_ids"][idx])
+        for field in columns["field_order"]:
+            if field in columns["nested"]:
+                value = {
+                    key: column[idx]
+                    for key, column in columns["nested"][field].items()
+                    if idx in column
+                }
+                if value:
+                    location[field] = value
+            elif idx in columns["fields"].get(field, ()):
+                value = columns["fields"][field][idx]
+                location[field] = list(value) if isinstance(value, tuple) else value
+        locations.append(location)
+    return locations
+
+
+class _Writer:
+    """Lays out column sections in one body buffer"""
+
+    def __init__(self):
+        self.body = bytearray()
+        self.sections: List[Dict[str, Any]] = []
+
+    def _append(self, name: str, data: bytes, **meta) -> None:
+        self.body += b"\x00" * (-len(self.body) % ALIGNMENT)
+        self.sections.append(
+            {"name": name, "offset": len(self.body), "nbytes": len(data), **meta}
+        )
+        self.body += data
+
+    def array(self, name: str, values: np.ndarray) -> None:
+        values = np.ascontiguousarray(values)
+        self._append(
+            name, values.tobytes(), dtype=values.dtype.str, count=len(values)
+        )
+
+    def strings(self, name: str, values: List[Any]) -> None:
+        """Strings joined with NUL; other values (tuples, numbers) as JSON"""
+        encoding = "utf-8"
+        if not all(isinstance(value, str) for value in values):
+            encoding = "json"
+            values = [json.dumps(value, ensure_ascii=False) for value in values]
+        data = _SEPARATOR.join(
+            value.replace(_SEPARATOR, "") for value in values
+        ).encode("utf-8")
+        self._append(name, data, dtype=encoding, count=len(values))
+
+    def sparse(self, name: str, column: Dict[int, Any]) -> None:
+        self.array(f"{name}#ids", np.fromiter(column, dtype=np.int32, count=len(column)))
+        self.strings(name, list(column.values()))
+
+
+def write_snapshot(
+    columns: Dict[str, Any],
+    path: str = LOCATIONS_SNAPSHOT,
+    **metadata,
+) -> Dict[str, Any]:
+    """Write columns as a snapshot file and publish its manifest.
+
+    The file is written to a temporary name, flushed to disk and renamed
+    over ``path`` in one step, so readers see either the old snapshot or
+    the complete new one. The manifest (version, checksum, counts and any
+    ``metadata``) is embedded in the file header and also written next to
+    it, last. The version is one more than the snapshot being replaced.
+    Returns the manifest.
+    """
+    writer = _Writer()
+    writer.strings("names", columns["names"])
+    writer.strings("categories", columns["categories"])
+    for name in ("codes", "lats", "lons", "osm_types", "osm_ids"):
+        writer.array(name, columns[name])
+    for field, column in columns["fields"].items():
+        writer.sparse(f"fields/{field}", column)
+    for field, nested in columns["nested"].items():
+        for key, column in nested.items():
+            writer.sparse(f"nested/{field}/{key}", column)
+
+    codes = columns["codes"]
+    counts = np.bincount(codes, minlength=len(columns["categories"]))
+    previous = read_manifest(path)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": (previous or {}).get("version", 0) + 1,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "count": len(columns["names"]),
+        "categories": {
+            name: int(count) for name, count in zip(columns["categories"], counts)
+        },
+        "checksum": f"sha256:{hashlib.sha256(writer.body).hexdigest()}",
+        **metadata,
+    }
+    header = json.dumps(
+        {**manifest, "field_order": columns["field_order"], "sections": writer.sections},
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(writer.body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    tmp_manifest = f"{manifest_path(path)}.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_manifest, manifest_path(path))
+    return manifest
+
+
+def _read_header(f) -> Dict[str, Any]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError(f"{f.name} is not a location snapshot")
+    (length,) = struct.unpack("<I", f.read(4))
+    header = json.loads(f.read(length))
+    if header.get("format") != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {header.get('format')}")
+    return header
+
+
+def read_manifest(path: str = LOCATIONS_SNAPSHOT) -> Optional[Dict[str, Any]]:
+    """Manifest of a snapshot file from its header, or None if there is none"""
+    try:
+        with open(path, "rb") as f:
+            header = _read_header(f)
+    except (OSError, ValueError, SnapshotError, struct.error):
+        return None
+    header.pop("sections", None)
+    header.pop("field_order", None)
+    return header
+
+
+def read_snapshot(
+    path: str = LOCATIONS_SNAPSHOT, verify: bool = True
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """(columns, manifest) of a snapshot file.
+
+    Array columns are read-only views of the file's bytes, so loading costs
+    one read plus decoding the strings. With ``verify`` the body checksum is
+    checked first. Raises SnapshotError if the file is invalid.
+    """
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        start = f.tell()
+        body = f.read()
+    if verify:
+        checksum = f"sha256:{hashlib.sha256(body).hexdigest()}"
+        if checksum != header["checksum"]:
+            raise SnapshotError(f"Checksum mismatch in {path}")
+
+    def section(meta):
+        data = memoryview(body)[meta["offset"]:meta["offset"] + meta["nbytes"]]
+        if meta["dtype"] not in ("utf-8", "json"):
+            return np.frombuffer(data, dtype=meta["dtype"], count=meta["count"])
+        if meta["count"] == 0:
+            return []
+        values = [sys.intern(s) for s in str(data, "utf-8").split(_SEPARATOR)]
+        if meta["dtype"] == "json":
+            values = [_compact(json.loads(value)) for value in values]
+        if len(values) != meta["count"]:
+            raise SnapshotError(f"Section {meta['name']} of {path} is corrupt")
+        return values
+
+    columns: Dict[str, Any] = {
+        "fields": {},
+        "nested": {},
+        "field_order": header["field_order"],
+    }
+    ids: Dict[str, np.ndarray] = {}
+    for meta in header["sections"]:
+        name = meta["name"]
+        if name.endswith("#ids"):
+            ids[name[:-4]] = section(meta)
+        elif "/" not in name:
+            columns[name] = section(meta)
+        else:
+            column = dict(zip(ids.pop(name).tolist(), section(meta)))
+            kind, field, *key = name.split("/")
+            if kind == "fields":
+                columns["fields"][field] = column
+            else:
+                columns["nested"].setdefault(field, {})[key[0]] = column
+
+    manifest = {
+        key: value
+        for key, value in header.items()
+        if key not in ("sections", "field_order")
+    }
+    return columns, manifest
+
+
+def export_json(
+    path: str = LOCATIONS_SNAPSHOT, out: str = LOCATIONS_FILE, key: str = "locations"
+) -> int:
+    """Write a snapshot's places as a JSON data file; returns how many"""
+    columns, _ = read_snapshot(path)
+    locations = decode(columns)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({key: locations}, f, ensure_ascii=False, indent=2)
+    return len(locations)
+
+
+def import_json(
+    path: str = LOCATIONS_FILE, out: str = LOCATIONS_SNAPSHOT, key: str = "locations"
+) -> Dict[str, Any]:
+    """Publish a JSON data file as a snapshot; returns its manifest"""
+    with open(path, "r", encoding="utf-8") as f:
+        locations = json.load(f).get(key, [])
+    return write_snapshot(encode(locations), out, source=os.path.basename(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Location snapshot tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Write a snapshot as JSON")
+    export.add_argument("--snapshot", default=LOCATIONS_SNAPSHOT)
+    export.add_argument("--out", default=LOCATIONS_FILE)
+    imported = commands.add_parser("import", help="Publish a JSON file as a snapshot")
+    imported.add_argument("json", nargs="?", default=LOCATIONS_FILE)
+    imported.add_argument("--out", default=LOCATIONS_SNAPSHOT)
+    commands.add_parser("manifest", help="Show a snapshot's manifest").add_argument(
+        "snapshot", nargs="?", default=LOCATIONS_SNAPSHOT
+    )
+    args = parser.parse_args()
+
+    if args.command == "export":
+        count = export_json(args.snapshot, args.out)
+        print(f"Exported {count} places to {args.out}")
+    elif args.command == "import":
+        manifest = import_json(args.json, args.out)
+        print(f"Published {manifest['count']} places as {args.out} (version {manifest['version']})")
+    else:
+        print(json.dumps(read_manifest(args.snapshot), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
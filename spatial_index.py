@@ -0,0 +1,227 @@
+import heapq
+import math
+from typing import List, Tuple
+import numpy as np
+
+# Shortest WGS84 degree of latitude (at the equator) and longest degree of
+# longitude at the equator, in meters. Using these keeps the query box a
+# superset of the true geodesic circle.
+METERS_PER_DEGREE_LAT = 110574.0
+METERS_PER_DEGREE_LON = 111320.0
+
+# Extra margin on the query box to absorb rounding in the degree conversion
+BOX_MARGIN = 1.01
+
+# Row stride of GridIndex cell keys; columns are offset by half of it
+CELL_KEY_ROW = 2**32
+
+
+def radius_box(
+    latitude: float, longitude: float, radius: float
+) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a box containing the radius circle"""
+    dlat = radius * BOX_MARGIN / METERS_PER_DEGREE_LAT
+    south, north = latitude - dlat, latitude + dlat
+    widest = max(abs(south), abs(north))
+    if widest >= 89.0:
+        return south, -180.0, north, 180.0
+    dlon = radius * BOX_MARGIN / (METERS_PER_DEGREE_LON * math.cos(math.radians(widest)))
+    return south, longitude - dlon, north, longitude + dlon
+
+
+class GridIndex:
+    """Uniform latitude/longitude grid over point coordinates.
+
+    Points are bucketed into square cells of ``cell_size`` meters (measured
+    along a meridian). A radius query only visits the cells overlapping the
+    bounding box of the search circle and returns their point indices as
+    candidates; the caller computes exact distances for those alone.
+
+    Point indices refer to positions in the ``lats``/``lons`` arrays; NaN
+    entries (places without usable coordinates) are left out of the grid.
+    Passing ``ids`` indexes only those positions, which lets several grids
+    partition one shared pair of arrays (e.g. one grid per category).
+
+    Indices are stored in a single array sorted by (row, column) cell key,
+    with a sorted array of the non-empty cell keys and their start offsets
+    alongside. The cells of one box row are therefore one contiguous slice,
+    located with two binary searches.
+    """
+
+    def __init__(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        cell_size: float,
+        ids: np.ndarray = None,
+    ):
+        self.cell_size = cell_size
+        self.cell_degrees = cell_size / METERS_PER_DEGREE_LAT
+        ids = np.arange(len(lats)) if ids is None else np.asarray(ids, dtype=np.intp)
+        ids = ids[~np.isnan(lats[ids])]
+        keys = self._key(
+            np.floor(lats[ids] / self.cell_degrees).astype(np.int64),
+            np.floor(lons[ids] / self.cell_degrees).astype(np.int64),
+        )
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self._ids = ids[order].astype(np.int32)
+        # First position of each cell, plus an end sentinel
+        starts = np.flatnonzero(np.concatenate(([len(keys) > 0], keys[1:] != keys[:-1])))
+        self._keys = keys[starts]
+        self._starts = np.append(starts, len(keys))
+        self.size = len(self._ids)
+
+    @staticmethod
+    def _key(row, col):
+        """Sortable int64 key of a (row, col) cell"""
+        return row * CELL_KEY_ROW + (col + CELL_KEY_ROW // 2)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lon / self.cell_degrees),
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def cell_count(self) -> int:
+        """Number of non-empty cells"""
+        return len(self._keys)
+
+    def query_box(
+        self, south: float, west: float, north: float, east: float
+    ) -> np.ndarray:
+        """Indices of points in cells overlapping the box"""
+        row_min, col_min = self._cell(south, west)
+        row_max, col_max = self._cell(north, east)
+        rows = np.arange(row_min, row_max + 1, dtype=np.int64)
+        first = np.searchsorted(self._keys, self._key(rows, col_min))
+        last = np.searchsorted(self._keys, self._key(rows, col_max), side="right")
+        spans = [
+            self._ids[start:end]
+            for start, end in zip(
+                self._starts[first].tolist(), self._starts[last].tolist()
+            )
+            if start < end
+        ]
+        if not spans:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(spans).astype(np.intp, copy=False)
+
+    def query_radius(
+        self, latitude: float, longitude: float, radius: float
+    ) -> np.ndarray:
+        """Candidate indices for points within radius meters.
+
+        The result is a superset: every point within the radius is included,
+        plus some points in the corners of the visited cells.
+        """
+        return self.query_box(*radius_box(latitude, longitude, radius))
+
+
+def to_unit_vector(lat, lon):
+    """Convert latitude/longitude in degrees to points on the unit sphere.
+
+    Works on scalars (returning an ``(x, y, z)`` tuple) and on arrays
+    (returning an ``(n, 3)`` array).
+    """
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    cos_phi = np.cos(phi)
+    xyz = (cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi))
+    if np.ndim(lat) == 0:
+        return tuple(float(c) for c in xyz)
+    return np.column_stack(xyz)
+
+
+class KDTree:
+    """Static 3-d tree for k-nearest-neighbour queries.
+
+    Points are stored as unit vectors, so straight-line (chord) distance
+    between them is monotonic in great-circle distance and the ordering holds
+    anywhere on the globe, not just near one reference latitude. Queries
+    descend into the nearest branch first and skip any branch whose splitting
+    plane is farther than the current k-th best, so only a handful of leaves
+    are visited for small k.
+
+    Point indices refer to positions in the ``lats``/``lons`` arrays; NaN
+    entries are left out of the tree. As with GridIndex, ``ids`` restricts
+    the tree to a subset of positions. Vectors and indices live in two
+    arrays permuted into tree order, so every leaf is a contiguous slice
+    whose distances are computed in one vectorized call.
+    """
+
+    LEAF_SIZE = 32
+
+    def __init__(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        ids: np.ndarray = None,
+    ):
+        ids = np.arange(len(lats)) if ids is None else np.asarray(ids, dtype=np.intp)
+        ids = ids[~np.isnan(lats[ids])]
+        self._ids = ids.astype(np.int32)
+        self._xyz = to_unit_vector(lats[ids], lons[ids]).reshape(-1, 3)
+        self.size = len(ids)
+        self._root = self._build(0, self.size) if self.size else None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _build(self, lo: int, hi: int):
+        """Build a node: ``(None, lo, hi)`` for leaves, else ``(axis, split, left, right)``"""
+        if hi - lo <= self.LEAF_SIZE:
+            return (None, lo, hi)
+
+        block = self._xyz[lo:hi]
+        axis = int(np.argmax(np.ptp(block, axis=0)))
+        mid = (hi - lo) // 2
+        order = np.argpartition(block[:, axis], mid)
+        self._xyz[lo:hi] = block[order]
+        self._ids[lo:hi] = self._ids[lo:hi][order]
+        return (
+            axis,
+            float(self._xyz[lo + mid, axis]),
+            self._build(lo, lo + mid),
+            self._build(lo + mid, hi),
+        )
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> List[int]:
+        """Indices of the k closest points, nearest first"""
+        if self._root is None or k <= 0:
+            return []
+
+        query = to_unit_vector(latitude, longitude)
+        point = np.array(query)
+        xyz, ids = self._xyz, self._ids
+        best: List[Tuple[float, int]] = []  # max-heap of (-chord², idx)
+
+        def visit(node):
+            if node[0] is None:
+                _, lo, hi = node
+                d2 = ((xyz[lo:hi] - point) ** 2).sum(axis=1)
+                if len(best) >= k:
+                    closer = np.flatnonzero(d2 < -best[0][0])
+                else:
+                    closer = range(hi - lo)
+                for j in closer:
+                    d = float(d2[j])
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, int(ids[lo + j])))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, int(ids[lo + j])))
+                return
+
+            axis, split, left, right = node
+            diff = query[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return [idx for _, idx in sorted(best, key=lambda item: -item[0])]
@@ -0,0 +1,527 @@
+import argparse
+import functools
+import json
+import math
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import numpy as np
+from config import (
+    LOCATIONS_DB,
+    LOCATIONS_SNAPSHOT,
+    RADIUS_SEARCH,
+    SQLITE_ROW_CACHE_SIZE,
+)
+from geo import distances
+from location_store import PlaceList, PlaceView, RankedResults, next_version
+from snapshot import COLUMNS, OSM_TYPES, decode, read_snapshot
+from spatial_index import radius_box
+from utils import setup_logger
+
+logger = setup_logger("sqlite_store")
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE categories (
+    code INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE places (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category INTEGER NOT NULL,
+    lat REAL,
+    lon REAL,
+    osm_type INTEGER NOT NULL,
+    osm_id INTEGER NOT NULL,
+    extra TEXT
+);
+CREATE VIRTUAL TABLE places_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+# Built after the bulk insert, which is faster than maintaining it per row
+INDEXES = "CREATE INDEX places_category ON places (category);"
+
+# First search radius of nearest(), in meters; it grows until k places fit
+NEAREST_START_RADIUS = 1000.0
+# Beyond this radius (half the Earth's circumference) the box covers everything
+NEAREST_MAX_RADIUS = 2.0e7
+
+
+def build_database(
+    columns: Dict[str, Any], path: str = LOCATIONS_DB, **metadata
+) -> int:
+    """Write places in their column-wise form (see ``snapshot.encode``) to SQLite.
+
+    The database is built under a temporary name and renamed over ``path``,
+    so a bot process never opens a half-built file. Returns the number of
+    places written.
+    """
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript(SCHEMA)
+        codes = columns["codes"]
+        counts = np.bincount(codes, minlength=len(columns["categories"]))
+        connection.executemany(
+            "INSERT INTO categories VALUES (?, ?, ?)",
+            [
+                (code, name, int(counts[code]))
+                for code, name in enumerate(columns["categories"])
+            ],
+        )
+
+        def rows() -> Iterator[tuple]:
+            for idx, location in enumerate(decode(columns)):
+                lat = columns["lats"][idx]
+                located = not math.isnan(lat)
+                extra = {
+                    field: value
+                    for field, value in location.items()
+                    if field not in COLUMNS or (field == "coordinates" and not located)
+                }
+                yield (
+                    idx,
+                    location["name"],
+                    int(codes[idx]),
+                    float(lat) if located else None,
+                    float(columns["lons"][idx]) if located else None,
+                    int(columns["osm_types"][idx]),
+                    int(columns["osm_ids"][idx]),
+                    json.dumps(extra, ensure_ascii=False) if extra else None,
+                )
+
+        connection.executemany(
+            "INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows()
+        )
+        connection.execute(
+            "INSERT INTO places_rtree "
+            "SELECT id, lat, lat, lon, lon FROM places WHERE lat IS NOT NULL"
+        )
+        connection.executescript(INDEXES)
+        meta = {
+            "schema": SCHEMA_VERSION,
+            "count": len(columns["names"]),
+            "field_order": columns["field_order"],
+            **metadata,
+        }
+        connection.executemany(
+            "INSERT INTO meta VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in meta.items()],
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(tmp_path, path)
+    logger.info(f"Built {path} with {len(columns['names'])} places")
+    return len(columns["names"])
+
+
+class _Connections:
+    """Read-only connections to one database file, one per thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def get(self) -> sqlite3.Connection:
+        """This thread's connection"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            with self._lock:
+                # Reopening the path would read whatever file replaced it
+                if self.closed:
+                    raise sqlite3.ProgrammingError(f"Store {self.path} is closed")
+                connection = sqlite3.connect(
+                    f"file:{self.path}?mode=ro", uri=True, check_same_thread=False
+                )
+                self._connections.append(connection)
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def _fetch_row(connections: _Connections, idx: int) -> tuple:
+    row = (
+        connections.get()
+        .execute(
+            "SELECT name, category, lat, lon, osm_type, osm_id, extra "
+            "FROM places WHERE id = ?",
+            (idx,),
+        )
+        .fetchone()
+    )
+    if row is None:
+        raise IndexError(idx)
+    extra = json.loads(row[6]) if row[6] else {}
+    for field, value in extra.items():
+        if isinstance(value, list):
+            extra[field] = tuple(value)
+    return row[:6] + (extra,)
+
+
+class SQLiteStore:
+    """Location store backed by a SQLite database, for large regions.
+
+    Offers the same queries as LocationStore, so handlers and the search
+    caches work with either, but keeps nothing but the category table in
+    memory. Radius searches read the candidates in the search circle's
+    bounding box from an R*Tree; nearest searches grow that box until it
+    holds the k closest places; category listings go through an index on
+    category. Places are read through the same PlaceView objects, with the
+    most recently read rows kept decoded.
+
+    The database is opened read-only, with one connection per thread.
+    The connections are closed by ``close()``, or when the store is freed.
+    """
+
+    def __init__(self, path: str = LOCATIONS_DB):
+        self.path = path
+        self._db = _Connections(path)
+        # Closes the connections when the store is freed; nothing in the
+        # connections or the row cache refers back to the store
+        self._closer = weakref.finalize(self, self._db.close)
+        connection = self._connection()
+        meta = {
+            key: json.loads(value)
+            for key, value in connection.execute("SELECT key, value FROM meta")
+        }
+        if meta.get("schema") != SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"Unsupported locations database schema {meta.get('schema')}"
+            )
+        self._count: int = meta["count"]
+        self._field_order: Dict[str, None] = dict.fromkeys(meta["field_order"])
+        self._category_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+        for code, name, count in connection.execute(
+            "SELECT code, name, count FROM categories ORDER BY code"
+        ):
+            self._category_names.append(name)
+            self._category_codes[name.lower()] = code
+            if count:
+                self._counts[name] = count
+        self._row = functools.lru_cache(maxsize=SQLITE_ROW_CACHE_SIZE)(
+            functools.partial(_fetch_row, self._db)
+        )
+        self.source = path
+        self.manifest = {
+            key: value
+            for key, value in meta.items()
+            if key not in ("schema", "field_order")
+        }
+        self.version = next_version()
+        self.loaded_at = datetime.now().isoformat()
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's read-only connection"""
+        return self._db.get()
+
+    def close(self) -> None:
+        """Close every thread's connection; the store can't be read after"""
+        self._closer()
+        self._row.cache_clear()
+
+    def _value(self, idx: int, field: str) -> Any:
+        """Value of one field of place idx; KeyError if it has none"""
+        name, code, lat, lon, osm_type, osm_id, extra = self._row(idx)
+        if field == "name":
+            return name
+        if field == "category":
+            return self._category_names[code]
+        if field == "osm_type" and osm_type:
+            return OSM_TYPES[osm_type]
+        if field == "osm_id" and osm_type:
+            return osm_id
+        if field == "coordinates" and lat is not None:
+            return {"latitude": lat, "longitude": lon}
+        try:
+            return extra[field]
+        except KeyError:
+            raise KeyError(field) from None
+
+    def _position(self, idx: int) -> Tuple[float, float]:
+        """(latitude, longitude) of place idx, NaN if it has none"""
+        lat, lon = self._row(idx)[2:4]
+        return (math.nan, math.nan) if lat is None else (lat, lon)
+
+    def _keys(self, idx: int) -> Iterator[str]:
+        """Field names of place idx, in the order of the source data"""
+        yield from ("name", "coordinates", "category")
+        if self._row(idx)[4]:
+            yield from ("osm_type", "osm_id")
+        extra = self._row(idx)[6]
+        for field in self._field_order:
+            if field != "coordinates" and field in extra:
+                yield field
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def places(self) -> PlaceList:
+        """All places in file order"""
+        return PlaceList(self, range(self._count))
+
+    def categories(self) -> List[str]:
+        """Sorted list of categories present in the data"""
+        return sorted(self._counts)
+
+    def category_counts(self) -> Dict[str, int]:
+        """Number of places in each category"""
+        return dict(self._counts)
+
+    def by_category(self, category: str) -> Union[PlaceList, "CategoryPlaces"]:
+        """Places in a category (case-insensitive), in file order"""
+        code = self._category_codes.get(category.lower())
+        if code is None:
+            return PlaceList(self, range(0))
+        return CategoryPlaces(self, code, self._counts.get(self._category_names[code], 0))
+
+    def _category_ids(self, code: int, start: int, stop: int) -> np.ndarray:
+        """Ids of the places ranked [start, stop) within a category"""
+        rows = self._connection().execute(
+            "SELECT id FROM places WHERE category = ? ORDER BY id LIMIT ? OFFSET ?",
+            (code, max(stop - start, 0), start),
+        )
+        return np.array([row[0] for row in rows], dtype=np.int32)
+
+    def _resolve_categories(
+        self, category: Union[str, Iterable[str], None]
+    ) -> Optional[List[int]]:
+        """Category codes for a query, or None for all categories"""
+        if not category:
+            return None
+        names = [category] if isinstance(category, str) else category
+        return [
+            self._category_codes[name.lower()]
+            for name in names
+            if name.lower() in self._category_codes
+        ]
+
+    def _located(
+        self,
+        box: Optional[Tuple[float, float, float, float]],
+        codes: Optional[List[int]],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, lats, lons) of places in a (south, west, north, east) box.
+
+        Without a box, every place with coordinates. ``codes`` restricts the
+        places to those categories.
+        """
+        if codes is not None and not codes:
+            return np.empty(0, np.intp), np.empty(0), np.empty(0)
+        where, params = [], []
+        if box is None:
+            sql = "SELECT id, lat, lon FROM places p WHERE lat IS NOT NULL"
+        else:
+            south, west, north, east = box
+            sql = (
+                "SELECT p.id, p.lat, p.lon FROM places_rtree r "
+                "JOIN places p ON p.id = r.id WHERE r.max_lat >= ? "
+                "AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?"
+            )
+            params += [south, north, west, east]
+        if codes is not None:
+            where.append(f"p.category IN ({', '.join('?' * len(codes))})")
+            params += codes
+        if where:
+            sql += " AND " + " AND ".join(where)
+        rows = self._connection().execute(sql, params).fetchall()
+        if not rows:
+            return np.empty(0, np.intp), np.empty(0), np.empty(0)
+        ids, lats, lons = zip(*rows)
+        return (
+            np.array(ids, dtype=np.intp),
+            np.array(lats, dtype=np.float64),
+            np.array(lons, dtype=np.float64),
+        )
+
+    def candidates(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> np.ndarray:
+        """Ids of places that may lie within max_distance (a superset)"""
+        box = (
+            None
+            if max_distance is None
+            else radius_box(latitude, longitude, max_distance)
+        )
+        return self._located(box, self._resolve_categories(category))[0]
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        ids: np.ndarray,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+    ) -> RankedResults:
+        """Exact distances for candidate ids, filtered to max_distance"""
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT id, lat, lon FROM places "
+                "WHERE id IN (SELECT value FROM json_each(?)) AND lat IS NOT NULL",
+                (json.dumps(np.asarray(ids).tolist()),),
+            )
+            .fetchall()
+        )
+        if not rows:
+            return RankedResults(self, np.empty(0, np.intp), np.empty(0))
+        found, lats, lons = (np.array(column) for column in zip(*rows))
+        return self._ranked(latitude, longitude, found, lats, lons, max_distance)
+
+    def _ranked(
+        self,
+        latitude: float,
+        longitude: float,
+        ids: np.ndarray,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        max_distance: Optional[float],
+    ) -> RankedResults:
+        dist = distances(latitude, longitude, lats, lons)
+        if max_distance is not None:
+            inside = dist <= max_distance
+            ids, dist = ids[inside], dist[inside]
+        return RankedResults(self, ids, dist)
+
+    def search(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> RankedResults:
+        """Places within max_distance as lazily ordered results"""
+        box = (
+            None
+            if max_distance is None
+            else radius_box(latitude, longitude, max_distance)
+        )
+        ids, lats, lons = self._located(box, self._resolve_categories(category))
+        return self._ranked(latitude, longitude, ids, lats, lons, max_distance)
+
+    def iter_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> Iterator[PlaceView]:
+        """Yield places within max_distance meters, nearest first"""
+        return iter(self.search(latitude, longitude, max_distance, category))
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        max_distance: Optional[float] = RADIUS_SEARCH,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> List[PlaceView]:
+        """Places within max_distance meters, sorted by distance"""
+        return list(self.iter_nearby(latitude, longitude, max_distance, category))
+
+    def result(self, idx: int, distance: float) -> PlaceView:
+        """View of the place at idx with its distance attached"""
+        return PlaceView(self, idx, float(distance))
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        category: Union[str, Iterable[str], None] = None,
+    ) -> List[PlaceView]:
+        """The k places closest to a point, sorted by distance.
+
+        The search box starts at NEAREST_START_RADIUS and grows until the
+        k-th closest place found lies inside the circle the box contains;
+        nothing outside the box can then be closer.
+        """
+        if k <= 0:
+            return []
+        codes = self._resolve_categories(category)
+        radius = NEAREST_START_RADIUS
+        while True:
+            covers_all = radius >= NEAREST_MAX_RADIUS
+            box = None if covers_all else radius_box(latitude, longitude, radius)
+            ids, lats, lons = self._located(box, codes)
+            if len(ids) >= k or covers_all:
+                dist = distances(latitude, longitude, lats, lons)
+                order = np.lexsort((ids, dist))[:k]
+                if covers_all or dist[order[-1]] <= radius:
+                    return [self.result(ids[i], dist[i]) for i in order]
+                radius = max(float(dist[order[-1]]), radius * 2)
+            else:
+                radius *= 4
+
+
+class CategoryPlaces(Sequence):
+    """Lazy sequence of a category's places in a SQLiteStore.
+
+    Only the ids of the slice being read are fetched (through the category
+    index), so paging through a large category never loads all of it.
+    """
+
+    __slots__ = ("store", "code", "_len")
+
+    def __init__(self, store: SQLiteStore, code: int, length: int):
+        self.store = store
+        self.code = code
+        self._len = length
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            ids = self.store._category_ids(self.code, start, stop)
+            return PlaceList(self.store, ids[::step] if step != 1 else ids)
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        return PlaceView(self.store, self.store._category_ids(self.code, index, index + 1)[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the SQLite locations database")
+    parser.add_argument("snapshot", nargs="?", default=LOCATIONS_SNAPSHOT)
+    parser.add_argument("--out", default=LOCATIONS_DB)
+    args = parser.parse_args()
+
+    columns, manifest = read_snapshot(args.snapshot)
+    count = build_database(columns, args.out, **manifest)
+    print(f"Wrote {count} places to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
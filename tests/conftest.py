@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The OSM fetching modules import each other from the utils directory,
+# as the scripts in scripts/ set it up.
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils")
+)
@@ -0,0 +1,84 @@
+import pytest
+
+from callback_data import (
+    CATEGORY_PAGE,
+    FINDME_PAGE,
+    GUIDE,
+    GUIDE_PAGE,
+    HUB_PAGE,
+    MAIN_MENU,
+    MAX_CALLBACK_DATA,
+    NEAREST_HUBS,
+    decode,
+    encode,
+    matches,
+)
+from router import CallbackRouter
+
+
+def test_encode_decode_round_trip():
+    data = encode(CATEGORY_PAGE, "hotels", 3)
+    assert data == "2:cp:hotels:3"
+    assert decode(data) == (CATEGORY_PAGE, ("hotels", "3"))
+    assert decode(encode(MAIN_MENU)) == (MAIN_MENU, ())
+
+
+def test_encode_rejects_separators_in_arguments():
+    with pytest.raises(ValueError):
+        encode(FINDME_PAGE, "a:b", 1)
+
+
+def test_encode_enforces_telegrams_limit():
+    longest = "x" * (MAX_CALLBACK_DATA - len(encode(GUIDE_PAGE, "")))
+    assert len(encode(GUIDE_PAGE, longest)) == MAX_CALLBACK_DATA
+    with pytest.raises(ValueError):
+        encode(GUIDE_PAGE, longest + "x")
+    # The limit is in bytes, not characters
+    with pytest.raises(ValueError):
+        encode(GUIDE_PAGE, "é" * (len(longest) // 2 + 1))
+
+
+@pytest.mark.parametrize(
+    "data, decoded",
+    [
+        ("menu_back", (MAIN_MENU, ())),
+        ("nav_guide", (GUIDE, ())),
+        ("show_guide", (GUIDE, ())),
+        ("find_nearest", (NEAREST_HUBS, ())),
+        ("cat_hotels_3", (CATEGORY_PAGE, ("hotels", "3"))),
+        ("page_all_2", (FINDME_PAGE, ("all", "2"))),
+        ("hub_category_bus_terminal_0", (HUB_PAGE, ("bus_terminal", "0"))),
+        ("guide_attractions_2", (GUIDE_PAGE, ("attractions_2",))),
+    ],
+)
+def test_legacy_callback_data_is_decoded(data, decoded):
+    assert decode(data) == decoded
+
+
+@pytest.mark.parametrize("data", [None, "", "bogus", "cat_", "1:cp:hotels:3"])
+def test_undecodable_data(data):
+    assert decode(data) is None
+
+
+def test_matches_is_a_pattern_for_one_view():
+    pattern = matches(NEAREST_HUBS)
+    assert pattern(encode(NEAREST_HUBS))
+    assert pattern("find_nearest")
+    assert not pattern(encode(MAIN_MENU))
+    assert not pattern(None)
+
+
+def test_router_resolves_and_converts_arguments():
+    async def show(update, context, category, page):
+        pass
+
+    router = CallbackRouter()
+    router.add(CATEGORY_PAGE, show, str, int)
+
+    view, route, args = router.resolve("cat_hotels_3")
+    assert (view, route.callback, args) == (CATEGORY_PAGE, show, ("hotels", 3))
+    assert router.resolve(encode(CATEGORY_PAGE, "hotels", "x")) is None
+    assert router.resolve(encode(CATEGORY_PAGE, "hotels")) is None
+    assert router.resolve(encode(MAIN_MENU)) is None
+    with pytest.raises(ValueError):
+        router.add(CATEGORY_PAGE, show)
@@ -0,0 +1,111 @@
+import osm_fetcher
+from osm_fetcher import OSMDataFetcher
+
+
+def element(kind, osm_id, tags, lat=9.01, lon=38.76):
+    found = {"type": kind, "id": osm_id, "tags": tags}
+    if kind == "node":
+        found.update(lat=lat, lon=lon)
+    else:
+        found["center"] = {"lat": lat, "lon": lon}
+    return found
+
+
+def locations_of(*elements):
+    return OSMDataFetcher.collect_locations(elements)
+
+
+def test_apply_changes_creates_modifies_and_deletes():
+    locations = locations_of(
+        element("node", 1, {"name": "Hilton", "tourism": "hotel"}),
+        element("node", 2, {"name": "CBE", "amenity": "bank"}),
+        element("way", 3, {"name": "Edna Mall", "shop": "mall"}),
+    )
+    changes = [
+        ("create", element("node", 4, {"name": "Tomoca", "amenity": "cafe"})),
+        ("modify", element("node", 1, {"name": "Hilton Addis", "tourism": "hotel"})),
+        ("delete", {"type": "way", "id": 3}),
+    ]
+
+    updated, counts = OSMDataFetcher.apply_changes(locations, changes)
+
+    assert counts == {"create": 1, "modify": 1, "delete": 1}
+    assert sorted(location["name"] for location in updated) == [
+        "CBE",
+        "Hilton Addis",
+        "Tomoca",
+    ]
+
+
+def test_apply_changes_moves_a_place_to_its_new_category():
+    locations = locations_of(element("node", 1, {"name": "Yod", "amenity": "restaurant"}))
+    changes = [("modify", element("node", 1, {"name": "Yod", "amenity": "cafe"}))]
+
+    updated, _ = OSMDataFetcher.apply_changes(locations, changes)
+
+    assert [location["category"] for location in updated] == ["Cafes"]
+
+
+def test_apply_changes_matches_on_type_and_id():
+    locations = locations_of(
+        element("node", 7, {"name": "Node seven", "amenity": "bank"}),
+        element("way", 7, {"name": "Way seven", "amenity": "bank"}),
+    )
+
+    updated, _ = OSMDataFetcher.apply_changes(locations, [("delete", {"type": "way", "id": 7})])
+
+    assert [location["name"] for location in updated] == ["Node seven"]
+
+
+def test_apply_changes_drops_places_that_lose_their_tags():
+    locations = locations_of(element("node", 1, {"name": "Old bank", "amenity": "bank"}))
+    changes = [("modify", element("node", 1, {"name": "Old bank", "amenity": "bar"}))]
+
+    updated, counts = OSMDataFetcher.apply_changes(locations, changes)
+
+    assert updated == []
+    assert counts["modify"] == 1
+
+
+def test_apply_changes_keeps_category_order():
+    locations = locations_of(element("node", 1, {"name": "CBE", "amenity": "bank"}))
+    changes = [("create", element("node", 2, {"name": "Hilton", "tourism": "hotel"}))]
+
+    updated, _ = OSMDataFetcher.apply_changes(locations, changes)
+
+    assert [location["category"] for location in updated] == ["Hotels", "Banks"]
+
+
+def with_counts(**counts):
+    return [
+        {"name": f"{category} {i}", "category": category}
+        for category, count in counts.items()
+        for i in range(count)
+    ]
+
+
+def test_count_drops_allows_small_losses(monkeypatch):
+    monkeypatch.setattr(osm_fetcher, "PUBLISH_MAX_DROP", 0.2)
+    monkeypatch.setattr(osm_fetcher, "PUBLISH_DROP_SLACK", 5)
+    locations = with_counts(Hotels=80, Banks=5, Cafes=12)
+
+    drops = OSMDataFetcher.count_drops(locations, {"Hotels": 100, "Banks": 10, "Cafes": 10})
+
+    assert drops == {}
+
+
+def test_count_drops_reports_big_losses(monkeypatch):
+    monkeypatch.setattr(osm_fetcher, "PUBLISH_MAX_DROP", 0.2)
+    monkeypatch.setattr(osm_fetcher, "PUBLISH_DROP_SLACK", 5)
+    locations = with_counts(Hotels=79, Banks=4)
+
+    drops = OSMDataFetcher.count_drops(
+        locations, {"Hotels": 100, "Banks": 10, "Sports": 6}
+    )
+
+    assert drops == {"Hotels": (100, 79), "Banks": (10, 4), "Sports": (6, 0)}
+
+
+def test_count_drops_without_a_previous_snapshot():
+    assert OSMDataFetcher.count_drops(with_counts(Hotels=3), None) == {}
+    assert OSMDataFetcher.count_drops([], {}) == {}
@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+from osm_tiles import Tile, TileFetchError, fetch_tiles, split_region
+from overpass_client import OverpassError, OverpassTimeout
+
+REGION = Tile(8.8, 38.6, 9.2, 39.0)
+
+
+def run(coroutine, timeout=5):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout))
+
+
+def test_split_region_covers_the_box_with_equal_tiles():
+    tiles = split_region(tuple(REGION), 0.15)
+
+    assert len(tiles) == 9
+    assert all(tile.size == pytest.approx(0.4 / 3) for tile in tiles)
+    assert min(tile.south for tile in tiles) == REGION.south
+    assert max(tile.east for tile in tiles) == REGION.east
+
+
+def test_quarters_tile_the_parent():
+    quarters = REGION.quarters()
+
+    assert sum(
+        (q.north - q.south) * (q.east - q.west) for q in quarters
+    ) == pytest.approx(0.16)
+    assert all(q.size == pytest.approx(0.2) for q in quarters)
+
+
+def test_timed_out_tiles_are_split_until_they_fit():
+    split = []
+
+    async def fetch(tile):
+        if tile.size > 0.15:
+            raise OverpassTimeout("runtime error: timed out")
+        return tile.bbox
+
+    results = run(
+        fetch_tiles([REGION], fetch, workers=3, min_size=0.05, retries=0, on_split=split.append)
+    )
+
+    assert len(results) == 16
+    assert all(tile.size == pytest.approx(0.1) for tile, _ in results)
+    assert len(split) == 5
+
+
+def test_tiles_at_the_minimum_size_are_retried_instead():
+    calls = []
+
+    async def fetch(tile):
+        calls.append(tile)
+        raise OverpassTimeout("runtime error: timed out")
+
+    with pytest.raises(TileFetchError) as error:
+        run(fetch_tiles([REGION], fetch, workers=2, min_size=0.3, retries=2, backoff=0.01))
+
+    assert calls == [REGION] * 3
+    assert error.value.failed[0][0] == REGION
+
+
+def test_failures_are_retried_with_backoff():
+    attempts = {}
+
+    async def fetch(tile):
+        attempts[tile] = attempts.get(tile, 0) + 1
+        if attempts[tile] < 3:
+            raise httpx.ConnectError("connection reset")
+        return "ok"
+
+    tiles = split_region(tuple(REGION), 0.2)
+    results = run(fetch_tiles(tiles, fetch, workers=2, min_size=0.05, retries=2, backoff=0.01))
+
+    assert sorted(results) == sorted((tile, "ok") for tile in tiles)
+    assert set(attempts.values()) == {3}
+
+
+def test_waiting_retries_do_not_hold_a_worker():
+    fetched_at = []
+
+    async def fetch(tile):
+        fetched_at.append((tile, asyncio.get_running_loop().time()))
+        if tile == tiles[0] and len(fetched_at) == 1:
+            raise OverpassError("incomplete response")
+        return "ok"
+
+    tiles = split_region(tuple(REGION), 0.1)
+    results = run(fetch_tiles(tiles, fetch, workers=1, min_size=0.01, retries=1, backoff=0.5))
+
+    assert len(results) == len(tiles)
+    assert [tile for tile, _ in fetched_at] == [*tiles, tiles[0]]
+    # The only worker went on with the other tiles during the backoff
+    started = fetched_at[0][1]
+    assert fetched_at[-2][1] - started < 0.25
+    assert fetched_at[-1][1] - started >= 0.5
+
+
+def test_unexpected_errors_fail_the_tile_without_retrying():
+    async def fetch(tile):
+        if tile == tiles[1]:
+            raise KeyError("bad element")
+        return "ok"
+
+    tiles = split_region(tuple(REGION), 0.2)
+    with pytest.raises(TileFetchError) as error:
+        run(fetch_tiles(tiles, fetch, workers=2, min_size=0.05, retries=3))
+
+    assert [tile for tile, _ in error.value.failed] == [tiles[1]]
+
+
+def test_failing_split_callback_fails_the_tile_and_finishes():
+    fetched = []
+
+    async def fetch(tile):
+        if tile == REGION:
+            raise OverpassTimeout("runtime error: timed out")
+        fetched.append(tile)
+        return "ok"
+
+    def on_split(tile):
+        raise OSError("disk full")
+
+    with pytest.raises(TileFetchError) as error:
+        run(fetch_tiles([REGION], fetch, workers=1, min_size=0.05, retries=0, on_split=on_split))
+
+    assert [tile for tile, _ in error.value.failed] == [REGION]
+    assert isinstance(error.value.failed[0][1], OSError)
+    assert sorted(fetched) == sorted(REGION.quarters())
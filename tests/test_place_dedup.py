@@ -0,0 +1,122 @@
+import math
+
+from place_dedup import (
+    AREA_DEDUP_DISTANCE,
+    METERS_PER_DEGREE,
+    deduplicate,
+    duplicate_groups,
+    merge_places,
+    similar_names,
+    name_words,
+)
+
+
+def place(name, lat, lon, category="Banks", osm_type="node", osm_id=1, **fields):
+    return {
+        "name": name,
+        "coordinates": {"latitude": lat, "longitude": lon},
+        "category": category,
+        "osm_type": osm_type,
+        "osm_id": osm_id,
+        **fields,
+    }
+
+
+def names(name):
+    return (name.casefold(), name_words(name))
+
+
+def test_similar_names():
+    assert similar_names(names("Bilos Pastry"), names("Bilo's Pastry"))
+    assert similar_names(names("Abune Petros"), names("Abune Petros Monument"))
+    assert not similar_names(
+        names("Awash Bank (Saris Branch)"), names("Bunna Bank (Saris Branch)")
+    )
+    assert not similar_names(names("Wereda 10"), names("Wereda 11"))
+
+
+def test_bank_and_its_atm_are_merged():
+    locations = [
+        place("Dashen Bank", 9.0101, 38.7612, osm_id=1, opening_hours="Mo-Fr 08:00-17:00"),
+        place("Dashen Bank ATM", 9.01012, 38.76121, osm_id=2, contact={"phone": "+251 11"}),
+        place("Dashen Bank", 9.0301, 38.7612, osm_id=3),
+    ]
+
+    result, absorbed = deduplicate(locations)
+
+    assert absorbed == 1
+    assert len(result) == 2
+    merged = result[0]
+    assert merged["opening_hours"] == "Mo-Fr 08:00-17:00"
+    assert merged["contact"] == {"phone": "+251 11"}
+    assert result[1]["osm_id"] == 3
+
+
+def test_other_categories_and_names_are_kept():
+    locations = [
+        place("Kaldis", 9.01, 38.76, category="Cafes", osm_id=1),
+        place("Kaldis", 9.01, 38.76, category="Restaurants", osm_id=2),
+        place("Tomoca", 9.01, 38.76, category="Cafes", osm_id=3),
+    ]
+
+    assert deduplicate(locations) == (locations, 0)
+
+
+def test_area_matches_a_node_further_away():
+    node = place("St George Cathedral", 9.0370, 38.7520, category="Cultural", osm_id=5)
+    area = place(
+        "St. George's Cathedral", 9.0370, 38.7535, category="Cultural",
+        osm_type="way", osm_id=9,
+    )
+    other_node = dict(node, osm_id=6)
+    other_node["coordinates"] = {"latitude": 9.0370, "longitude": 38.7535}
+
+    assert duplicate_groups([node, area]) == [[0, 1]]
+    assert duplicate_groups([node, other_node]) == []
+
+
+def test_east_west_pairs_across_cell_columns_are_compared():
+    # Just under AREA_DEDUP_DISTANCE apart along a parallel, starting at the
+    # east edge of a 200 m-in-latitude cell column
+    lat = 9.0
+    column = AREA_DEDUP_DISTANCE / METERS_PER_DEGREE
+    west = (math.floor(38.76 / column) + 1) * column - 1e-7
+    east = west + (AREA_DEDUP_DISTANCE - 1) / (
+        METERS_PER_DEGREE * math.cos(math.radians(lat))
+    )
+    node = place("Edna Mall", lat, west, category="Shopping", osm_id=1)
+    area = place("Edna Mall", lat, east, category="Shopping", osm_type="way", osm_id=2)
+
+    assert duplicate_groups([node, area]) == [[0, 1]]
+
+
+def test_chains_of_duplicates_form_one_group():
+    locations = [
+        place("Abyssinia Bank", 9.0, 38.7600 + i * 0.0003, osm_id=i) for i in range(4)
+    ]
+
+    assert duplicate_groups(locations) == [[0, 1, 2, 3]]
+
+
+def test_merge_prefers_the_richest_entry_and_records_the_others():
+    poor = place("CBE", 9.0, 38.7, osm_id=10, osm_tags=["amenity=atm"])
+    rich = place(
+        "Commercial Bank of Ethiopia", 9.0, 38.7, osm_type="way", osm_id=20,
+        osm_tags=["amenity=bank"], description="Head office", opening_hours="Mo-Fr",
+    )
+
+    merged = merge_places([poor, rich])
+
+    assert merged["name"] == "Commercial Bank of Ethiopia"
+    assert merged["osm_type"] == "way"
+    assert merged["osm_tags"] == ["amenity=bank", "amenity=atm"]
+    assert merged["merged"] == ["node/10"]
+
+
+def test_merge_does_not_modify_its_input():
+    first = place("CBE", 9.0, 38.7, osm_id=1, contact={"phone": ""})
+    second = place("CBE", 9.0, 38.7, osm_id=2, contact={"phone": "+251"})
+
+    merge_places([first, second])
+
+    assert first["contact"] == {"phone": ""}
@@ -0,0 +1,79 @@
+import numpy as np
+
+from location_store import LocationStore, RankedResults
+
+
+def make_store(count):
+    return LocationStore(
+        {
+            "name": f"Place {i}",
+            "category": "Banks",
+            "coordinates": {"latitude": 9.0 + i * 1e-4, "longitude": 38.75},
+        }
+        for i in range(count)
+    )
+
+
+def shuffled_results(count, seed=0):
+    store = make_store(count)
+    rng = np.random.default_rng(seed)
+    ids = rng.permutation(count)
+    dist = rng.permutation(np.arange(count, dtype=float) * 10.0)
+    return RankedResults(store, ids, dist), ids, dist
+
+
+def expected_order(ids, dist):
+    order = np.argsort(dist, kind="stable")
+    return list(ids[order]), list(dist[order])
+
+
+def test_first_page_orders_only_a_prefix():
+    results, ids, dist = shuffled_results(1000)
+    page_ids, page_dist = results.ordered(0, 10)
+    want_ids, want_dist = expected_order(ids, dist)
+    assert list(page_ids) == want_ids[:10]
+    assert list(page_dist) == want_dist[:10]
+    assert results._sorted < len(results)
+
+
+def test_later_pages_continue_the_order():
+    results, ids, dist = shuffled_results(500, seed=3)
+    want_ids, _ = expected_order(ids, dist)
+    read = []
+    for start in range(0, 500, 7):
+        page_ids, _ = results.ordered(start, start + 7)
+        read.extend(page_ids)
+    assert read == want_ids
+
+
+def test_pages_read_out_of_order_agree():
+    results, ids, dist = shuffled_results(300, seed=5)
+    want_ids, _ = expected_order(ids, dist)
+    assert list(results.ordered(200, 210)[0]) == want_ids[200:210]
+    assert list(results.ordered(0, 10)[0]) == want_ids[:10]
+    assert list(results.ordered(290, 400)[0]) == want_ids[290:]
+
+
+def test_iteration_yields_views_nearest_first():
+    results, ids, dist = shuffled_results(100, seed=7)
+    places = list(results)
+    assert len(places) == 100
+    assert [place["distance"] for place in places] == sorted(dist)
+    assert places[0]["name"] == f"Place {expected_order(ids, dist)[0][0]}"
+
+
+def test_slice_of_empty_results():
+    store = make_store(3)
+    results = RankedResults(store, np.array([], dtype=np.intp), np.array([]))
+    assert len(results) == 0
+    assert results.slice(0, 5) == []
+    assert list(results) == []
+
+
+def test_store_search_is_sorted_and_within_radius():
+    store = make_store(200)
+    results = store.search(9.01, 38.75, 500)
+    distances = [place["distance"] for place in results]
+    assert distances == sorted(distances)
+    assert distances and max(distances) <= 500
+    assert len(results) == len(store.nearby(9.01, 38.75, 500))
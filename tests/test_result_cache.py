@@ -0,0 +1,65 @@
+import random
+
+from location_store import LocationStore
+from search_cache import ResultCache
+
+CENTER = (9.0108, 38.7613)
+
+
+def make_store(count=400, seed=1):
+    rng = random.Random(seed)
+    return LocationStore(
+        {
+            "name": f"Place {i}",
+            "category": "Hotels" if i % 2 else "Banks",
+            "coordinates": {
+                "latitude": CENTER[0] + rng.uniform(-0.03, 0.03),
+                "longitude": CENTER[1] + rng.uniform(-0.03, 0.03),
+            },
+        }
+        for i in range(count)
+    )
+
+
+def names(results):
+    return [place["name"] for place in results]
+
+
+def test_cached_search_matches_store_search():
+    store = make_store()
+    cache = ResultCache(maxsize=16, cell_size=100)
+    for lat, lon in [CENTER, (9.0112, 38.7609), (9.0005, 38.7702)]:
+        for category in (None, "hotels"):
+            expected = store.search(lat, lon, 1500, category)
+            assert names(cache.search(store, lat, lon, 1500, category)) == names(expected)
+
+
+def test_nearby_users_share_an_entry():
+    store = make_store()
+    cache = ResultCache(maxsize=16, cell_size=100)
+    cache.search(store, 9.01081, 38.76131, 1500)
+    cache.search(store, 9.01082, 38.76132, 1500)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_new_store_version_is_not_served_old_entries():
+    old = make_store(seed=1)
+    new = make_store(seed=2)
+    assert new.version != old.version
+    cache = ResultCache(maxsize=16, cell_size=100)
+    cache.search(old, *CENTER, 1500)
+    results = cache.search(new, *CENTER, 1500)
+    assert cache.stats()["misses"] == 2
+    assert results.store is new
+    assert names(results) == names(new.search(*CENTER, 1500))
+
+
+def test_invalidate_drops_every_entry():
+    store = make_store()
+    cache = ResultCache(maxsize=16, cell_size=100)
+    cache.search(store, *CENTER, 1500)
+    cache.invalidate(store)
+    assert cache.stats()["size"] == 0
+    cache.search(store, *CENTER, 1500)
+    assert cache.stats()["misses"] == 2
@@ -0,0 +1,91 @@
+from search_cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_replacing_a_key_does_not_grow():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("a", 2)
+    assert len(cache) == 1
+    assert cache.get("a") == 2
+
+
+def test_lru_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_put_restarts_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.put("a", 1)
+    clock.now = 4
+    cache.put("a", 2)
+    clock.now = 8
+    assert cache.get("a") == 2
+
+
+def test_lru_evicts_oldest_entries_over_the_weight_limit():
+    cache = LRUCache(maxsize=100, maxweight=10, weigh=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == ("xxxx", "xxxx")
+    assert cache.weight == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_replacing_an_entry_updates_its_weight():
+    cache = LRUCache(maxsize=100, maxweight=10, weigh=len)
+    cache.put("a", "xxxxxxxx")
+    cache.put("a", "xx")
+    cache.put("b", "xxxxxxxx")
+    assert cache.weight == 10
+    assert cache.get("a") == "xx"
+
+
+def test_lru_entry_heavier_than_the_limit_is_not_kept():
+    cache = LRUCache(maxsize=100, maxweight=10, weigh=len)
+    cache.put("small", "x")
+    cache.put("huge", "x" * 11)
+    assert len(cache) == 0
+    assert cache.weight == 0
+
+
+def test_lru_expired_entries_release_their_weight():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=1, clock=clock, maxweight=100, weigh=len)
+    cache.put("a", "xxx")
+    clock.now = 2
+    assert cache.get("a") is None
+    assert cache.weight == 0
+    cache.put("b", "xx")
+    cache.clear()
+    assert cache.weight == 0
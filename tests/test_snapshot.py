@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from location_store import LocationStore
+from snapshot import (
+    SnapshotError,
+    decode,
+    encode,
+    manifest_path,
+    read_manifest,
+    read_snapshot,
+    write_snapshot,
+)
+
+LOCATIONS = [
+    {
+        "name": "Hilton Addis",
+        "coordinates": {"latitude": 9.0182, "longitude": 38.7636},
+        "category": "Hotels",
+        "osm_type": "node",
+        "osm_id": 123456789012,
+        "osm_tags": ["tourism=hotel"],
+        "description": "Five-star hotel",
+        "opening_hours": "24/7",
+        "contact": {"phone": "+251 11 551 8400", "email": ""},
+    },
+    {
+        "name": "Tomoca",
+        "coordinates": {"latitude": 9.0301, "longitude": 38.7525},
+        "category": "Cafes",
+        "osm_type": "way",
+        "osm_id": 42,
+        "description": "",
+        "contact": {"phone": "", "email": "info@tomoca.example"},
+    },
+    {
+        "name": "Imported without OSM id",
+        "coordinates": {"latitude": 9.0, "longitude": 38.7},
+        "category": "Hotels",
+    },
+]
+
+
+def test_round_trip_keeps_every_non_empty_field(tmp_path):
+    path = str(tmp_path / "locations.bin")
+    write_snapshot(encode(LOCATIONS), path)
+    columns, manifest = read_snapshot(path)
+
+    assert decode(columns) == [
+        {
+            "name": "Hilton Addis",
+            "coordinates": {"latitude": 9.0182, "longitude": 38.7636},
+            "category": "Hotels",
+            "osm_type": "node",
+            "osm_id": 123456789012,
+            "osm_tags": ["tourism=hotel"],
+            "description": "Five-star hotel",
+            "opening_hours": "24/7",
+            "contact": {"phone": "+251 11 551 8400"},
+        },
+        {
+            "name": "Tomoca",
+            "coordinates": {"latitude": 9.0301, "longitude": 38.7525},
+            "category": "Cafes",
+            "osm_type": "way",
+            "osm_id": 42,
+            "contact": {"email": "info@tomoca.example"},
+        },
+        {
+            "name": "Imported without OSM id",
+            "coordinates": {"latitude": 9.0, "longitude": 38.7},
+            "category": "Hotels",
+        },
+    ]
+    assert manifest["count"] == 3
+    assert manifest["categories"] == {"Hotels": 2, "Cafes": 1}
+
+
+def test_store_from_snapshot_columns(tmp_path):
+    path = str(tmp_path / "locations.bin")
+    write_snapshot(encode(LOCATIONS), path)
+    columns, manifest = read_snapshot(path)
+    store = LocationStore(columns=columns, manifest=manifest)
+
+    assert len(store) == 3
+    hilton = store.nearest(9.0182, 38.7636, 1)[0]
+    assert hilton["name"] == "Hilton Addis"
+    assert hilton["contact"] == {"phone": "+251 11 551 8400"}
+
+
+def test_manifest_is_published_and_versions_increase(tmp_path):
+    path = str(tmp_path / "locations.bin")
+    first = write_snapshot(encode(LOCATIONS), path, osm_base="2026-01-01T00:00:00Z")
+    second = write_snapshot(encode(LOCATIONS[:1]), path)
+
+    assert (first["version"], second["version"]) == (1, 2)
+    assert first["osm_base"] == "2026-01-01T00:00:00Z"
+    with open(manifest_path(path), encoding="utf-8") as f:
+        assert json.load(f) == second
+    assert read_manifest(path) == second
+
+
+def test_corrupt_body_fails_the_checksum(tmp_path):
+    path = tmp_path / "locations.bin"
+    write_snapshot(encode(LOCATIONS), str(path))
+    data = bytearray(path.read_bytes())
+    data[-3] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError, match="Checksum"):
+        read_snapshot(str(path))
+
+
+def test_other_files_are_not_snapshots(tmp_path):
+    path = tmp_path / "locations.bin"
+    path.write_text(json.dumps({"locations": LOCATIONS}))
+
+    with pytest.raises(SnapshotError):
+        read_snapshot(str(path))
+    assert read_manifest(str(path)) is None
@@ -0,0 +1,72 @@
+import gc
+import sqlite3
+import time
+
+import pytest
+
+import location_store
+from snapshot import encode
+from sqlite_store import SQLiteStore, build_database
+
+LOCATIONS = [
+    {
+        "name": f"Place {i}",
+        "coordinates": {"latitude": 9.0 + i * 1e-3, "longitude": 38.75},
+        "category": "Banks" if i % 2 else "Hotels",
+        "description": f"Description {i}",
+    }
+    for i in range(20)
+]
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "locations.sqlite")
+    build_database(encode(LOCATIONS), path)
+    return path
+
+
+def test_queries_match_the_source(database):
+    store = SQLiteStore(database)
+    nearest = store.nearest(9.0, 38.75, 3)
+    assert [place["name"] for place in nearest] == ["Place 0", "Place 1", "Place 2"]
+    assert store.by_category("hotels")[1]["description"] == "Description 2"
+    assert store.category_counts() == {"Hotels": 10, "Banks": 10}
+    store.close()
+
+
+def test_closed_store_cannot_be_read(database):
+    store = SQLiteStore(database)
+    store.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.search(9.0, 38.75, 500)
+
+
+def test_connections_close_when_the_store_is_freed(database):
+    store = SQLiteStore(database)
+    store.places[3]["name"]
+    connections = store._db
+    gc.disable()
+    try:
+        del store
+        assert connections.closed
+    finally:
+        gc.enable()
+
+
+def test_replaced_store_is_closed_after_the_delay(database, monkeypatch):
+    monkeypatch.setattr(location_store, "STORE_CLOSE_DELAY", 0.05)
+    monkeypatch.setattr(location_store, "_store", None)
+    monkeypatch.setattr(location_store, "_reload_listeners", [])
+    old = SQLiteStore(database)
+    location_store.set_store(old)
+    location_store.set_store(SQLiteStore(database))
+    assert not old._db.closed
+    results = old.search(9.0, 38.75, 500)
+    assert len(results) > 0
+
+    for _ in range(100):
+        if old._db.closed:
+            break
+        time.sleep(0.01)
+    assert old._db.closed
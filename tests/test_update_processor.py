@@ -0,0 +1,87 @@
+import asyncio
+import datetime
+
+from telegram import Chat, Message, Update, User
+
+from update_processor import PerUserUpdateProcessor
+
+
+def update_from(user_id, update_id):
+    user = User(user_id, f"User {user_id}", False)
+    message = Message(
+        update_id, datetime.datetime.now(), Chat(user_id, "private"), from_user=user, text="hi"
+    )
+    return Update(update_id, message=message)
+
+
+async def handle(log, name, seconds, running=None):
+    if running is not None:
+        running.append(1)
+        log.append(("peak", len(running)))
+    await asyncio.sleep(seconds)
+    log.append(name)
+    if running is not None:
+        running.pop()
+
+
+def test_one_users_updates_run_in_order():
+    async def main():
+        processor = PerUserUpdateProcessor(8)
+        log = []
+        await asyncio.gather(
+            processor.process_update(update_from(1, 1), handle(log, "first", 0.03)),
+            processor.process_update(update_from(1, 2), handle(log, "second", 0.01)),
+            processor.process_update(update_from(1, 3), handle(log, "third", 0)),
+        )
+        return log
+
+    assert asyncio.run(main()) == ["first", "second", "third"]
+
+
+def test_concurrency_is_limited():
+    async def main():
+        processor = PerUserUpdateProcessor(2)
+        log, running = [], []
+        await asyncio.gather(
+            *(
+                processor.process_update(update_from(user, user), handle(log, user, 0.01, running))
+                for user in range(6)
+            )
+        )
+        return max(peak for entry, peak in (e for e in log if isinstance(e, tuple)))
+
+    assert asyncio.run(main()) == 2
+
+
+def test_busy_user_does_not_hold_every_slot():
+    async def main():
+        processor = PerUserUpdateProcessor(2)
+        log = []
+        flood = [
+            asyncio.create_task(
+                processor.process_update(update_from(1, i), handle(log, f"flood {i}", 0.05))
+            )
+            for i in range(10)
+        ]
+        await asyncio.sleep(0)
+        started = asyncio.get_running_loop().time()
+        await processor.process_update(update_from(2, 100), handle(log, "other", 0))
+        waited = asyncio.get_running_loop().time() - started
+        await asyncio.gather(*flood)
+        return waited, log
+
+    waited, log = asyncio.run(main())
+    # The other user got the second slot straight away
+    assert waited < 0.04
+    assert log.index("other") < log.index("flood 1")
+    assert [entry for entry in log if entry != "other"] == [f"flood {i}" for i in range(10)]
+
+
+def test_updates_without_a_user_are_processed():
+    async def main():
+        processor = PerUserUpdateProcessor(1)
+        log = []
+        await processor.process_update(object(), handle(log, "poll", 0))
+        return log, processor.max_concurrent_updates
+
+    assert asyncio.run(main()) == (["poll"], 1)
@@ -1,6 +1,11 @@
+import os
 import schedule
+import sys
 import time
-from utils.osm_fetcher import update_locations_data
+
+# utils.py shadows the utils/ directory, so import the fetcher module directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils"))
+from osm_fetcher import update_locations_data
 import logging
 
 logging.basicConfig(
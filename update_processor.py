@@ -0,0 +1,71 @@
+import asyncio
+import sys
+from typing import Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Handles updates of different users concurrently, each user's in order.
+
+    By default python-telegram-bot handles one update at a time, so every
+    user waits for the Bot API calls made for everyone before them. This
+    runs up to ``max_concurrent_updates`` at once, but an update waits for
+    the previous one from the same user, so conversation states (FindMe)
+    and pagination still see a user's taps in the order they came in.
+
+    An update only takes one of the shared slots once it holds its user's
+    lock, so a user sending many updates at once occupies one slot while
+    the rest wait their turn, and can't crowd everyone else out.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        if max_concurrent_updates < 1:
+            raise ValueError("`max_concurrent_updates` must be a positive integer!")
+        # The base class takes a slot of its semaphore (sized by the
+        # max_concurrent_updates property) *before* calling do_process_update,
+        # that is before the user's lock: it is built unlimited and the real
+        # limit applied in do_process_update instead
+        self._limit = sys.maxsize
+        super().__init__(sys.maxsize)
+        self._limit = max_concurrent_updates
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # User id -> [lock, number of that user's updates holding or awaiting it]
+        self._users: Dict[int, List[Any]] = {}
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._limit
+
+    @staticmethod
+    def _user_id(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user_id = self._user_id(update)
+        if user_id is None:
+            async with self._slots:
+                await coroutine
+            return
+        entry = self._users.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._users[user_id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -1,7 +1,6 @@
-import json
 import logging
 import os
-from geopy.distance import geodesic
+from geo import geodesic_distance
 from datetime import datetime
 from telegram import (
     Update,
@@ -10,7 +9,8 @@ from telegram import (
     ReplyKeyboardMarkup,
 )
 from telegram.ext import ConversationHandler
-from config import RADIUS_SEARCH, LOCATIONS_FILE, MAX_RESULTS, SUPPORTED_CATEGORIES
+from config import MAX_RESULTS, SUPPORTED_CATEGORIES
+from callback_data import encode, CATEGORIES, FINDME, GUIDE, HUBS, INFO, MAIN_MENU
 from telegram.ext import ContextTypes
 
 # Category Constants
@@ -59,8 +59,8 @@ def setup_logger(name):
 
 # Location Functions
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two points using geopy"""
-    return geodesic((lat1, lon1), (lat2, lon2)).meters
+    """Calculate exact geodesic distance between two points in meters"""
+    return geodesic_distance(lat1, lon1, lat2, lon2)
 
 
 def format_distance(meters: float) -> str:
@@ -71,23 +71,6 @@ def format_distance(meters: float) -> str:
         return f"{meters / 1000:.1f}km"
 
 
-def load_locations():
-    """Load locations from JSON file"""
-    try:
-        with open(LOCATIONS_FILE, "r", encoding="utf-8") as file:
-            data = json.load(file)
-            locations = data.get("locations", [])
-            for location in locations:
-                if not validate_location_data(location):
-                    logger.warning(
-                        f"Invalid location data: {location.get('name', 'Unknown')}"
-                    )
-            return locations
-    except Exception as e:
-        logger.error(f"Error loading locations: {str(e)}")
-        return []
-
-
 def debug_category_search(category, places):
     """Debug helper for category searches"""
     logger.debug(f"""
@@ -99,82 +82,15 @@ def debug_category_search(category, places):
     """)
 
 
-def get_nearby_places(
-    latitude: float, longitude: float, max_distance: int = RADIUS_SEARCH
-) -> tuple:
-    """Get nearby places within specified radius. If max_distance is None, return all places with distances."""
-    try:
-        if not os.path.exists(LOCATIONS_FILE):
-            logger.error(f"Locations file not found: {LOCATIONS_FILE}")
-            return [], "File not found"
-
-        with open(LOCATIONS_FILE, "r", encoding="utf-8") as file:
-            data = json.load(file)
-
-        nearby_places = []
-        total_places = len(data.get("locations", []))
-        logger.info(f"Searching through {total_places} locations...")
-
-        for place in data.get("locations", []):
-            coords = place.get("coordinates", {})
-            if coords:
-                try:
-                    distance = calculate_distance(
-                        latitude,
-                        longitude,
-                        float(coords["latitude"]),
-                        float(coords["longitude"]),
-                    )
-                    # Add distance to place data
-                    place_copy = place.copy()
-                    place_copy["distance"] = int(distance)
-
-                    # If max_distance is None, add all places
-                    # Otherwise, only add places within max_distance
-                    if max_distance is None or distance <= max_distance:
-                        nearby_places.append(place_copy)
-
-                except ValueError as ve:
-                    logger.warning(
-                        f"Invalid coordinates for place {place.get('name')}: {ve}"
-                    )
-                    continue
-
-        if not nearby_places:
-            if max_distance:
-                logger.info(
-                    f"No places found within {max_distance}m of coordinates ({latitude}, {longitude})"
-                )
-            else:
-                logger.info(f"No places found in the database")
-            return [], "No places found"
-
-        # Sort by distance
-        nearby_places.sort(key=lambda x: x.get("distance", float("inf")))
-        found_places = len(nearby_places)
-        logger.info(
-            f"Found {found_places} places{f' within {max_distance}m radius' if max_distance else ''}"
-        )
-
-        return nearby_places, "OK"
-
-    except json.JSONDecodeError as je:
-        logger.error(f"Error parsing locations file: {str(je)}")
-        return [], "Invalid locations data"
-    except Exception as e:
-        logger.error(f"Error getting nearby places: {str(e)}", exc_info=True)
-        return [], str(e)
-
-
 # Navigation Functions
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show the main menu"""
     keyboard = [
-        [InlineKeyboardButton("🔍 Find Nearby Places", callback_data="nav_findme")],
-        [InlineKeyboardButton("🚏 Transport Hubs", callback_data="nav_transporthubs")],
-        [InlineKeyboardButton("🏛 City Guide", callback_data="nav_guide")],
-        [InlineKeyboardButton("📋 Categories", callback_data="nav_categories")],
-        [InlineKeyboardButton("ℹ️ Info", callback_data="nav_info")]
+        [InlineKeyboardButton("🔍 Find Nearby Places", callback_data=encode(FINDME))],
+        [InlineKeyboardButton("🚏 Transport Hubs", callback_data=encode(HUBS))],
+        [InlineKeyboardButton("🏛 City Guide", callback_data=encode(GUIDE))],
+        [InlineKeyboardButton("📋 Categories", callback_data=encode(CATEGORIES))],
+        [InlineKeyboardButton("ℹ️ Info", callback_data=encode(INFO))]
     ]
 
     message = "Welcome to Addis Places Bot! Choose an option:"
@@ -184,7 +100,6 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
         )
-        await update.callback_query.answer()
     else:
         await update.message.reply_text(
             message,
@@ -200,7 +115,7 @@ async def show_results(update, places, category=None):
             keyboard = [
                 [
                     InlineKeyboardButton(
-                        "🔙 Back to Main Menu", callback_data="menu_back"
+                        "🔙 Back to Main Menu", callback_data=encode(MAIN_MENU)
                     )
                 ]
             ]
@@ -221,7 +136,7 @@ async def show_results(update, places, category=None):
 
         keyboard = [
             [InlineKeyboardButton("See More Places", callback_data="more_results")],
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu_back")],
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))],
         ]
 
         await update.message.reply_text(
@@ -273,7 +188,7 @@ async def handle_error(update: Update, error_message: str):
 
     try:
         keyboard = [
-            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data="menu_back")]
+            [InlineKeyboardButton("🔙 Back to Main Menu", callback_data=encode(MAIN_MENU))]
         ]
 
         if update.callback_query:
@@ -281,7 +196,6 @@ async def handle_error(update: Update, error_message: str):
                 f"Sorry, an error occurred: {error_message}",
                 reply_markup=InlineKeyboardMarkup(keyboard),
             )
-            await update.callback_query.answer()
         else:
             await update.effective_message.reply_text(
                 f"Sorry, an error occurred: {error_message}",
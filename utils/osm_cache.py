@@ -0,0 +1,175 @@
+"""On-disk tile cache and checkpoint of full OSM refreshes.
+
+Every tile a full refresh fetches is written to ``tiles/<hash>.json``
+under the cache directory, named by the sha256 of its content (the
+tile's places by OSM element, in element order), and recorded in
+``manifest.json``, the checkpoint of the run:
+
+    {"query": ..., "started": ..., "complete": false,
+     "tiles": {bbox: {"hash": ..., "osm_base": ..., "elements": n}},
+     "split": [bbox, ...],
+     "published": {bbox: hash}}
+
+A run that fails part-way (a tile that can't be fetched, a crash, a
+refused publish) is resumed by the next one: tiles already in the
+checkpoint are read back instead of fetched, and tiles that were split
+start as their quarters. A checkpoint is only resumed for the same query
+and while it is younger than ``max_age``, so stale data is not mixed in.
+
+``published`` holds the tile hashes of the last published run: when a
+new run gives the same hashes for the same tiles, nothing changed and
+publishing can be skipped.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from osm_tiles import Tile
+
+logger = logging.getLogger(__name__)
+
+TileResult = Tuple[Dict[Tuple[str, int], List[Dict[str, Any]]], Optional[str]]
+
+
+class TileCache:
+    """Content-addressed tile responses plus the checkpoint manifest"""
+
+    def __init__(self, directory: str, max_age: float):
+        self.directory = directory
+        self.max_age = max_age
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self.tiles_dir = os.path.join(directory, "tiles")
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_file = f"{self.manifest_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _tile_file(self, digest: str) -> str:
+        return os.path.join(self.tiles_dir, f"{digest}.json")
+
+    def start(self, query: str) -> bool:
+        """Begin a run for a query; returns whether an unfinished one is resumed"""
+        manifest = self.manifest
+        resumable = (
+            manifest.get("tiles") is not None
+            and not manifest.get("complete", True)
+            and manifest.get("query") == query
+            and time.time() - manifest.get("started", 0) < self.max_age
+        )
+        if resumable:
+            logger.info(
+                f"Resuming refresh from checkpoint: {len(manifest['tiles'])} "
+                f"tiles already fetched, {len(manifest['split'])} split"
+            )
+            return True
+        self.manifest = {
+            "query": query,
+            "started": time.time(),
+            "complete": False,
+            "tiles": {},
+            "split": [],
+            "published": manifest.get("published", {}),
+        }
+        self._save_manifest()
+        return False
+
+    def plan(self, tiles: List[Tile]) -> List[Tile]:
+        """The tiles to fetch: tiles split in this run replaced by their quarters"""
+        split = set(self.manifest["split"])
+        planned = []
+        pending = list(tiles)
+        while pending:
+            tile = pending.pop()
+            if tile.bbox in split:
+                pending.extend(tile.quarters())
+            else:
+                planned.append(tile)
+        return planned[::-1]
+
+    def load(self, tile: Tile) -> Optional[TileResult]:
+        """The tile's result if this run already fetched it"""
+        entry = self.manifest["tiles"].get(tile.bbox)
+        if entry is None:
+            return None
+        try:
+            with open(self._tile_file(entry["hash"]), "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cached tile {tile.bbox} unreadable, fetching it again: {e}")
+            del self.manifest["tiles"][tile.bbox]
+            return None
+        return {(kind, osm_id): found for kind, osm_id, found in items}, entry["osm_base"]
+
+    def store(self, tile: Tile, result: TileResult) -> str:
+        """Record a fetched tile in the checkpoint; returns its content hash.
+
+        A tile whose content is already cached (unchanged since an earlier
+        run) is not written again.
+        """
+        by_element, osm_base = result
+        content = json.dumps(
+            [[kind, osm_id, found] for (kind, osm_id), found in sorted(by_element.items())],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._tile_file(digest)
+        if not os.path.exists(path):
+            os.makedirs(self.tiles_dir, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(content)
+            os.replace(f"{path}.tmp", path)
+        self.manifest["tiles"][tile.bbox] = {
+            "hash": digest,
+            "osm_base": osm_base,
+            "elements": len(by_element),
+        }
+        self._save_manifest()
+        return digest
+
+    def split(self, tile: Tile) -> None:
+        """Record that a tile was split, so a resumed run starts from its quarters"""
+        self.manifest["split"].append(tile.bbox)
+        self._save_manifest()
+
+    def hashes(self) -> Dict[str, str]:
+        return {bbox: entry["hash"] for bbox, entry in self.manifest["tiles"].items()}
+
+    def unchanged(self) -> bool:
+        """Whether this run fetched exactly what was last published"""
+        return bool(self.manifest["tiles"]) and self.hashes() == self.manifest["published"]
+
+    def finish(self, published: bool) -> None:
+        """Close the run; if it was published, remember its tiles as the published ones.
+
+        Cached files referenced by neither this run nor the published one
+        are deleted.
+        """
+        self.manifest["complete"] = True
+        if published:
+            self.manifest["published"] = self.hashes()
+        self._save_manifest()
+
+        keep = {f"{digest}.json" for digest in self.hashes().values()}
+        keep.update(f"{digest}.json" for digest in self.manifest["published"].values())
+        try:
+            names = os.listdir(self.tiles_dir)
+        except OSError:
+            return
+        for name in names:
+            if name not in keep:
+                os.remove(os.path.join(self.tiles_dir, name))
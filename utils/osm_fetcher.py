@@ -1,17 +1,53 @@
+import argparse
+import asyncio
+import hashlib
 import json
 import requests
 import time
 import os
 import sys
-from typing import Dict, List
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 import logging
 
-# Add parent directory to Python path
+import httpx
+
+# Add parent directory to Python path, and this directory for sibling modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.insert(0, parent_dir)
-
-from config import SUPPORTED_CATEGORIES
+if current_dir not in sys.path:
+    sys.path.insert(1, current_dir)
+
+from config import (
+    OSM_CHECKPOINT_MAX_AGE,
+    OSM_MIN_TILE_SIZE,
+    OSM_REGIONS,
+    OSM_TILE_RETRIES,
+    OSM_TILE_SIZE,
+    OVERPASS_MIRRORS,
+    PUBLISH_DROP_SLACK,
+    PUBLISH_MAX_DROP,
+    STORE_BACKEND,
+    SUPPORTED_CATEGORIES,
+)
+from snapshot import (
+    SnapshotError,
+    decode,
+    encode,
+    read_manifest,
+    read_snapshot,
+    write_snapshot,
+)
+from place_dedup import deduplicate
+from osm_tiles import Tile, TileFetchError, fetch_tiles, split_region
+from osm_cache import TileCache
+from overpass_client import (
+    AugmentedDiffParser,
+    ElementStreamParser,
+    OverpassClient,
+    OverpassError,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,11 +55,24 @@ logger = logging.getLogger(__name__)
 class OSMDataFetcher:
     """Fetch data from OpenStreetMap using Overpass API"""
 
-    # Overpass API endpoint
-    OVERPASS_API = "https://overpass-api.de/api/interpreter"
-
-    # Addis Ababa bounding box coordinates
-    ADDIS_BBOX = "8.9,38.7,9.1,38.9"  # (south,west,north,east)
+    # Overpass API endpoint, or a list of mirrors to spread queries over
+    OVERPASS_API = OVERPASS_MIRRORS
+
+    # Regions to cover, name -> (south, west, north, east)
+    REGIONS = OSM_REGIONS
+
+    # Data files: the snapshot the bot loads, and the OSM timestamp of the
+    # last successful sync (``python snapshot.py export`` writes the JSON)
+    SNAPSHOT_FILE = "data/locations.bin"
+    DATABASE_FILE = "data/locations.sqlite"
+    # Places as fetched, before deduplication; diffs are applied to these
+    RAW_FILE = "data/osm_raw.bin"
+    STATE_FILE = "data/osm_state.json"
+    # Tile responses and the checkpoint of the current full refresh
+    CACHE_DIR = "data/osm_cache"
+    # Days between full downloads; runs in between only fetch diffs
+    FULL_RESYNC_DAYS = 7
+    OSM_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
     # OSM tag mappings for each category
     CATEGORY_TAGS = {
@@ -40,33 +89,174 @@ class OSMDataFetcher:
     }
 
     @staticmethod
-    def build_overpass_query(category: str) -> str:
-        """Build Overpass QL query for a specific category"""
-        tags = OSMDataFetcher.CATEGORY_TAGS.get(category, [])
+    def tag_categories() -> Dict[Tuple[str, str], List[str]]:
+        """Map each (key, value) OSM tag to the supported categories using it"""
+        lookup: Dict[Tuple[str, str], List[str]] = {}
+        for category in SUPPORTED_CATEGORIES:
+            for tag in OSMDataFetcher.CATEGORY_TAGS.get(category, []):
+                key, value = tag.split("=")
+                lookup.setdefault((key, value), []).append(category)
+        return lookup
+
+    @staticmethod
+    def region_bboxes() -> List[str]:
+        """Overpass bbox filter arguments of the configured regions"""
+        return [Tile(*bbox).bbox for bbox in OSMDataFetcher.REGIONS.values()]
+
+    @staticmethod
+    def build_overpass_query(
+        categories: Union[str, List[str], None] = None,
+        bbox: Union[str, List[str], None] = None,
+        since: str = None,
+    ) -> str:
+        """Build one Overpass QL query for several categories (default: all).
+
+        ``bbox`` is one bbox or a list of them; by default all configured
+        regions are queried.
+
+        Tagged nodes, ways and relations are requested with their tags.
+        Ways and relations (malls, hospitals, parks mapped as areas) come
+        with a centre point computed by the server (``out center``), so no
+        member nodes or geometry are downloaded. Categories are assigned
+        client-side from the tags, see ``categories_for``.
+
+        With ``since`` (an OSM timestamp) the query asks for an augmented
+        diff instead: what was created, modified or deleted since then.
+        """
+        if categories is None:
+            categories = SUPPORTED_CATEGORIES
+        elif isinstance(categories, str):
+            categories = [categories]
+
+        tags = dict.fromkeys(
+            tag
+            for category in categories
+            for tag in OSMDataFetcher.CATEGORY_TAGS.get(category, [])
+        )
         if not tags:
             return ""
+        if bbox is None:
+            bbox = OSMDataFetcher.region_bboxes()
+        elif isinstance(bbox, str):
+            bbox = [bbox]
 
-        # Build query for each tag in the category
         queries = []
-        for tag in tags:
-            key, value = tag.split("=")
-            queries.append(
-                f'node["{key}"="{value}"]({OSMDataFetcher.ADDIS_BBOX});'
-                f'way["{key}"="{value}"]({OSMDataFetcher.ADDIS_BBOX});'
-                f'relation["{key}"="{value}"]({OSMDataFetcher.ADDIS_BBOX});'
-            )
+        for box in bbox:
+            for tag in tags:
+                key, value = tag.split("=")
+                queries.append(f'nwr["{key}"="{value}"]({box});')
 
-        # Combine all queries
-        full_query = f"""
-        [out:json][timeout:25];
+        if since:
+            settings = f'[out:xml][timeout:25][adiff:"{since}"]'
+        else:
+            settings = "[out:json][timeout:25]"
+        return f"""
+        {settings};
         (
             {" ".join(queries)}
         );
-        out body;
-        >;
-        out skel qt;
+        out body center qt;
         """
-        return full_query
+
+    @staticmethod
+    def categories_for(
+        tags: Dict[str, str], lookup: Dict[Tuple[str, str], List[str]]
+    ) -> List[str]:
+        """Supported categories an element belongs to, from its tags"""
+        categories = []
+        for item in tags.items():
+            for category in lookup.get(item, ()):
+                if category not in categories:
+                    categories.append(category)
+        return categories
+
+    @staticmethod
+    def query_signature() -> str:
+        """Short hash of the full query; a diff only applies to data fetched with it"""
+        query = " ".join(OSMDataFetcher.build_overpass_query().split())
+        return hashlib.sha1(query.encode()).hexdigest()[:12]
+
+    @staticmethod
+    def element_position(element: Dict) -> Optional[Dict]:
+        """Coordinates of a node, or the server-side centre of a way/relation"""
+        position = element.get("center", element)
+        if position.get("lat") is None or position.get("lon") is None:
+            return None
+        return {"latitude": position["lat"], "longitude": position["lon"]}
+
+    @staticmethod
+    def to_location(
+        element: Dict, category: str, osm_tags: List[str] = None
+    ) -> Optional[Dict]:
+        """Location dict for an OSM element, or None if it has no name or position.
+
+        ``osm_tags`` are the "key=value" tags that put it in the category.
+        """
+        tags = element.get("tags", {})
+        name = tags.get("name:en") or tags.get("name")
+        if not name:
+            return None
+        coordinates = OSMDataFetcher.element_position(element)
+        if coordinates is None:
+            return None
+        return {
+            "name": name,
+            "coordinates": coordinates,
+            "category": category,
+            "osm_type": element.get("type"),
+            "osm_id": element.get("id"),
+            "osm_tags": osm_tags or [],
+            "description": tags.get("description", ""),
+            "opening_hours": tags.get("opening_hours", ""),
+            "contact": {
+                "phone": tags.get("phone", ""),
+                "email": tags.get("email", ""),
+            },
+        }
+
+    @staticmethod
+    def element_locations(
+        element: Dict,
+        lookup: Dict[Tuple[str, str], List[str]],
+        categories: List[str] = None,
+    ) -> List[Dict]:
+        """One location per (wanted) category an element's tags match"""
+        if element.get("type") not in ("node", "way", "relation"):
+            return []
+        locations = []
+        tags = element.get("tags", {})
+        for category in OSMDataFetcher.categories_for(tags, lookup):
+            if categories is not None and category not in categories:
+                continue
+            osm_tags = [
+                f"{key}={value}"
+                for key, value in tags.items()
+                if category in lookup.get((key, value), ())
+            ]
+            location = OSMDataFetcher.to_location(element, category, osm_tags)
+            if location:
+                locations.append(location)
+        return locations
+
+    @staticmethod
+    def sort_locations(locations: List[Dict]) -> List[Dict]:
+        """Group locations by category in SUPPORTED_CATEGORIES order (stable)"""
+        order = {category: i for i, category in enumerate(SUPPORTED_CATEGORIES)}
+        locations.sort(key=lambda location: order[location["category"]])
+        return locations
+
+    @staticmethod
+    def collect_locations(
+        elements: Iterable[Dict], categories: List[str] = None
+    ) -> List[Dict]:
+        """Convert a sequence of elements into grouped location dicts"""
+        lookup = OSMDataFetcher.tag_categories()
+        locations = []
+        for element in elements:
+            locations.extend(
+                OSMDataFetcher.element_locations(element, lookup, categories)
+            )
+        return OSMDataFetcher.sort_locations(locations)
 
     @staticmethod
     def fetch_category_data(category: str) -> List[Dict]:
@@ -77,38 +267,17 @@ class OSMDataFetcher:
                 logger.error(f"No query built for category: {category}")
                 return []
 
-            # Make request to Overpass API
-            response = requests.post(OSMDataFetcher.OVERPASS_API, data=query)
+            # Make request to Overpass API (the first mirror)
+            endpoint = OSMDataFetcher.OVERPASS_API
+            if not isinstance(endpoint, str):
+                endpoint = endpoint[0]
+            response = requests.post(
+                endpoint, data=query, timeout=OverpassClient.TIMEOUT
+            )
             response.raise_for_status()
-            data = response.json()
-
-            # Process and format the results
-            locations = []
-            for element in data.get("elements", []):
-                if element.get("type") == "node":  # Only process nodes for simplicity
-                    location = {
-                        "name": element.get("tags", {}).get("name:en")
-                        or element.get("tags", {}).get("name"),
-                        "coordinates": {
-                            "latitude": element.get("lat"),
-                            "longitude": element.get("lon"),
-                        },
-                        "category": category,
-                        "description": element.get("tags", {}).get("description", ""),
-                        "opening_hours": element.get("tags", {}).get(
-                            "opening_hours", ""
-                        ),
-                        "contact": {
-                            "phone": element.get("tags", {}).get("phone", ""),
-                            "email": element.get("tags", {}).get("email", ""),
-                        },
-                    }
-
-                    # Only add locations with names
-                    if location["name"]:
-                        locations.append(location)
-
-            return locations
+            return OSMDataFetcher.collect_locations(
+                response.json().get("elements", []), [category]
+            )
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error fetching data for {category}: {str(e)}")
@@ -118,57 +287,376 @@ class OSMDataFetcher:
             return []
 
     @staticmethod
-    def fetch_all_categories() -> Dict[str, List[Dict]]:
+    async def stream_locations(
+        client: OverpassClient, query: str, parser: ElementStreamParser = None
+    ) -> List[Dict]:
+        """Run a query and convert its elements as they stream in"""
+        lookup = OSMDataFetcher.tag_categories()
+        locations = []
+        async for element in client.stream_elements(query, parser):
+            locations.extend(OSMDataFetcher.element_locations(element, lookup))
+        return OSMDataFetcher.sort_locations(locations)
+
+    @staticmethod
+    def now_timestamp() -> str:
+        """Current UTC time as an OSM timestamp"""
+        return datetime.now(timezone.utc).strftime(OSMDataFetcher.OSM_TIMESTAMP_FORMAT)
+
+    @staticmethod
+    async def fetch_tile(
+        client: OverpassClient, tile: Tile
+    ) -> Tuple[Dict[Tuple[str, int], List[Dict]], Optional[str]]:
+        """Locations of one tile by OSM element, plus the tile's OSM timestamp.
+
+        The tile is only kept once its response ended cleanly, so a query
+        that fails half-way leaves nothing behind.
+        """
+        lookup = OSMDataFetcher.tag_categories()
+        parser = ElementStreamParser()
+        by_element = {}
+        query = OSMDataFetcher.build_overpass_query(bbox=tile.bbox)
+        async for element in client.stream_elements(query, parser):
+            by_element[(element.get("type"), element.get("id"))] = (
+                OSMDataFetcher.element_locations(element, lookup)
+            )
+        return by_element, parser.osm_base
+
+    @staticmethod
+    async def fetch_snapshot_async(
+        regions: Dict[str, Tuple[float, float, float, float]] = None,
+        tile_size: float = OSM_TILE_SIZE,
+        min_tile_size: float = OSM_MIN_TILE_SIZE,
+        tile_retries: int = OSM_TILE_RETRIES,
+        cache: TileCache = None,
+        **client_options,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """All supported categories, plus the OSM timestamp the data reflects.
+
+        Every region is split into tiles of ``tile_size`` degrees, fetched
+        in parallel (as many at once as the client has query slots), each
+        with one combined query parsed element by element as it streams in.
+        Tiles that time out are split further (see ``osm_tiles``). Elements
+        found in several tiles (areas crossing a tile border) are kept once,
+        matched on OSM type and id. The timestamp is the oldest of the
+        tiles', so a diff from it misses no change.
+
+        With a ``cache``, every fetched tile is checkpointed to disk and
+        tiles an unfinished earlier run already fetched are read back
+        instead (see ``osm_cache``).
+        """
+        started = time.perf_counter()
+        requested_at = OSMDataFetcher.now_timestamp()
+        regions = OSMDataFetcher.REGIONS if regions is None else regions
+        tiles = [
+            tile for bbox in regions.values() for tile in split_region(bbox, tile_size)
+        ]
+        if cache is not None:
+            cache.start(OSMDataFetcher.query_signature())
+            tiles = cache.plan(tiles)
+
+        async def fetch(tile: Tile):
+            if cache is None:
+                return await OSMDataFetcher.fetch_tile(client, tile)
+            result = cache.load(tile)
+            if result is None:
+                result = await OSMDataFetcher.fetch_tile(client, tile)
+                cache.store(tile, result)
+            return result
+
+        try:
+            async with OverpassClient(
+                OSMDataFetcher.OVERPASS_API, **client_options
+            ) as client:
+                results = await fetch_tiles(
+                    tiles,
+                    fetch,
+                    workers=client.max_concurrency,
+                    min_size=min_tile_size,
+                    retries=tile_retries,
+                    on_split=cache.split if cache is not None else None,
+                )
+        except TileFetchError as e:
+            logger.error(f"Error fetching locations: {str(e)}")
+            return [], None
+
+        merged: Dict[Tuple[str, int], List[Dict]] = {}
+        osm_bases = []
+        for _, (by_element, osm_base) in results:
+            for key, element_locations in by_element.items():
+                merged.setdefault(key, element_locations)
+            osm_bases.append(osm_base or requested_at)
+        locations = OSMDataFetcher.sort_locations(
+            [location for found in merged.values() for location in found]
+        )
+
+        logger.info(
+            f"Fetched {len(locations)} locations for {len(SUPPORTED_CATEGORIES)} "
+            f"categories from {len(results)} tiles in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+        return locations, min(osm_bases, default=requested_at)
+
+    @staticmethod
+    async def fetch_all_categories_async(**client_options) -> List[Dict]:
+        """Fetch all supported categories with one combined, streamed query"""
+        locations, _ = await OSMDataFetcher.fetch_snapshot_async(**client_options)
+        return locations
+
+    @staticmethod
+    def fetch_all_categories() -> List[Dict]:
         """Fetch data for all supported categories"""
-        all_locations = []
+        return asyncio.run(OSMDataFetcher.fetch_all_categories_async())
 
-        for category in SUPPORTED_CATEGORIES:
-            logger.info(f"Fetching data for category: {category}")
-            try:
-                # Add delay to avoid hitting API rate limits
-                time.sleep(2)
-                locations = OSMDataFetcher.fetch_category_data(category)
-                all_locations.extend(locations)
-                logger.info(f"Found {len(locations)} locations for {category}")
-            except Exception as e:
-                logger.error(f"Error processing category {category}: {str(e)}")
+    @staticmethod
+    async def fetch_changes_async(
+        since: str, **client_options
+    ) -> Tuple[Optional[List[Tuple[str, Dict]]], Optional[str]]:
+        """Changes to matching elements since an OSM timestamp (augmented diff).
+
+        Returns ``(changes, osm_base)`` where changes are ``(action,
+        element)`` pairs, or ``(None, None)`` if the diff could not be fetched.
+        """
+        started = time.perf_counter()
+        requested_at = OSMDataFetcher.now_timestamp()
+        parser = AugmentedDiffParser()
+        try:
+            async with OverpassClient(
+                OSMDataFetcher.OVERPASS_API, **client_options
+            ) as client:
+                query = OSMDataFetcher.build_overpass_query(since=since)
+                changes = [
+                    change async for change in client.stream_changes(query, parser)
+                ]
+        except (httpx.HTTPError, OverpassError, SyntaxError) as e:
+            logger.error(f"Error fetching changes since {since}: {str(e)}")
+            return None, None
+
+        logger.info(
+            f"Fetched {len(changes)} changes since {since} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return changes, parser.osm_base or requested_at
 
-        return all_locations
+    @staticmethod
+    def apply_changes(
+        locations: List[Dict], changes: Iterable[Tuple[str, Dict]]
+    ) -> Tuple[List[Dict], Dict[str, int]]:
+        """Apply diff changes to a location list, matching on OSM type and id.
+
+        Every location of a changed element is dropped and, unless the
+        element was deleted, rebuilt from its new version (so a changed tag
+        can also move it to another category). Returns the new list and a
+        count of each action.
+        """
+        lookup = OSMDataFetcher.tag_categories()
+        counts = {"create": 0, "modify": 0, "delete": 0}
+        replaced: Dict[Tuple[str, int], List[Dict]] = {}
+        for action, element in changes:
+            counts[action] = counts.get(action, 0) + 1
+            key = (element["type"], element["id"])
+            replaced[key] = (
+                [] if action == "delete"
+                else OSMDataFetcher.element_locations(element, lookup)
+            )
+
+        kept = [
+            location
+            for location in locations
+            if (location.get("osm_type"), location.get("osm_id")) not in replaced
+        ]
+        for new_locations in replaced.values():
+            kept.extend(new_locations)
+        return OSMDataFetcher.sort_locations(kept), counts
 
     @staticmethod
-    def save_to_json(locations: List[Dict], filename: str = "data/locations.json"):
-        """Save fetched locations to JSON file"""
+    def load_locations(filename: str = SNAPSHOT_FILE) -> List[Dict]:
+        """Read the current snapshot (empty if missing or unreadable)"""
         try:
-            # Ensure data directory exists
-            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            columns, _ = read_snapshot(filename)
+            return decode(columns)
+        except (OSError, ValueError, SnapshotError) as e:
+            logger.warning(f"Could not read {filename}: {str(e)}")
+            return []
 
-            # Save data to JSON file
-            with open(filename, "w", encoding="utf-8") as f:
-                json.dump({"locations": locations}, f, ensure_ascii=False, indent=2)
+    @staticmethod
+    def load_state(filename: str = STATE_FILE) -> Dict:
+        """Read the sync state (OSM timestamps of the last runs)"""
+        try:
+            with open(filename, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
-            logger.info(f"Successfully saved {len(locations)} locations to {filename}")
+    @staticmethod
+    def save_state(state: Dict, filename: str = STATE_FILE) -> None:
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_filename, filename)
 
-        except Exception as e:
-            logger.error(f"Error saving locations to JSON: {str(e)}")
+    @staticmethod
+    def full_resync_due(state: Dict, locations: List[Dict]) -> bool:
+        """Whether the next run must download everything instead of a diff"""
+        if not state.get("osm_base") or not state.get("last_full_sync"):
+            return True
+        # A diff only covers what the current query matches; after the query
+        # changes (new tags, element types) everything must be fetched again
+        if state.get("query") != OSMDataFetcher.query_signature():
+            return True
+        # Places saved before OSM ids were recorded cannot be matched by a diff
+        if not locations or any("osm_id" not in location for location in locations):
+            return True
+        last_full = datetime.strptime(
+            state["last_full_sync"], OSMDataFetcher.OSM_TIMESTAMP_FORMAT
+        ).replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - last_full >= timedelta(
+            days=OSMDataFetcher.FULL_RESYNC_DAYS
+        )
 
+    @staticmethod
+    def count_drops(
+        locations: List[Dict], previous: Optional[Dict[str, int]]
+    ) -> Dict[str, Tuple[int, int]]:
+        """Categories that lost too many places since the last publish.
+
+        ``previous`` are the per-category counts of the published snapshot.
+        A category may lose up to PUBLISH_DROP_SLACK places, or more if
+        that is at most PUBLISH_MAX_DROP of them. Returns category ->
+        (previous count, new count) for each one that lost more.
+        """
+        counts: Dict[str, int] = {}
+        for location in locations:
+            counts[location["category"]] = counts.get(location["category"], 0) + 1
+        drops = {}
+        for category, before in (previous or {}).items():
+            after = counts.get(category, 0)
+            if before - after > max(PUBLISH_MAX_DROP * before, PUBLISH_DROP_SLACK):
+                drops[category] = (before, after)
+        return drops
 
-def update_locations_data():
-    """Main function to update locations data"""
-    try:
-        logger.info("Starting location data update from OpenStreetMap")
+    @staticmethod
+    def save_snapshot(
+        locations: List[Dict], filename: str = SNAPSHOT_FILE, osm_base: str = None
+    ) -> bool:
+        """Publish locations as the binary snapshot the bot loads.
+
+        The snapshot is written to a temporary file and renamed into place,
+        so the bot never sees a half-written file. Returns whether it
+        succeeded.
+        """
+        try:
+            manifest = write_snapshot(encode(locations), filename, osm_base=osm_base)
+            logger.info(
+                f"Published {manifest['count']} locations to {filename} "
+                f"(snapshot version {manifest['version']}, {manifest['checksum'][:19]})"
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error saving locations snapshot: {str(e)}")
+            return False
 
-        # Fetch all locations
-        locations = OSMDataFetcher.fetch_all_categories()
+    @staticmethod
+    def save_database(
+        locations: List[Dict], filename: str = DATABASE_FILE, osm_base: str = None
+    ) -> bool:
+        """Publish locations as the SQLite database of the "sqlite" store backend"""
+        from sqlite_store import build_database
 
-        if locations:
-            # Save to JSON file
-            OSMDataFetcher.save_to_json(locations)
-            logger.info("Location data update completed successfully")
+        try:
+            count = build_database(encode(locations), filename, osm_base=osm_base)
+            logger.info(f"Published {count} locations to {filename}")
             return True
-        else:
-            logger.error("No locations fetched")
+
+        except Exception as e:
+            logger.error(f"Error saving locations database: {str(e)}")
             return False
 
+
+def update_locations_data(full: bool = False, force: bool = False) -> bool:
+    """Main function to update locations data.
+
+    Downloads only what changed since the last successful run, and
+    everything every FULL_RESYNC_DAYS days (or when ``full`` is set) to
+    catch any drift. Diffs are applied to the places as fetched (kept in
+    RAW_FILE); duplicates are merged only in the published snapshot.
+
+    A full download is checkpointed tile by tile in CACHE_DIR, so a run
+    that fails is resumed by the next one, and nothing is published when
+    every tile came back unchanged. Data that lost too many places in
+    some category (see ``count_drops``) is not published unless ``force``
+    is set; the previous snapshot stays in place.
+    """
+    try:
+        state = OSMDataFetcher.load_state(OSMDataFetcher.STATE_FILE)
+        existing = OSMDataFetcher.load_locations(OSMDataFetcher.RAW_FILE)
+        cache = None
+
+        if full or OSMDataFetcher.full_resync_due(state, existing):
+            logger.info("Starting full location data update from OpenStreetMap")
+            cache = TileCache(OSMDataFetcher.CACHE_DIR, OSM_CHECKPOINT_MAX_AGE)
+            locations, osm_base = asyncio.run(
+                OSMDataFetcher.fetch_snapshot_async(cache=cache)
+            )
+            if not locations:
+                logger.error("No locations fetched")
+                return False
+            if existing and cache.unchanged():
+                logger.info("All tiles unchanged since the last publish")
+                locations = None
+            state["last_full_sync"] = osm_base
+            state["query"] = OSMDataFetcher.query_signature()
+        else:
+            since = state["osm_base"]
+            logger.info(f"Starting incremental location data update since {since}")
+            changes, osm_base = asyncio.run(OSMDataFetcher.fetch_changes_async(since))
+            if changes is None:
+                return False
+            locations, counts = OSMDataFetcher.apply_changes(existing, changes)
+            logger.info(
+                f"Applied {counts['create']} creates, {counts['modify']} "
+                f"modifications and {counts['delete']} deletes"
+            )
+            if not changes:
+                # Nothing to rewrite; don't make the bot reload identical data
+                locations = None
+
+        if locations is not None:
+            merged, _ = deduplicate(locations)
+            previous = read_manifest(OSMDataFetcher.SNAPSHOT_FILE)
+            drops = OSMDataFetcher.count_drops(
+                merged, previous and previous.get("categories")
+            )
+            if drops and not force:
+                logger.error(
+                    "Refusing to publish, places dropped in "
+                    + ", ".join(
+                        f"{category} ({before} -> {after})"
+                        for category, (before, after) in drops.items()
+                    )
+                    + "; rerun with --force to publish anyway"
+                )
+                return False
+            if not OSMDataFetcher.save_snapshot(
+                locations, OSMDataFetcher.RAW_FILE, osm_base
+            ):
+                return False
+            locations = merged
+            if not OSMDataFetcher.save_snapshot(
+                locations, OSMDataFetcher.SNAPSHOT_FILE, osm_base
+            ):
+                return False
+            if STORE_BACKEND == "sqlite" and not OSMDataFetcher.save_database(
+                locations, OSMDataFetcher.DATABASE_FILE, osm_base
+            ):
+                return False
+        if cache is not None:
+            cache.finish(published=True)
+        state["osm_base"] = osm_base
+        OSMDataFetcher.save_state(state, OSMDataFetcher.STATE_FILE)
+        logger.info(f"Location data update completed successfully (OSM base {osm_base})")
+        return True
+
     except Exception as e:
         logger.error(f"Error updating locations data: {str(e)}")
         return False
@@ -181,5 +669,12 @@ if __name__ == "__main__":
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
 
+    parser = argparse.ArgumentParser(description="Update locations from OpenStreetMap")
+    parser.add_argument("--full", action="store_true", help="download everything")
+    parser.add_argument(
+        "--force", action="store_true", help="publish even if many places dropped"
+    )
+    args = parser.parse_args()
+
     # Update locations data
-    update_locations_data()
+    update_locations_data(full=args.full, force=args.force)
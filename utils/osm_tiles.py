@@ -0,0 +1,188 @@
+"""Tiled fetching of large regions from Overpass.
+
+A region too large for one query (the server gives up after its
+``[timeout:25]``, or runs out of memory) is split into a grid of tiles
+that are fetched in parallel, each retried on its own. A tile that still
+times out is split into four quarters, down to a minimum size, so dense
+areas end up in small tiles and empty ones stay in large tiles.
+"""
+import asyncio
+import math
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple, TypeVar
+import logging
+
+import httpx
+
+from overpass_client import OverpassError, OverpassTimeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Tile(NamedTuple):
+    """A bounding box in degrees, in Overpass (south, west, north, east) order"""
+
+    south: float
+    west: float
+    north: float
+    east: float
+
+    @property
+    def bbox(self) -> str:
+        """The tile as an Overpass bbox filter argument"""
+        return ",".join(f"{value:.7g}" for value in self)
+
+    @property
+    def size(self) -> float:
+        """Length of the longer side, in degrees"""
+        return max(self.north - self.south, self.east - self.west)
+
+    def quarters(self) -> List["Tile"]:
+        """The four tiles this one splits into"""
+        lat = (self.south + self.north) / 2
+        lon = (self.west + self.east) / 2
+        return [
+            Tile(self.south, self.west, lat, lon),
+            Tile(self.south, lon, lat, self.east),
+            Tile(lat, self.west, self.north, lon),
+            Tile(lat, lon, self.north, self.east),
+        ]
+
+
+def split_region(bbox: Tuple[float, float, float, float], size: float) -> List[Tile]:
+    """Cover a (south, west, north, east) box with tiles of at most size degrees.
+
+    The tiles are equal, just small enough to stay within ``size``, so no
+    thin strip is left over at the edges.
+    """
+    south, west, north, east = bbox
+    rows = max(1, math.ceil((north - south) / size - 1e-9))
+    cols = max(1, math.ceil((east - west) / size - 1e-9))
+    height = (north - south) / rows
+    width = (east - west) / cols
+    return [
+        Tile(
+            south + row * height,
+            west + col * width,
+            north if row == rows - 1 else south + (row + 1) * height,
+            east if col == cols - 1 else west + (col + 1) * width,
+        )
+        for row in range(rows)
+        for col in range(cols)
+    ]
+
+
+def is_overload(error: Exception) -> bool:
+    """Whether an error means the query was too large, not that it failed by chance"""
+    if isinstance(error, (OverpassTimeout, httpx.TimeoutException)):
+        return True
+    return (
+        isinstance(error, httpx.HTTPStatusError)
+        and error.response.status_code == 504
+    )
+
+
+class TileFetchError(Exception):
+    """Some tiles could not be fetched, even split and retried"""
+
+    def __init__(self, failed: List[Tuple[Tile, Exception]]):
+        self.failed = failed
+        tile, error = failed[0]
+        super().__init__(
+            f"{len(failed)} tile(s) failed, first {tile.bbox}: {error!r}"
+        )
+
+
+async def fetch_tiles(
+    tiles: List[Tile],
+    fetch: Callable[[Tile], Awaitable[T]],
+    workers: int,
+    min_size: float,
+    retries: int,
+    backoff: float = 1.0,
+    on_split: Optional[Callable[[Tile], None]] = None,
+) -> List[Tuple[Tile, T]]:
+    """Run ``fetch`` for every tile, ``workers`` at a time; returns (tile, result).
+
+    A tile whose fetch times out is replaced by its quarters while it is
+    larger than ``min_size``; any other failure (and a timeout of a tile
+    that can't be split) is retried ``retries`` times with exponential
+    backoff; ``on_split`` is called with every tile that is split. A tile
+    waiting for its retry is queued again when the delay is up, so it
+    doesn't hold a worker meanwhile. Raises TileFetchError, after all
+    other tiles are done, if any tile still failed (or ``on_split``
+    raised): a region with holes must not be published.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    for tile in tiles:
+        queue.put_nowait((tile, 0))
+    results: List[Tuple[Tile, T]] = []
+    failed: List[Tuple[Tile, Exception]] = []
+    stats = {"split": 0, "retried": 0}
+    retries_pending: List[asyncio.TimerHandle] = []
+
+    def requeue(item: Tuple[Tile, int]) -> None:
+        # Queued before the failed attempt is marked done, so the queue
+        # never looks finished while a retry is waiting
+        queue.put_nowait(item)
+        queue.task_done()
+
+    async def worker() -> None:
+        while True:
+            tile, attempt = await queue.get()
+            done = True
+            try:
+                results.append((tile, await fetch(tile)))
+            except (httpx.HTTPError, OverpassError) as e:
+                if is_overload(e) and tile.size / 2 >= min_size:
+                    logger.info(f"Tile {tile.bbox} timed out, splitting it in four")
+                    stats["split"] += 1
+                    for quarter in tile.quarters():
+                        queue.put_nowait((quarter, 0))
+                    if on_split is not None:
+                        try:
+                            on_split(tile)
+                        except Exception as split_error:
+                            logger.error(
+                                f"Could not record split of {tile.bbox}: {split_error!r}"
+                            )
+                            failed.append((tile, split_error))
+                elif attempt < retries:
+                    delay = backoff * 2**attempt
+                    logger.warning(
+                        f"Tile {tile.bbox} failed ({e!r}), retrying in {delay:.0f}s"
+                    )
+                    stats["retried"] += 1
+                    retries_pending.append(
+                        loop.call_later(delay, requeue, (tile, attempt + 1))
+                    )
+                    done = False
+                else:
+                    logger.error(f"Tile {tile.bbox} failed: {e!r}")
+                    failed.append((tile, e))
+            except Exception as e:
+                logger.error(f"Tile {tile.bbox} failed: {e!r}")
+                failed.append((tile, e))
+            finally:
+                if done:
+                    queue.task_done()
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+    try:
+        await queue.join()
+    finally:
+        for handle in retries_pending:
+            handle.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    logger.info(
+        f"Fetched {len(results)} tiles ({stats['split']} split, "
+        f"{stats['retried']} retries, {len(failed)} failed)"
+    )
+    if failed:
+        raise TileFetchError(failed)
+    return results
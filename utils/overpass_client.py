@@ -0,0 +1,487 @@
+import asyncio
+import email.utils
+import json
+import random
+import re
+import time
+import xml.etree.ElementTree as ET
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Start of the elements array, separators between elements, and the remark
+# Overpass appends after the elements when a query fails half-way
+_ELEMENTS_START = re.compile(r'"elements"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+_REMARK = re.compile(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_OSM_BASE = re.compile(r'"timestamp_osm_base"\s*:\s*"([^"]+)"')
+
+
+class OverpassError(Exception):
+    """The Overpass response was incomplete or reported a runtime error"""
+
+
+class OverpassTimeout(OverpassError):
+    """The server gave up on the query: it timed out or ran out of memory"""
+
+
+def remark_error(remark: str) -> OverpassError:
+    """The exception for a runtime error remark of an Overpass response"""
+    if "timed out" in remark or "out of memory" in remark:
+        return OverpassTimeout(remark)
+    return OverpassError(remark)
+
+
+class ElementStreamParser:
+    """Incremental parser for Overpass JSON responses.
+
+    Text is fed in chunks as it arrives and every object of the top-level
+    ``elements`` array is returned as soon as it is complete, decoded with
+    ``JSONDecoder.raw_decode``. Only the current chunk and one partial
+    element are buffered, so memory does not grow with the response size.
+    The OSM database timestamp the data reflects is read from the response
+    header into ``osm_base``.
+    """
+
+    binary = False
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_elements = False
+        self._done = False
+        self.osm_base: Optional[str] = None
+        self.tail = ""
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add a chunk of text; return the elements completed by it"""
+        if self._done:
+            self.tail += chunk
+            return []
+        buffer = self._buffer + chunk
+        if not self._in_elements:
+            match = _ELEMENTS_START.search(buffer)
+            if not match:
+                self._buffer = buffer
+                return []
+            osm_base = _OSM_BASE.search(buffer, 0, match.start())
+            if osm_base:
+                self.osm_base = osm_base.group(1)
+            buffer = buffer[match.end():]
+            self._in_elements = True
+
+        elements = []
+        position = 0
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                self._done = True
+                self.tail = buffer[position + 1:]
+                position = len(buffer)
+                break
+            try:
+                element, position = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # element continues in the next chunk
+            elements.append(element)
+        self._buffer = buffer[position:]
+        return elements
+
+    def close(self) -> None:
+        """Check that the response ended cleanly"""
+        if not self._done:
+            raise OverpassError("Response ended inside the elements array")
+        remark = _REMARK.search(self.tail)
+        if remark and "error" in remark.group(1):
+            raise remark_error(json.loads(f'"{remark.group(1)}"'))
+
+
+def _element_dict(node: ET.Element) -> Dict[str, Any]:
+    """An OSM XML element as a dict shaped like Overpass JSON output"""
+    element = {"type": node.tag, "id": int(node.get("id"))}
+    position = node.find("center") if node.get("lat") is None else node
+    if position is not None and position.get("lat") is not None:
+        element["lat"] = float(position.get("lat"))
+        element["lon"] = float(position.get("lon"))
+    element["tags"] = {tag.get("k"): tag.get("v") for tag in node.findall("tag")}
+    return element
+
+
+class AugmentedDiffParser:
+    """Incremental parser for Overpass augmented diffs (``[adiff:...]``).
+
+    Bytes of the XML diff are fed as they arrive and every completed
+    ``<action>`` is returned as ``(action, element)``: action is "create",
+    "modify" or "delete", and element is a JSON-style dict (new version for
+    create/modify, old version for delete). Elements that stopped matching
+    the query come out as deletes. Each action is dropped from the tree once
+    read, so memory stays flat.
+    """
+
+    binary = True
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._done = False
+        self._remark: Optional[str] = None
+        self.osm_base: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, Dict[str, Any]]]:
+        """Add a chunk of bytes; return the changes completed by it"""
+        self._parser.feed(chunk)
+        changes = []
+        for event, node in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = node
+                continue
+            if node is self._root:
+                self._done = True
+            elif node.tag == "meta":
+                self.osm_base = node.get("osm_base")
+            elif node.tag == "remark":
+                self._remark = (node.text or "").strip()
+            elif node.tag == "action":
+                changes.append(self._change(node))
+                self._root.remove(node)
+        return changes
+
+    @staticmethod
+    def _change(action: ET.Element) -> Tuple[str, Dict[str, Any]]:
+        kind = action.get("type")
+        if kind == "create":
+            return kind, _element_dict(action[0])
+        version = action.find("old" if kind == "delete" else "new")
+        return kind, _element_dict(version[0])
+
+    def close(self) -> None:
+        """Check that the diff ended cleanly"""
+        self._parser.close()
+        if self._remark and "error" in self._remark:
+            raise remark_error(self._remark)
+        if not self._done:
+            raise OverpassError("Augmented diff ended early")
+
+
+class TokenBucket:
+    """Async token bucket rate limiter.
+
+    Tokens refill at ``rate`` per second up to ``capacity``; each request
+    takes one, waiting for the refill when the bucket is empty. Waiters are
+    served in arrival order.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take one token, sleeping until one is available"""
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class Mirror:
+    """One Overpass endpoint: its query slots, rate limit and recent health.
+
+    Latency (time until the response headers arrive) and error rate are
+    exponentially weighted moving averages, so the score follows how the
+    server is doing now. A failed mirror is left alone until
+    ``available_at`` (its Retry-After, or the backoff delay).
+    """
+
+    # Weight of the newest sample in the moving averages
+    ALPHA = 0.3
+    # How much a 100% error rate multiplies the latency score
+    ERROR_PENALTY = 4.0
+    # Seconds assumed for a mirror that has failed but never answered yet
+    UNKNOWN_LATENCY = 1.0
+
+    def __init__(self, url: str, slots: int, rate: float, burst: float):
+        self.url = url
+        self.slots = slots
+        self.semaphore = asyncio.Semaphore(slots)
+        self.bucket = TokenBucket(rate, burst)
+        self.active = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.available_at = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def score(self) -> float:
+        """Lower is better; mirrors not tried yet come first"""
+        if not self.requests:
+            return 0.0
+        latency = self.UNKNOWN_LATENCY if self.latency is None else self.latency
+        return latency * (1 + self.ERROR_PENALTY * self.error_rate)
+
+    def succeeded(self, latency: float) -> None:
+        self.requests += 1
+        self.latency = (
+            latency if self.latency is None
+            else self.ALPHA * latency + (1 - self.ALPHA) * self.latency
+        )
+        self.error_rate *= 1 - self.ALPHA
+
+    def failed(self, delay: float = 0.0) -> None:
+        """Count an error; the mirror is not used again for ``delay`` seconds"""
+        self.requests += 1
+        self.errors += 1
+        self.error_rate = self.ALPHA + (1 - self.ALPHA) * self.error_rate
+        self.available_at = max(self.available_at, time.monotonic() + delay)
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds a response's Retry-After header asks to wait, if it has one"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class OverpassClient:
+    """Async Overpass API client for concurrent queries across mirrors.
+
+    All queries share one pooled ``httpx.AsyncClient``, so connections are
+    kept alive between queries. Each mirror runs at most
+    ``max_concurrency`` queries at once, which matches the query slots the
+    public Overpass servers give each IP, and a token bucket per mirror
+    spaces out query starts so the slots' cooldowns are respected. Every
+    request has a timeout.
+
+    Each query goes to the healthy mirror with the best score (see
+    ``Mirror``), preferring one with a free slot. Rate limiting (429),
+    overload (502-504) and connection failures are retried up to
+    ``retries`` times, on another mirror if one is available, after the
+    failed mirror's Retry-After or a jittered exponential backoff. A
+    response is only retried before any of it was read: a stream that
+    fails half-way raises, and it is up to the caller to run the query
+    again.
+
+    Use as an async context manager::
+
+        async with OverpassClient() as client:
+            data = await client.query(ql)
+    """
+
+    OVERPASS_API = "https://overpass-api.de/api/interpreter"
+
+    # overpass-api.de grants 2 concurrent slots per IP
+    MAX_CONCURRENCY = 2
+    # Query starts per second, and how many may start back to back
+    RATE = 1.0
+    BURST = 2
+    # Seconds; above the [timeout:25] the queries ask the server for
+    TIMEOUT = 60.0
+    CONNECT_TIMEOUT = 10.0
+    # Retries of a failed request, and their backoff: a random delay up to
+    # BACKOFF_BASE * 2**attempt seconds, at most BACKOFF_CAP ("full jitter")
+    RETRIES = 4
+    BACKOFF_BASE = 1.0
+    BACKOFF_CAP = 30.0
+    RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+    def __init__(
+        self,
+        endpoint: Union[str, Sequence[str]] = OVERPASS_API,
+        max_concurrency: int = MAX_CONCURRENCY,
+        rate: float = RATE,
+        burst: float = BURST,
+        timeout: float = TIMEOUT,
+        retries: int = RETRIES,
+        backoff: float = BACKOFF_BASE,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        endpoints = [endpoint] if isinstance(endpoint, str) else list(endpoint)
+        self.mirrors = [
+            Mirror(url, max_concurrency, rate, burst) for url in endpoints
+        ]
+        self.max_concurrency = max_concurrency * len(self.mirrors)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "OverpassClient":
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=self.CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            ),
+            transport=self._transport,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._client.aclose()
+        self._client = None
+        for mirror in self.mirrors:
+            if mirror.requests:
+                logger.info(
+                    f"Overpass mirror {mirror.url}: {mirror.requests} requests, "
+                    f"{mirror.errors} errors, latency "
+                    f"{(mirror.latency or 0) * 1000:.0f} ms"
+                )
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Jittered exponential backoff before retry number ``attempt`` + 1"""
+        return random.uniform(0, min(self.BACKOFF_CAP, self.backoff * 2**attempt))
+
+    async def _choose(self) -> Mirror:
+        """The mirror for the next request, reserving one of its slots.
+
+        Waits while every mirror is backing off.
+        """
+        while True:
+            now = time.monotonic()
+            ready = [m for m in self.mirrors if m.available_at <= now]
+            if ready:
+                free = [m for m in ready if m.active < m.slots]
+                mirror = min(free or ready, key=Mirror.score)
+                mirror.active += 1
+                return mirror
+            await asyncio.sleep(min(m.available_at for m in self.mirrors) - now)
+
+    @asynccontextmanager
+    async def _response(self, query: str) -> AsyncIterator[httpx.Response]:
+        """A streamed response to a query, retried across mirrors until it starts"""
+        attempt = 0
+        while True:
+            mirror = await self._choose()
+            delivered = False
+            delay = None
+            try:
+                async with mirror.semaphore:
+                    await mirror.bucket.acquire()
+                    started = time.perf_counter()
+                    async with self._client.stream(
+                        "POST", mirror.url, content=query.encode()
+                    ) as response:
+                        if (
+                            response.status_code in self.RETRY_STATUSES
+                            and attempt < self.retries
+                        ):
+                            delay = retry_after(response)
+                            if delay is None:
+                                delay = self.backoff_delay(attempt)
+                            logger.warning(
+                                f"Overpass mirror {mirror.url} answered "
+                                f"{response.status_code}, retrying in {delay:.1f}s"
+                            )
+                        else:
+                            response.raise_for_status()
+                            mirror.succeeded(time.perf_counter() - started)
+                            delivered = True
+                            yield response
+                            return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) and not isinstance(
+                    e, (httpx.ReadTimeout, httpx.WriteTimeout)
+                )
+                if delivered or not retryable or attempt >= self.retries:
+                    if not isinstance(e, httpx.HTTPStatusError):
+                        mirror.failed()
+                    elif e.response.status_code in self.RETRY_STATUSES:
+                        mirror.failed(retry_after(e.response) or 0.0)
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning(
+                    f"Overpass mirror {mirror.url} failed ({e!r}), "
+                    f"retrying in {delay:.1f}s"
+                )
+            finally:
+                mirror.active -= 1
+            mirror.failed(delay)
+            attempt += 1
+
+    async def query(self, query: str) -> Dict:
+        """Run an Overpass QL query and return the decoded JSON response"""
+        started = time.perf_counter()
+        async with self._response(query) as response:
+            content = await response.aread()
+        logger.debug(
+            f"Overpass query answered in {time.perf_counter() - started:.2f}s "
+            f"({len(content)} bytes)"
+        )
+        return json.loads(content)
+
+    async def stream(self, query: str, parser) -> AsyncIterator[Any]:
+        """Run a query and yield what ``parser`` decodes as the response streams in.
+
+        ``parser`` is an ElementStreamParser (JSON) or AugmentedDiffParser
+        (XML diffs); metadata such as ``osm_base`` can be read from it once
+        the stream is exhausted.
+        """
+        started = time.perf_counter()
+        async with self._response(query) as response:
+            chunks = response.aiter_bytes() if parser.binary else response.aiter_text()
+            count = 0
+            async for chunk in chunks:
+                for item in parser.feed(chunk):
+                    count += 1
+                    yield item
+            parser.close()
+        logger.debug(
+            f"Overpass streamed {count} items in "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+
+    def stream_elements(
+        self, query: str, parser: ElementStreamParser = None
+    ) -> AsyncIterator[Dict]:
+        """Run a JSON query and yield its elements as they are parsed"""
+        return self.stream(query, parser or ElementStreamParser())
+
+    def stream_changes(
+        self, query: str, parser: AugmentedDiffParser = None
+    ) -> AsyncIterator[Tuple[str, Dict]]:
+        """Run an augmented diff query and yield its (action, element) changes"""
+        return self.stream(query, parser or AugmentedDiffParser())
@@ -0,0 +1,307 @@
+"""Ingest-time deduplication of OSM places.
+
+The same real place is often in OSM more than once: a bank and its ATM
+tagged separately in one building, or a church mapped both as a node and
+as an area. Such entries are found in near-linear time:
+
+1. Places are hashed into a grid of cells at least ``cell`` meters wide
+   in both directions (per category), so only places in the same or an
+   adjacent cell are ever compared, never all pairs.
+2. Neighbours closer than ``distance`` meters (``area_distance`` when one
+   of them is a way or relation, whose centre can be far from a node on
+   the same site) are compared by name: every significant word of the
+   shorter name must appear in the longer one, exactly or spelled closely
+   (``difflib`` ratio), so "Bilos Pastry" matches "Bilo's Pastry" but
+   "Awash Bank (Saris Branch)" does not match "Bunna Bank (Saris Branch)".
+3. Matching pairs are joined with union-find, so chains of duplicates
+   become one group, and each group is merged into one canonical place
+   holding the union of the group's fields.
+"""
+import difflib
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Meters between two point features, and between a point and an area centre
+DEDUP_DISTANCE = 50.0
+AREA_DEDUP_DISTANCE = 200.0
+# difflib ratio above which two words are taken as spellings of one word
+WORD_SIMILARITY = 0.8
+# Neighbourhoods with more places than this (a mall full of ATMs) are only
+# compared within groups sharing a name word, so a dense block stays cheap
+MAX_NEIGHBOURS = 64
+
+METERS_PER_DEGREE = 111195.0
+
+# Words that don't tell two places apart
+GENERIC_WORDS = frozenset({"the", "of", "and", "atm", "branch", "main", "s", "c", "sc", "plc"})
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Preferred canonical element type: areas describe the whole site
+_TYPE_RANK = {"relation": 0, "way": 1, "node": 2}
+
+
+def name_words(name: str) -> FrozenSet[str]:
+    """Significant lower-case words of a name, accents removed"""
+    text = name.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return frozenset(_WORD.findall(text)) - GENERIC_WORDS
+
+
+def _similar_word(word: str, words: FrozenSet[str]) -> bool:
+    """Whether a word, or a close spelling of it, is among words.
+
+    Numbers ("Wereda 10", branch numbers) only match exactly.
+    """
+    if word in words:
+        return True
+    if word.isdigit():
+        return False
+    for other in words:
+        # The ratio is 2 * matches / total length, so it can only reach the
+        # threshold when the lengths are close enough
+        if min(len(word), len(other)) * 2 >= WORD_SIMILARITY * (len(word) + len(other)):
+            if difflib.SequenceMatcher(None, word, other).ratio() >= WORD_SIMILARITY:
+                return True
+    return False
+
+
+def similar_names(a: Tuple[str, FrozenSet[str]], b: Tuple[str, FrozenSet[str]]) -> bool:
+    """Whether two (normalized name, words) pairs name the same place.
+
+    Every word of the name with fewer words must be in the other name, or
+    be a close spelling of one of its words ("Abune Petros" / "Abune Petros
+    Monument", "Faafen Hote" / "Faafen Hotel"). A one-word name only
+    matches names of at most two words. Names without significant words
+    must be equal.
+    """
+    text_a, words_a = a
+    text_b, words_b = b
+    if not words_a or not words_b:
+        return text_a == text_b
+    if words_a == words_b:
+        return True
+    shorter, longer = sorted((words_a, words_b), key=len)
+    if len(shorter) == 1 and len(longer) > 2:
+        return False
+    return all(_similar_word(word, longer) for word in shorter)
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path halving and union by size"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        """Join the sets of a and b; False if they were already one"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def _position(location: Dict[str, Any]) -> Tuple[float, float]:
+    coordinates = location.get("coordinates") or {}
+    try:
+        return float(coordinates["latitude"]), float(coordinates["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return math.nan, math.nan
+
+
+def duplicate_groups(
+    locations: List[Dict[str, Any]],
+    distance: float = DEDUP_DISTANCE,
+    area_distance: float = AREA_DEDUP_DISTANCE,
+) -> List[List[int]]:
+    """Indices of the places that are duplicates of each other, per group.
+
+    Only places of the same category are compared. Each returned group has
+    at least two members, in input order.
+    """
+    count = len(locations)
+    lats, lons, names, areas = [], [], [], []
+    for location in locations:
+        lat, lon = _position(location)
+        lats.append(lat)
+        lons.append(lon)
+        text = " ".join(_WORD.findall(str(location.get("name", "")).casefold()))
+        names.append((text, name_words(str(location.get("name", "")))))
+        areas.append(location.get("osm_type") in ("way", "relation"))
+
+    # A degree of longitude shrinks by cos(latitude): cells are widened for
+    # the latitude farthest from the equator, so no cell is narrower than
+    # the largest match distance and duplicates are always in adjacent cells
+    cell = max(distance, area_distance)
+    lat_degrees = cell / METERS_PER_DEGREE
+    max_lat = max((abs(lat) for lat in lats if not math.isnan(lat)), default=0.0)
+    lon_degrees = min(
+        lat_degrees / max(math.cos(math.radians(max_lat)), 1e-9), 360.0
+    )
+    buckets: Dict[Tuple[str, int, int], List[int]] = defaultdict(list)
+    for idx, location in enumerate(locations):
+        if not math.isnan(lats[idx]):
+            key = (
+                str(location.get("category", "")).lower(),
+                math.floor(lats[idx] / lat_degrees),
+                math.floor(lons[idx] / lon_degrees),
+            )
+            buckets[key].append(idx)
+
+    sets = UnionFind(count)
+    compared = 0
+    for (category, row, col), members in buckets.items():
+        # Each unordered pair of cells is visited once: this cell with itself
+        # and with the four "forward" neighbours
+        neighbours = list(members)
+        for d_row, d_col in ((0, 1), (1, -1), (1, 0), (1, 1)):
+            neighbours += buckets.get((category, row + d_row, col + d_col), ())
+        if len(neighbours) > MAX_NEIGHBOURS:
+            pairs = _pairs_by_word(members, neighbours, names)
+        else:
+            own = len(members)
+            pairs = (
+                (members[i], neighbours[j])
+                for i in range(own)
+                for j in range(i + 1, len(neighbours))
+            )
+        for a, b in pairs:
+            compared += 1
+            scale = math.cos(math.radians((lats[a] + lats[b]) / 2))
+            dy = (lats[a] - lats[b]) * METERS_PER_DEGREE
+            dx = (lons[a] - lons[b]) * METERS_PER_DEGREE * scale
+            limit = area_distance if areas[a] or areas[b] else distance
+            if dx * dx + dy * dy <= limit * limit and similar_names(names[a], names[b]):
+                sets.union(a, b)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for idx in range(count):
+        if sets.size[sets.find(idx)] > 1:
+            groups[sets.find(idx)].append(idx)
+    logger.debug(f"Deduplication compared {compared} pairs among {count} places")
+    return list(groups.values())
+
+
+def _pairs_by_word(members: List[int], neighbours: List[int], names) -> set:
+    """Pairs (member, neighbour) sharing a name word, for crowded cells"""
+    by_word: Dict[str, List[int]] = defaultdict(list)
+    for idx in neighbours:
+        for word in names[idx][1] or (names[idx][0],):
+            by_word[word].append(idx)
+    own = set(members)
+    pairs = set()
+    for idx in members:
+        for word in names[idx][1] or (names[idx][0],):
+            for other in by_word[word]:
+                if other != idx and (other not in own or other > idx):
+                    pairs.add((idx, other))
+    return pairs
+
+
+def _richness(location: Dict[str, Any]) -> int:
+    """Number of non-empty fields, counting each contact detail"""
+    count = 0
+    for value in location.values():
+        if isinstance(value, dict):
+            count += sum(1 for item in value.values() if item)
+        elif value:
+            count += 1
+    return count
+
+
+def _osm_key(location: Dict[str, Any]) -> str:
+    return f"{location.get('osm_type')}/{location.get('osm_id')}"
+
+
+def merge_places(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """One canonical place from a group of duplicates.
+
+    The canonical entry is the one with the most filled-in fields, then
+    an area over a node, then the lowest OSM id. Its fields win; fields it
+    lacks (or has empty) are taken from the others, ``osm_tags`` are
+    united, and the OSM keys of the absorbed entries are listed in
+    ``merged``.
+    """
+    ranked = sorted(
+        group,
+        key=lambda place: (
+            -_richness(place),
+            _TYPE_RANK.get(place.get("osm_type"), 3),
+            place.get("osm_id") or 0,
+        ),
+    )
+    canonical = {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in ranked[0].items()
+    }
+    merged = list(canonical.get("merged", []))
+    for other in ranked[1:]:
+        for key, value in other.items():
+            if key in ("merged", "osm_type", "osm_id", "coordinates", "name"):
+                continue
+            current = canonical.get(key)
+            if isinstance(value, dict):
+                current = canonical.setdefault(key, {})
+                for item, item_value in value.items():
+                    if item_value and not current.get(item):
+                        current[item] = item_value
+            elif isinstance(value, list):
+                canonical[key] = list(dict.fromkeys([*(current or []), *value]))
+            elif value and not current:
+                canonical[key] = value
+        if "osm_id" in other:
+            merged.append(_osm_key(other))
+        merged.extend(other.get("merged", []))
+    if merged:
+        canonical["merged"] = merged
+    return canonical
+
+
+def deduplicate(
+    locations: List[Dict[str, Any]],
+    distance: float = DEDUP_DISTANCE,
+    area_distance: float = AREA_DEDUP_DISTANCE,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Merge duplicate places; returns the places and how many were absorbed.
+
+    Each merged place takes the position of its group's first member, so
+    the input order is otherwise kept.
+    """
+    groups = duplicate_groups(locations, distance, area_distance)
+    if not groups:
+        return list(locations), 0
+    replacement: Dict[int, Dict[str, Any]] = {}
+    absorbed = set()
+    for group in groups:
+        replacement[group[0]] = merge_places([locations[idx] for idx in group])
+        absorbed.update(group[1:])
+    result = [
+        replacement.get(idx, location)
+        for idx, location in enumerate(locations)
+        if idx not in absorbed
+    ]
+    logger.info(
+        f"Merged {len(absorbed)} duplicate places into {len(groups)} "
+        f"({len(locations)} -> {len(result)})"
+    )
+    return result, len(absorbed)